@@ -0,0 +1,195 @@
+import numpy as np
+
+from rollups import daily_panel
+
+# -----------------------------------------------------------------------------
+# ANOMALY DETECTION
+# -----------------------------------------------------------------------------
+# Every region x resource_type x metric daily series (means from the rollup
+# cube) is fed day by day through three online detectors, vectorized over all
+# series at once:
+#
+#   zscore    distance from the mean of the last WINDOW days, in standard
+#             deviations (ring buffer plus running sums)
+#   ewma      distance from an exponentially weighted mean and variance
+#   seasonal  residual against an EWMA level plus a day-of-week profile, in
+#             units of the EWMA residual deviation
+#
+# Each day is scored against the state built from the days before it, then
+# folded into the state. State per series is fixed-size (WINDOW + SEASON + a
+# few scalars), so extending a version by new days costs O(series) per day
+# and history is never rescanned. Missing days (NaN) leave a series' state
+# untouched.
+
+WINDOW = 28
+ALPHA = 0.1         # EWMA weight of the newest day (mean, variance and level)
+GAMMA = 0.2         # weight of the newest day in the day-of-week profile
+SEASON = 7
+WARMUP = 14         # observations before a series is scored
+THRESHOLD = 3.0
+DETECTORS = ("zscore", "ewma", "seasonal")
+# (name, minimum |score|), most severe first
+SEVERITIES = (("critical", 5.0), ("high", 4.0), ("medium", THRESHOLD))
+
+
+def severity_of(score):
+    """Severity label for absolute scores >= THRESHOLD."""
+    labels = np.full(len(score), SEVERITIES[-1][0], dtype=object)
+    for name, bound in reversed(SEVERITIES[:-1]):
+        labels[score >= bound] = name
+    return labels
+
+
+def _z(resid, var):
+    sd = np.sqrt(np.maximum(var, 0.0))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(sd > 1e-9, resid / sd, 0.0)
+
+
+class AnomalyDetector:
+    """Online detector state for a fixed list of series plus the alerts so far.
+
+    ``alerts`` holds one array per field, ranked by descending score (then
+    newest first); ``alerts["series"]`` indexes ``keys``.
+    """
+
+    FIELDS = ("date", "series", "value", "expected", "score", "detectors")
+
+    def __init__(self, keys):
+        n = len(keys)
+        self.keys = list(keys)
+        self.index = {k: i for i, k in enumerate(self.keys)}
+        self.last_date = None
+        self.count = np.zeros(n, dtype=np.int64)
+        # rolling window: ring buffer indexed by day, shared by all series
+        self.ring = np.full((n, WINDOW), np.nan)
+        self.ring_pos = 0
+        self.ring_sum = np.zeros(n)
+        self.ring_sumsq = np.zeros(n)
+        self.ring_count = np.zeros(n, dtype=np.int64)
+        # EWMA
+        self.ewma_mean = np.zeros(n)
+        self.ewma_var = np.zeros(n)
+        # seasonal residual
+        self.level = np.zeros(n)
+        self.profile = np.zeros((n, SEASON))
+        self.resid_var = np.zeros(n)
+        self.alerts = {
+            "date": np.empty(0, dtype="datetime64[D]"),
+            "series": np.empty(0, dtype=np.int64),
+            "value": np.empty(0),
+            "expected": np.empty(0),
+            "score": np.empty(0),
+            "detectors": np.empty(0, dtype=np.int8),   # bit i set = DETECTORS[i] fired
+        }
+
+    @classmethod
+    def from_cube(cls, cube, metrics):
+        keys, dates, values = daily_panel(cube, metrics)
+        detector = cls(keys)
+        detector.run(dates, values)
+        return detector
+
+    def copy(self):
+        other = AnomalyDetector.__new__(AnomalyDetector)
+        for name, value in vars(self).items():
+            setattr(other, name, value.copy() if isinstance(value, np.ndarray) else value)
+        other.keys = list(self.keys)
+        other.alerts = dict(self.alerts)
+        return other
+
+    def advanced(self, cube, metrics, since):
+        """Detector for ``cube`` (this version plus rows dated ``since`` or later).
+
+        Only days after ``last_date`` are fed; when the new rows touch a day
+        that was already scored, or the series changed, everything is rerun.
+        """
+        keys, dates, values = daily_panel(cube, metrics)
+        if keys != self.keys or self.last_date is None or np.datetime64(since, "D") <= self.last_date:
+            return AnomalyDetector.from_cube(cube, metrics)
+        new = dates > self.last_date
+        detector = self.copy()
+        detector.run(dates[new], values[:, new])
+        return detector
+
+    def _step(self, date, x):
+        """Score one day for every series, then update the state."""
+        seen = ~np.isnan(x)
+        ready = seen & (self.count >= WARMUP)
+        phase = int((date.astype("datetime64[D]").view("int64") + 3) % SEASON)
+
+        ring_mean = self.ring_sum / np.maximum(self.ring_count, 1)
+        ring_var = self.ring_sumsq / np.maximum(self.ring_count, 1) - ring_mean ** 2
+        seasonal = self.level + self.profile[:, phase]
+        expected = np.stack([ring_mean, self.ewma_mean, seasonal])
+        scores = np.stack([
+            _z(x - ring_mean, ring_var),
+            _z(x - self.ewma_mean, self.ewma_var),
+            _z(x - seasonal, self.resid_var),
+        ])
+        fired = (np.abs(scores) >= THRESHOLD) & ready
+        rows = np.flatnonzero(fired.any(axis=0))
+        if len(rows):
+            strongest = np.argmax(np.where(fired[:, rows], np.abs(scores[:, rows]), -1.0), axis=0)
+            bits = (fired[:, rows] * (1 << np.arange(len(DETECTORS)))[:, None]).sum(axis=0).astype(np.int8)
+            self._record(date, rows, x[rows], expected[strongest, rows], scores[strongest, rows], bits)
+
+        # rolling window: drop the day leaving the ring, add today
+        leaving = self.ring[:, self.ring_pos]
+        gone = ~np.isnan(leaving)
+        self.ring_sum -= np.where(gone, leaving, 0.0)
+        self.ring_sumsq -= np.where(gone, leaving ** 2, 0.0)
+        self.ring_count -= gone
+        xs = np.where(seen, x, 0.0)
+        self.ring[:, self.ring_pos] = x
+        self.ring_pos = (self.ring_pos + 1) % WINDOW
+        self.ring_sum += xs
+        self.ring_sumsq += xs ** 2
+        self.ring_count += seen
+
+        first = seen & (self.count == 0)
+        later = seen & (self.count > 0)
+        # EWMA mean/variance (West's incremental form)
+        diff = xs - self.ewma_mean
+        self.ewma_var = np.where(later, (1 - ALPHA) * (self.ewma_var + ALPHA * diff ** 2), self.ewma_var)
+        self.ewma_mean = np.where(later, self.ewma_mean + ALPHA * diff, np.where(first, xs, self.ewma_mean))
+        # seasonal: residual first, then level and day-of-week profile
+        resid = xs - seasonal
+        self.resid_var = np.where(later, (1 - ALPHA) * self.resid_var + ALPHA * resid ** 2, self.resid_var)
+        season = self.profile[:, phase]
+        level = np.where(later, self.level + ALPHA * (xs - season - self.level), np.where(first, xs, self.level))
+        self.profile[:, phase] = np.where(later, season + GAMMA * (xs - level - season), season)
+        self.level = level
+        self.count += seen
+        self.last_date = np.datetime64(date, "D")
+
+    def _record(self, date, rows, value, expected, score, bits):
+        self._pending.append((np.full(len(rows), date, dtype="datetime64[D]"), rows, value, expected, score, bits))
+
+    def run(self, dates, values):
+        """Feed days ``dates`` (ascending) with ``values`` shaped [series, day]."""
+        self._pending = []
+        for j, date in enumerate(dates):
+            self._step(date, values[:, j])
+        if self._pending:
+            parts = list(zip(*self._pending))
+            for name, new in zip(self.FIELDS, parts):
+                self.alerts[name] = np.concatenate([self.alerts[name], *new])
+            order = np.lexsort((-self.alerts["date"].view("int64"), -np.abs(self.alerts["score"])))
+            self.alerts = {name: values[order] for name, values in self.alerts.items()}
+        del self._pending
+
+    def select(self, series=None, start=None, end=None, min_score=THRESHOLD, detector=None):
+        """Positions in the ranked alerts matching the filters (still ranked)."""
+        a = self.alerts
+        mask = np.abs(a["score"]) >= min_score
+        if series is not None:
+            mask &= np.isin(a["series"], series)
+        if start is not None:
+            mask &= a["date"] >= np.datetime64(start, "D")
+        if end is not None:
+            mask &= a["date"] <= np.datetime64(end, "D")
+        if detector is not None:
+            mask &= (a["detectors"] & (1 << DETECTORS.index(detector))) != 0
+        return np.flatnonzero(mask)
+
@@ -1,482 +1,1196 @@
+import io
 import os
-from datetime import datetime, timedelta
+import secrets
+from functools import wraps
 
 import numpy as np
 import pandas as pd
-from flask import Flask, jsonify, request
+from flask import (
+    Flask, Response, g, has_request_context, jsonify, make_response, request, session, stream_with_context,
+)
 from flask_cors import CORS
 
+from anomalies import DETECTORS, SEVERITIES, AnomalyDetector, severity_of
+from backtesting import BacktestRunner
+from caching import LRUCache, make_etag
+from capacity import CapacityBase, plan
+from chatbot import ChatEngine
+from dataset import AppendUnsupported, DatasetManager
+from drivers import DRIVERS, GROUP_LEVELS, MAX_LAG, USAGE_METRICS, VARIABLES, DriverAnalysis
+from export import (
+    EXPORT_FORMATS, STREAMERS, decode_cursor, encode_cursor, frame_source, page_positions, row_source,
+)
+from features import FeatureTable
+from forecast_store import ForecastScheduler, ForecastStore
+from forecasting import METRIC_MAP, MODELS, ForecastEngine
+from ingest import (
+    IngestConflict, IngestError, append_csv, batch_version, check_new_keys, csv_rows, validate_batch,
+)
+from instrumentation import Instrumentation
+from kpis import PEAK_METRICS, KPIState, scan_kpis
+from monitoring import MonitoringPipeline
+from partitions import PartitionedDataset, PartitionStore, build_partitions
+from rollups import GRANULARITIES
+from serialization import Compression, FastJSONProvider, column_records, etag_variants, iso_dates
+from serving import HeavyGate
+from sessions import make_session_store
+from simulation import PEAK_QUANTILES, DemandSimulator
+from sketches import DEFAULT_QUANTILES, RELATIVE_ACCURACY, SketchCube, parse_quantiles, quantile_label
+from snapshot import append_version, csv_version, load_snapshot, record_append, write_snapshot
+from store import prepare_frame
+
 # -----------------------------------------------------------------------------
 # CONFIG - UPDATED FOR NEW STRUCTURE
 # -----------------------------------------------------------------------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data", "processed")
 
-CLEANED_PATH = os.path.join(DATA_DIR, "cleaned_merged.csv")
-FEATURED_PATH = os.path.join(DATA_DIR, "feature_engineered.csv")
+# CLEANED_PATH can point at another file in the same schema (e.g. benchmarks)
+CLEANED_PATH = os.environ.get("CLEANED_PATH") or os.path.join(DATA_DIR, "cleaned_merged.csv")
 
 # -----------------------------------------------------------------------------
 # APP INIT
 # -----------------------------------------------------------------------------
 app = Flask(__name__)
+# orjson when installed, numpy arrays/scalars serialized directly
+app.json = FastJSONProvider(app)
 
 # CORS configuration - allow requests from Next.js dev server
 CORS(app, resources={
     r"/api/*": {
         "origins": ["http://localhost:3000", "http://127.0.0.1:3000"],
         "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type"]
+        "allow_headers": ["Content-Type", "If-None-Match"],
+        "expose_headers": ["ETag", "X-Dataset-Version", "X-Total-Count", "X-Next-Cursor"],
     }
 })
 
+# gzip/br for JSON and CSV bodies when the client accepts it (brotli needs
+# the optional brotli package); COMPRESSION=0 leaves that to a proxy
+COMPRESSION = os.environ.get("COMPRESSION", "1") != "0"
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_LEVEL = int(os.environ.get("COMPRESS_LEVEL", "6"))
+if COMPRESSION:
+    Compression(app, min_size=COMPRESS_MIN_SIZE, gzip_level=COMPRESS_LEVEL)
+
 # -----------------------------------------------------------------------------
 # LOAD DATA ON STARTUP
 # -----------------------------------------------------------------------------
+# Set USE_SNAPSHOT=0 to always parse the CSV (no .cache/ files written)
+USE_SNAPSHOT = os.environ.get("USE_SNAPSHOT", "1") != "0"
+
+
 def load_main_dataframe():
     if not os.path.exists(CLEANED_PATH):
         raise FileNotFoundError(f"Cleaned dataset not found at {CLEANED_PATH}")
+    if USE_SNAPSHOT:
+        df = load_snapshot(CLEANED_PATH)
+        if df is not None:
+            return df
+
     df = pd.read_csv(CLEANED_PATH)
     df["date"] = pd.to_datetime(df["date"])
+    df = prepare_frame(df)
+    if USE_SNAPSHOT:
+        try:
+            write_snapshot(df, CLEANED_PATH)
+        except (OSError, TypeError) as exc:
+            print(f"⚠ Could not write dataset snapshot: {exc}")
     return df
 
-print(f"Loading data from: {CLEANED_PATH}")
-DF_RAW = load_main_dataframe()
-print(f"✓ Loaded {len(DF_RAW)} rows from dataset")
+def load_versioned_dataframe():
+    df = load_main_dataframe()
+    return df, csv_version(CLEANED_PATH)
 
-# Create a copy of the raw data for chat analysis
-df_full = DF_RAW.copy()
 
-# -----------------------------
-# CHATBOT DATA ANALYSIS HELPERS
-# -----------------------------
-import pandas as pd
-import numpy as np
-from flask import session
-
-def summarize_region(region: str):
-    df = DF_RAW[DF_RAW["region"].str.lower() == region.lower()]
-    if df.empty:
-        return f"No data found for region '{region}'."
-
-    avg_cpu = df["usage_cpu"].mean()
-    avg_storage = df["usage_storage"].mean()
-    avg_users = df["users_active"].mean()
-
-    peak_cpu_row = df.loc[df["usage_cpu"].idxmax()]
-
-    return (
-        f"📊 Summary for **{region}**\n"
-        f"- Avg CPU: {avg_cpu:.2f}%\n"
-        f"- Avg Storage: {avg_storage:.2f} GB\n"
-        f"- Avg Users: {avg_users:.0f}\n"
-        f"- Peak CPU: {peak_cpu_row['usage_cpu']:.2f}% "
-        f"on {peak_cpu_row['date'].strftime('%Y-%m-%d')}"
-    )
+# DATASET_MODE=partitioned keeps the rows on disk (month x region .npy
+# partitions under PARTITION_DIR) for data larger than memory; KPIs, the
+# rollup cube and capacity inputs are then built one partition at a time.
+DATASET_MODE = os.environ.get("DATASET_MODE", "memory")
+PARTITION_DIR = os.environ.get("PARTITION_DIR") or os.path.join(DATA_DIR, ".cache", "partitions")
+PARTITION_CHUNK_ROWS = int(os.environ.get("PARTITION_CHUNK_ROWS", "500000"))
 
 
-def compare_regions(r1: str, r2: str):
-    df1 = DF_RAW[DF_RAW["region"].str.lower() == r1.lower()]
-    df2 = DF_RAW[DF_RAW["region"].str.lower() == r2.lower()]
+def load_partitioned_store():
+    if not os.path.exists(CLEANED_PATH):
+        raise FileNotFoundError(f"Cleaned dataset not found at {CLEANED_PATH}")
+    version = csv_version(CLEANED_PATH)
+    folder = build_partitions(CLEANED_PATH, PARTITION_DIR, version, chunk_rows=PARTITION_CHUNK_ROWS)
+    return PartitionStore(folder, chunk_rows=PARTITION_CHUNK_ROWS), version
+
+
+# The current Dataset (store indexes + rollup cube) is swapped atomically on
+# reload; see POST /api/admin/reload and DATASET_WATCH_INTERVAL below.
+if DATASET_MODE == "partitioned":
+    DATASETS = DatasetManager(CLEANED_PATH, load_partitioned_store, build=PartitionedDataset)
+else:
+    DATASETS = DatasetManager(CLEANED_PATH, load_versioned_dataframe)
+
+# Forecasts for every series/model are precomputed per dataset version.
+# FORECAST_REFRESH_MODE=sync builds them before a new version is swapped in;
+# "background" builds them after the swap in a worker thread.
+FORECAST_REFRESH_MODE = os.environ.get("FORECAST_REFRESH_MODE", "sync")
+FORECAST_REFRESH_INTERVAL = float(os.environ.get("FORECAST_REFRESH_INTERVAL", "0"))
+FORECAST_PRECOMPUTE_HORIZON = int(os.environ.get("FORECAST_PRECOMPUTE_HORIZON", "90"))
+FORECAST_STORE_DIR = os.environ.get("FORECAST_STORE_DIR") or None
+# Rolling-origin backtests run per dataset version before the forecasts, so
+# the per-series "best" model is picked from real out-of-sample errors.
+BACKTEST_MODE = os.environ.get("BACKTEST_MODE", "sync")
+BACKTEST_WORKERS = int(os.environ.get("BACKTEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+BACKTEST_DIR = os.environ.get("BACKTEST_DIR", os.path.join(DATA_DIR, ".cache", "backtests"))
+BACKTESTS = BacktestRunner(
+    DATASETS, mode=BACKTEST_MODE, workers=BACKTEST_WORKERS, cache_dir=BACKTEST_DIR
+).install()
+
+FORECASTS = ForecastStore(horizon=FORECAST_PRECOMPUTE_HORIZON, cache_dir=FORECAST_STORE_DIR)
+FORECAST_SCHEDULER = ForecastScheduler(
+    FORECASTS, DATASETS, mode=FORECAST_REFRESH_MODE, interval=FORECAST_REFRESH_INTERVAL
+).install()
+
+# Stored forecasts are scored against new actuals on every refresh
+MONITOR_WINDOW = int(os.environ.get("MONITOR_WINDOW", "90"))
+MONITORING = MonitoringPipeline(window=MONITOR_WINDOW)
+FORECAST_SCHEDULER.add_listener(MONITORING.on_forecasts)
 
-    if df1.empty or df2.empty:
-        return "One of the regions has no data."
+print(f"Loading data from: {CLEANED_PATH}")
+DATASETS.load()
+print(f"✓ Loaded {len(DATASETS.current)} rows from dataset")
+
+# Seconds between checks of cleaned_merged.csv for changes (0 = off)
+DATASET_WATCH_INTERVAL = float(os.environ.get("DATASET_WATCH_INTERVAL", "0"))
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+# Forecasts and raw exports share HEAVY_CONCURRENCY slots per process so they
+# can't occupy every worker thread; see serving.py
+HEAVY_CONCURRENCY = int(os.environ.get("HEAVY_CONCURRENCY", str(max(1, (os.cpu_count() or 2) // 2))))
+HEAVY_QUEUE_TIMEOUT = float(os.environ.get("HEAVY_QUEUE_TIMEOUT", "10"))
+heavy = HeavyGate(HEAVY_CONCURRENCY, timeout=HEAVY_QUEUE_TIMEOUT)
+
+
+def current_dataset():
+    # pin one version per request so in-flight requests finish on it
+    if not has_request_context():
+        return DATASETS.current
+    if "dataset" not in g:
+        g.dataset = DATASETS.current
+    return g.dataset
+
+
+@app.after_request
+def add_dataset_version(response):
+    dataset = g.get("dataset") or DATASETS.current
+    response.headers["X-Dataset-Version"] = dataset.version
+    return response
+
+
+def is_admin_request():
+    # With ADMIN_TOKEN set the caller must send it; otherwise local calls only
+    if ADMIN_TOKEN:
+        return request.headers.get("X-Admin-Token") == ADMIN_TOKEN
+    return request.remote_addr in ("127.0.0.1", "::1")
+
+
+# Timing spans, Prometheus metrics at /api/metrics and ?profile=1 for admin
+# callers; METRICS_ENABLED=0 turns all of it into no-ops
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+INSTRUMENTATION = Instrumentation(app, enabled=METRICS_ENABLED, allow_profile=is_admin_request)
+span = INSTRUMENTATION.span
+
+
+# Clients may keep responses but must revalidate them (ETag -> 304)
+CACHE_CONTROL = os.environ.get("CACHE_CONTROL", "no-cache")
+KPI_CACHE_SIZE = int(os.environ.get("KPI_CACHE_SIZE", "256"))
+
+
+def etagged(view):
+    """Strong ETag + conditional GET for views that only depend on the data version."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != "GET":
+            return view(*args, **kwargs)
+        etag = make_etag(current_dataset().version, request.path, request.args)
+        # a cached compressed copy revalidates with its own "<etag>-<encoding>"
+        matched = next((t for t in etag_variants(etag) if request.if_none_match.contains(t)), None)
+        if matched:
+            response = app.response_class(status=304)
+            etag = matched
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = CACHE_CONTROL
+        return response
+    return wrapper
+
+# Helper: index-backed filtering; the result may share memory with the
+# store, so treat it as read-only
+def get_filtered_df(params=None):
+    return current_dataset().store.filter(params)
 
-    return (
-        f"📌 **{r1} vs {r2}**\n"
-        f"- CPU: {df1['usage_cpu'].mean():.1f}% vs {df2['usage_cpu'].mean():.1f}%\n"
-        f"- Storage: {df1['usage_storage'].mean():.1f}GB vs {df2['usage_storage'].mean():.1f}GB\n"
-        f"- Users: {df1['users_active'].mean():.0f} vs {df2['users_active'].mean():.0f}"
-    )
 
+# -----------------------------------------------------------------------------
+# HEALTH CHECK
+# -----------------------------------------------------------------------------
+@app.route("/api/health", methods=["GET"])
+def health():
+    dataset = current_dataset()
+    return jsonify({"status": "ok", "rows": int(len(dataset)), "version": dataset.version})
 
-def summarize_service(service: str):
-    df = DF_RAW[DF_RAW["resource_type"].str.lower() == service.lower()]
-    if df.empty:
-        return f"No data found for service '{service}'."
 
-    return (
-        f"⚙️ Service: **{service}**\n"
-        f"- Avg CPU: {df['usage_cpu'].mean():.2f}%\n"
-        f"- Avg Storage: {df['usage_storage'].mean():.2f} GB\n"
-        f"- Avg Users: {df['users_active'].mean():.0f}\n"
-        f"- Peak CPU: {df['usage_cpu'].max():.2f}%"
+# -----------------------------------------------------------------------------
+# METRICS (Prometheus text format)
+# -----------------------------------------------------------------------------
+@app.route("/api/metrics", methods=["GET"])
+def metrics():
+    if not METRICS_ENABLED:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    dataset = current_dataset()
+    gauges = {
+        "dataset_rows": ("Rows in the current dataset version.", len(dataset)),
+        "dataset_loaded_timestamp_seconds": (
+            "When the current dataset version was loaded.", f"{dataset.loaded_at.timestamp():.3f}",
+        ),
+        "heavy_requests_active": ("Forecast/export requests holding a slot.", heavy.active),
+        "heavy_requests_rejected": ("Forecast/export requests turned away with 503.", heavy.rejected),
+    }
+    return Response(
+        INSTRUMENTATION.metrics.render(gauges), mimetype="text/plain; version=0.0.4"
     )
 
 
-# Helper: ensure we always work on a copy
-def get_filtered_df(params=None):
-    df = DF_RAW.copy()
-    if not params:
-        return df
-
-    region = params.get("region")
-    resource_type = params.get("resource_type")
-    start_date = params.get("start_date")
-    end_date = params.get("end_date")
-
-    if region:
-        df = df[df["region"] == region]
-    if resource_type:
-        df = df[df["resource_type"] == resource_type]
-    if start_date:
-        df = df[df["date"] >= pd.to_datetime(start_date)]
-    if end_date:
-        df = df[df["date"] <= pd.to_datetime(end_date)]
-    return df
+# -----------------------------------------------------------------------------
+# ADMIN: DATASET RELOAD
+# -----------------------------------------------------------------------------
+@app.route("/api/admin/reload", methods=["POST"])
+def admin_reload():
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+
+    force = request.args.get("force") in ("1", "true")
+    previous = DATASETS.current.version
+    try:
+        dataset, changed = DATASETS.reload(force=force)
+    except (OSError, ValueError) as exc:
+        return jsonify({"error": f"Reload failed: {exc}"}), 500
+    g.dataset = dataset
+    return jsonify(
+        {
+            "changed": changed,
+            "previous_version": previous,
+            "version": dataset.version,
+            "rows": int(len(dataset)),
+            "loaded_at": dataset.loaded_at.isoformat(),
+        }
+    )
 
 
 # -----------------------------------------------------------------------------
-# HEALTH CHECK
+# ADMIN: APPEND INGESTION
 # -----------------------------------------------------------------------------
-@app.route("/api/health", methods=["GET"])
-def health():
-    return jsonify({"status": "ok", "rows": int(len(DF_RAW))})
+# Appended rows go into the source CSV too (INGEST_PERSIST=0 keeps them in
+# memory only). Other worker processes pick the CSV change up through the
+# dataset watcher, as a full reload, so with several workers the watcher runs
+# every INGEST_WATCH_INTERVAL seconds even when DATASET_WATCH_INTERVAL is 0.
+INGEST_PERSIST = os.environ.get("INGEST_PERSIST", "1") != "0"
+INGEST_WATCH_INTERVAL = float(os.environ.get("INGEST_WATCH_INTERVAL", "2"))
+INGEST_MAX_ROWS = int(os.environ.get("INGEST_MAX_ROWS", "100000"))
+
+DATASETS.add_incremental("kpi_state", lambda state, batch, ds: state.merge(KPIState.from_frame(batch)))
+
+
+@app.route("/api/admin/ingest", methods=["POST"])
+def admin_ingest():
+    """
+    Append rows in the cleaned_merged.csv schema and publish a new version.
+
+    Body: text/csv with a header row, or JSON {"rows": [{...}, ...]} (a bare
+    list of records works too). Rows that start on/after the last stored date
+    are applied incrementally; older dates trigger a full rebuild. A batch
+    with a (date, region, resource_type) that is already stored or repeats
+    within it is rejected with 409 and the conflicting keys, so a retried
+    POST is not appended twice.
+    """
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    try:
+        if request.mimetype == "text/csv":
+            batch = pd.read_csv(io.BytesIO(request.get_data()))
+        else:
+            body = request.get_json(silent=True)
+            rows = body.get("rows") if isinstance(body, dict) else body
+            if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+                raise IngestError(['expected text/csv or JSON {"rows": [{...}, ...]}'])
+            batch = pd.DataFrame.from_records(rows)
+        if len(batch) > INGEST_MAX_ROWS:
+            raise IngestError([f"at most {INGEST_MAX_ROWS} rows per batch"])
+    except (IngestError, ValueError, pd.errors.ParserError) as exc:
+        errors = getattr(exc, "errors", [str(exc)])
+        return jsonify({"error": "Invalid batch", "details": errors}), 400
+
+    def admit(current, rows):
+        rows = validate_batch(rows, current.df)
+        check_new_keys(rows, current.store)
+        return rows
+
+    written = {}
+
+    def version(current, rows):
+        if not INGEST_PERSIST:
+            return batch_version(current.version, rows)
+        # chained from the current id and the appended bytes, so the cost
+        # follows the batch, not the file
+        written["csv"] = csv_rows(CLEANED_PATH, rows)
+        written["version"] = append_version(current.version, written["csv"])
+        return written["version"]
+
+    def persist(rows):
+        # recorded first: a reload (here or in another worker) that finds
+        # the file ending in these bytes takes the same id without rehashing
+        record_append(CLEANED_PATH, written["version"], written["csv"])
+        append_csv(CLEANED_PATH, written["csv"])
+
+    previous = DATASETS.current
+    with span("ingest"):
+        try:
+            dataset, incremental = DATASETS.append(
+                batch, version, persist if INGEST_PERSIST else None, check=admit
+            )
+        except AppendUnsupported as exc:
+            return jsonify({"error": str(exc)}), 409
+        except IngestConflict as exc:
+            return jsonify({"error": "Rows already ingested", "details": exc.errors, "conflicts": exc.keys}), 409
+        except (IngestError, ValueError) as exc:
+            errors = getattr(exc, "errors", [str(exc)])
+            return jsonify({"error": "Invalid batch", "details": errors}), 400
+        except OSError as exc:
+            return jsonify({"error": f"Ingest failed: {exc}"}), 500
+    g.dataset = dataset
+    return jsonify(
+        {
+            "previous_version": previous.version,
+            "version": dataset.version,
+            "rows_added": int(len(batch)),
+            "rows": int(len(dataset)),
+            "incremental": incremental,
+            "loaded_at": dataset.loaded_at.isoformat(),
+        }
+    )
 
 
 # -----------------------------------------------------------------------------
 # FILTER OPTIONS
 # -----------------------------------------------------------------------------
 @app.route("/api/filters/options", methods=["GET"])
+@etagged
 def filters_options():
-    df = DF_RAW
-    regions = sorted(df["region"].dropna().unique().tolist())
-    resources = sorted(df["resource_type"].dropna().unique().tolist())
-    min_date = df["date"].min().strftime("%Y-%m-%d")
-    max_date = df["date"].max().strftime("%Y-%m-%d")
-    return jsonify(
-        {
-            "regions": regions,
-            "resource_types": resources,
-            "date_range": {
-                "min_date": min_date,
-                "max_date": max_date,
-            },
-        }
-    )
+    return jsonify(current_dataset().derived("filter_options", compute_filter_options))
+
+
+def compute_filter_options(dataset):
+    regions = sorted(dataset.store.categories("region"))
+    resources = sorted(dataset.store.categories("resource_type"))
+    first, last = dataset.store.date_range()
+    min_date, max_date = str(first), str(last)
+    return {
+        "regions": regions,
+        "resource_types": resources,
+        "date_range": {
+            "min_date": min_date,
+            "max_date": max_date,
+        },
+    }
 
 
 # -----------------------------------------------------------------------------
 # KPIs
 # -----------------------------------------------------------------------------
 @app.route("/api/kpis", methods=["GET"])
+@etagged
 def kpis():
-    df = DF_RAW
-
-    # Peak CPU
-    peak_cpu_row = df.loc[df["usage_cpu"].idxmax()]
-    peak_cpu = float(peak_cpu_row["usage_cpu"])
-    avg_cpu = float(df["usage_cpu"].mean())
-
-    # Max Storage
-    max_storage_row = df.loc[df["usage_storage"].idxmax()]
-    max_storage = float(max_storage_row["usage_storage"])
-    avg_storage = float(df["usage_storage"].mean())
-
-    # Peak Users
-    peak_users_row = df.loc[df["users_active"].idxmax()]
-    peak_users = int(peak_users_row["users_active"])
-    avg_users = float(df["users_active"].mean())
-
-    # Holiday impact on CPU
-    if df["holiday"].nunique() > 1:
-        cpu_holiday = df[df["holiday"] == 1]["usage_cpu"].mean()
-        cpu_work = df[df["holiday"] == 0]["usage_cpu"].mean()
-        if cpu_work != 0:
-            holiday_pct = (cpu_holiday - cpu_work) / cpu_work * 100.0
-        else:
-            holiday_pct = 0.0
-    else:
-        holiday_pct = 0.0
-
-    # Date range
-    min_date = df["date"].min()
-    max_date = df["date"].max()
-    days_span = (max_date - min_date).days + 1
-
-    result = {
-        "peak_cpu": peak_cpu,
-        "avg_cpu": avg_cpu,
-        "peak_cpu_details": {
-            "date": peak_cpu_row["date"].strftime("%Y-%m-%d"),
-            "region": peak_cpu_row["region"],
-            "resource_type": peak_cpu_row["resource_type"],
-        },
-        "max_storage": max_storage,
-        "avg_storage": avg_storage,
-        "max_storage_details": {
-            "date": max_storage_row["date"].strftime("%Y-%m-%d"),
-            "region": max_storage_row["region"],
-            "resource_type": max_storage_row["resource_type"],
-        },
-        "peak_users": peak_users,
-        "avg_users": avg_users,
-        "peak_users_details": {
-            "date": peak_users_row["date"].strftime("%Y-%m-%d"),
-            "region": peak_users_row["region"],
-            "resource_type": peak_users_row["resource_type"],
-        },
-        "holiday_impact": {
-            "percentage": float(holiday_pct),
-        },
-        "total_regions": int(df["region"].nunique()),
-        "total_resource_types": int(df["resource_type"].nunique()),
-        "data_points": int(len(df)),
-        "date_range": {
-            "start": min_date.strftime("%Y-%m-%d"),
-            "end": max_date.strftime("%Y-%m-%d"),
-            "days": int(days_span),
-        },
+    """
+    Headline KPIs, optionally restricted with the get_filtered_df filters
+    (region, resource_type, start_date, end_date). The unfiltered result is
+    computed once per dataset version; filtered results live in a bounded LRU.
+    Percentiles come from the quantile sketches (approximate, see sketches.py).
+    """
+    dataset = current_dataset()
+    params = {
+        key: request.args.get(key)
+        for key in ("region", "resource_type", "start_date", "end_date")
+        if request.args.get(key)
     }
+    sketches = dataset.derived("sketches", build_sketches)
+    if not params:
+        with span("aggregate"):
+            state = dataset.derived("kpi_state", lambda ds: KPIState.from_frames(ds.store.scan()))
+            result = dataset.derived(
+                "kpis", lambda ds: {**state.result(), "percentiles": kpi_percentiles(sketches)}
+            )
+        return jsonify(result)
+
+    try:
+        start = pd.to_datetime(params["start_date"]) if "start_date" in params else None
+        end = pd.to_datetime(params["end_date"]) if "end_date" in params else None
+    except (ValueError, TypeError):
+        return jsonify({"error": "Invalid start_date/end_date"}), 400
+    key = (
+        (params.get("region") or "").strip().lower(),
+        (params.get("resource_type") or "").strip().lower(),
+        str(start.date()) if start is not None else "",
+        str(end.date()) if end is not None else "",
+    )
+
+    cache = dataset.derived("kpi_cache", lambda ds: LRUCache(KPI_CACHE_SIZE))
+
+    def compute():
+        # partitioned datasets only read the partitions the filters can touch
+        with span("aggregate"):
+            result = scan_kpis(dataset.store.scan(**params))
+            if result is not None:
+                result["percentiles"] = kpi_percentiles(
+                    sketches,
+                    dataset.store.canonical("region", params.get("region")),
+                    dataset.store.canonical("resource_type", params.get("resource_type")),
+                    start,
+                    end,
+                )
+            return result
+
+    result = cache.get_or_compute(key, compute)
+    if result is None:
+        return jsonify({"error": "No data for the selected filters"}), 404
     return jsonify(result)
 
 
+KPI_QUANTILES = (0.5, 0.95, 0.99)
+
+
+def build_sketches(dataset):
+    return SketchCube.from_dataset(dataset, PEAK_METRICS)
+
+
+def kpi_percentiles(sketches, region=None, resource_type=None, start=None, end=None):
+    return {
+        metric: sketches.quantiles(metric, KPI_QUANTILES, region, resource_type, start, end)[0]
+        for metric in PEAK_METRICS
+    }
+
+
+# -----------------------------------------------------------------------------
+# PERCENTILES
+# -----------------------------------------------------------------------------
+DATASETS.add_incremental(
+    "sketches", lambda sketches, batch, ds: sketches.merge(SketchCube.build(batch, sketches.metrics))
+)
+
+
+@app.route("/api/percentiles", methods=["GET"])
+@etagged
+def percentiles():
+    """
+    Approximate quantiles of one metric for any filter combination, merged
+    from per-day/per-month sketches (relative error RELATIVE_ACCURACY).
+
+    Query params:
+      metric      usage_cpu (default) | usage_storage | users_active
+      q           comma separated quantiles as 0.95 or p95 (default p50,p90,p95,p99)
+      region, resource_type, start_date, end_date   filters
+      group_by    region | resource_type: one entry per group, ranked by
+                  the highest requested quantile (top-k)
+      top         keep the first N groups
+    """
+    metric = request.args.get("metric", "usage_cpu")
+    if metric not in PEAK_METRICS:
+        return jsonify({"error": f"Unknown metric: {metric}"}), 400
+    group_by = request.args.get("group_by")
+    if group_by and group_by not in ("region", "resource_type"):
+        return jsonify({"error": f"Unknown group_by: {group_by}"}), 400
+    try:
+        qs = parse_quantiles(request.args["q"]) if request.args.get("q") else list(DEFAULT_QUANTILES)
+        top = int(request.args["top"]) if request.args.get("top") else None
+        if top is not None and top < 1:
+            raise ValueError("top must be >= 1")
+        start = pd.to_datetime(request.args["start_date"]) if request.args.get("start_date") else None
+        end = pd.to_datetime(request.args["end_date"]) if request.args.get("end_date") else None
+    except (ValueError, TypeError) as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    dataset = current_dataset()
+    store = dataset.store
+    filters = {}
+    for col in ("region", "resource_type"):
+        value = request.args.get(col)
+        filters[col] = store.canonical(col, value)
+        if value and filters[col] is None:
+            return jsonify({"error": f"Unknown {col}: {value}"}), 400
+
+    with span("aggregate"):
+        sketches = dataset.derived("sketches", build_sketches)
+    payload = {"metric": metric, "relative_accuracy": RELATIVE_ACCURACY}
+    if not group_by:
+        with span("aggregate"):
+            values, count = sketches.quantiles(metric, qs, filters["region"], filters["resource_type"], start, end)
+        return jsonify({**payload, "count": count, "quantiles": values})
+
+    names = [filters[group_by]] if filters[group_by] else store.categories(group_by)
+    groups = []
+    with span("aggregate"):
+        for name in names:
+            key = {**filters, group_by: name}
+            values, count = sketches.quantiles(metric, qs, key["region"], key["resource_type"], start, end)
+            if count:
+                groups.append({group_by: name, "count": count, "quantiles": values})
+        rank = quantile_label(max(qs))
+        groups.sort(key=lambda group: -group["quantiles"][rank])
+    return jsonify({**payload, "group_by": group_by, "groups": groups[:top]})
+
+
 # -----------------------------------------------------------------------------
 # SPARKLINES (last 30 days trends)
 # -----------------------------------------------------------------------------
 @app.route("/api/sparklines", methods=["GET"])
+@etagged
 def sparklines():
-    df = DF_RAW.copy()
-    df = df.sort_values("date")
-
-    # aggregate daily means
-    daily = (
-        df.groupby("date")
-        .agg(
-            usage_cpu=("usage_cpu", "mean"),
-            usage_storage=("usage_storage", "mean"),
-            users_active=("users_active", "mean"),
-        )
-        .reset_index()
-        .sort_values("date")
-    )
-
-    # last 30 days
-    if len(daily) > 30:
-        daily = daily.iloc[-30:]
-
-    cpu_trend = [
-        {"date": d.strftime("%Y-%m-%d"), "usage_cpu": float(v)}
-        for d, v in zip(daily["date"], daily["usage_cpu"])
-    ]
-    storage_trend = [
-        {"date": d.strftime("%Y-%m-%d"), "usage_storage": float(v)}
-        for d, v in zip(daily["date"], daily["usage_storage"])
-    ]
-    users_trend = [
-        {"date": d.strftime("%Y-%m-%d"), "users_active": float(v)}
-        for d, v in zip(daily["date"], daily["users_active"])
-    ]
-
-    return jsonify(
-        {
-            "cpu_trend": cpu_trend,
-            "storage_trend": storage_trend,
-            "users_trend": users_trend,
+    # last 30 days of global daily means
+    daily = current_dataset().cube.get(granularity="daily")
+    if daily is None:
+        return jsonify({"cpu_trend": [], "storage_trend": [], "users_trend": []})
+    daily = daily.tail(30)
+
+    def trend(metric):
+        return column_records(**{"date": daily.labels, metric: daily.mean(metric)})
+
+    with span("aggregate"):
+        result = {
+            "cpu_trend": trend("usage_cpu"),
+            "storage_trend": trend("usage_storage"),
+            "users_trend": trend("users_active"),
         }
-    )
+    return jsonify(result)
 
 
 # -----------------------------------------------------------------------------
 # RAW DATA
 # -----------------------------------------------------------------------------
 @app.route("/api/data/raw", methods=["GET"])
+@heavy
 def data_raw():
-    df = DF_RAW.copy()
-    df["date"] = df["date"].dt.strftime("%Y-%m-%d")
-    return jsonify(df.to_dict(orient="records"))
+    """
+    Streamed export of the raw rows.
+
+    Query params:
+      format      json (records, default) | columnar | ndjson | csv
+      columns     comma separated projection (default: all columns)
+      region, resource_type, start_date, end_date   same filters as get_filtered_df
+      limit       page size (default: everything)
+      offset / cursor   where the page starts; the next page's cursor is
+                  returned in the X-Next-Cursor header
+    """
+    fmt = request.args.get("format", "json").lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unknown format: {fmt}"}), 400
+
+    dataset = current_dataset()
+    columns = dataset.store.columns
+    if request.args.get("columns"):
+        requested = [c.strip() for c in request.args["columns"].split(",") if c.strip()]
+        unknown = [c for c in requested if c not in columns]
+        if unknown:
+            return jsonify({"error": f"Unknown columns: {', '.join(unknown)}"}), 400
+        columns = requested
+
+    try:
+        offset = int(request.args.get("offset", 0))
+        if request.args.get("cursor"):
+            offset = decode_cursor(request.args["cursor"])
+        limit = request.args.get("limit")
+        limit = int(limit) if limit else None
+        if offset < 0 or (limit is not None and limit < 1):
+            raise ValueError("offset must be >= 0 and limit >= 1")
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    filters = {key: request.args.get(key) for key in ("region", "resource_type", "start_date", "end_date")}
+    headers = {}
+    if fmt == "csv":
+        headers["Content-Disposition"] = "attachment; filename=raw_data.csv"
+
+    if dataset.df is None:
+        # partitioned dataset: streamed partition by partition (month, then
+        # region); the row count is not known up front, so there is no paging
+        if limit is not None or offset:
+            return jsonify({"error": "limit/offset/cursor are not supported for partitioned datasets"}), 400
+        source = frame_source(lambda cols: dataset.store.scan(columns=cols, **filters))
+        body = STREAMERS[fmt](source, columns)
+        return Response(stream_with_context(body), mimetype=EXPORT_FORMATS[fmt], headers=headers)
+
+    with span("filter"):
+        pos = dataset.store.positions(**filters)
+        page, total, next_offset = page_positions(pos, offset, limit)
+
+    headers["X-Total-Count"] = str(total)
+    if next_offset is not None:
+        headers["X-Next-Cursor"] = encode_cursor(next_offset)
+
+    body = STREAMERS[fmt](row_source(dataset.df, page), columns)
+    return Response(stream_with_context(body), mimetype=EXPORT_FORMATS[fmt], headers=headers)
 
 
 # -----------------------------------------------------------------------------
 # TIME-SERIES
 # -----------------------------------------------------------------------------
 @app.route("/api/time-series", methods=["GET"])
+@etagged
 def time_series():
     metric = request.args.get("metric", "usage_cpu")
     region = request.args.get("region")
     resource_type = request.args.get("resource_type")
     aggregation = request.args.get("aggregation", "daily")
 
-    df = get_filtered_df(
-        {"region": region, "resource_type": resource_type}
-    )
-
-    if metric not in df.columns:
+    dataset = current_dataset()
+    cube = dataset.cube
+    if metric not in cube.metrics:
         return jsonify({"error": f"Unknown metric: {metric}"}), 400
 
-    if aggregation == "weekly":
-        df["week"] = df["date"].dt.to_period("W").apply(lambda r: r.start_time)
-        group_key = "week"
-    elif aggregation == "monthly":
-        df["month"] = df["date"].dt.to_period("M").apply(lambda r: r.start_time)
-        group_key = "month"
-    else:
-        group_key = "date"
+    if aggregation not in ("weekly", "monthly"):
+        aggregation = "daily"
 
-    agg = (
-        df.groupby(group_key)[metric]
-        .mean()
-        .reset_index()
-        .sort_values(group_key)
-    )
-    agg[group_key] = pd.to_datetime(agg[group_key])
+    store = dataset.store
+    region_name = store.canonical("region", region)
+    resource_name = store.canonical("resource_type", resource_type)
+    if (region and region_name is None) or (resource_type and resource_name is None):
+        return jsonify([])
 
-    result = [
-        {
-            "date": d.strftime("%Y-%m-%d"),
-            "value": float(v),
-        }
-        for d, v in zip(agg[group_key], agg[metric])
-    ]
+    rollup = cube.get(region_name, resource_name, aggregation)
+    if rollup is None:
+        return jsonify([])
+
+    with span("aggregate"):
+        result = column_records(date=rollup.labels, value=rollup.mean(metric))
     return jsonify(result)
 
 
+# -----------------------------------------------------------------------------
+# BATCH QUERY
+# -----------------------------------------------------------------------------
+@app.route("/api/query", methods=["GET", "POST"])
+@etagged
+def query():
+    """
+    Many metrics for many series in one call (columnar).
+
+    Params (query string, or a JSON body on POST):
+      metrics         list or comma separated (default usage_cpu)
+      regions         list or comma separated; omitted/"all" = all regions combined
+      resource_types  same for resource types; every region x resource_type
+                      pair is returned
+      series          optional explicit [{"region": ..., "resource_type": ...}]
+                      instead of the regions x resource_types grid
+      granularity     daily (default) | weekly | monthly
+      start_date, end_date   inclusive date range
+      agg             mean (default) | sum
+
+    Response: {"dates": [...], "series": [{"region", "resource_type",
+    "values": {metric: [...]}}]} with null where a bucket has no data.
+    """
+    params = request.args.to_dict()
+    if request.method == "POST":
+        params.update(request.get_json(silent=True) or {})
+
+    def as_list(value):
+        if value is None:
+            return []
+        if isinstance(value, str):
+            value = value.split(",")
+        if not isinstance(value, list):
+            raise ValueError("expected a list or a comma separated string")
+        return [str(v).strip() for v in value if v is not None and str(v).strip()]
+
+    dataset = current_dataset()
+    cube, store = dataset.cube, dataset.store
+    try:
+        metrics = as_list(params.get("metrics")) or ["usage_cpu"]
+        regions = as_list(params.get("regions"))
+        resource_types = as_list(params.get("resource_types"))
+        start = pd.to_datetime(params["start_date"]) if params.get("start_date") else None
+        end = pd.to_datetime(params["end_date"]) if params.get("end_date") else None
+    except (ValueError, TypeError) as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    unknown = [m for m in metrics if m not in cube.metrics]
+    if unknown:
+        return jsonify({"error": f"Unknown metrics: {', '.join(unknown)}"}), 400
+    granularity = params.get("granularity", "daily")
+    if granularity not in GRANULARITIES:
+        return jsonify({"error": f"Unknown granularity: {granularity}"}), 400
+    agg = params.get("agg", "mean")
+    if agg not in ("mean", "sum"):
+        return jsonify({"error": f"Unknown agg: {agg}"}), 400
+
+    def resolve(col, name):
+        if name is None or name.lower() == "all":
+            return None, True
+        value = store.canonical(col, name)
+        return value, value is not None
+
+    if params.get("series"):
+        specs = params["series"]
+        if not isinstance(specs, list) or not all(isinstance(x, dict) for x in specs):
+            return jsonify({"error": "series must be a list of objects"}), 400
+    else:
+        specs = [
+            {"region": r, "resource_type": t}
+            for r in regions or [None]
+            for t in resource_types or [None]
+        ]
+    series, bad = [], []
+    for spec in specs:
+        region, ok_region = resolve("region", spec.get("region"))
+        resource_type, ok_type = resolve("resource_type", spec.get("resource_type"))
+        if ok_region and ok_type:
+            series.append((region, resource_type))
+        else:
+            bad.append(spec)
+    if bad:
+        return jsonify({"error": "Unknown series", "series": bad}), 400
+
+    with span("aggregate"):
+        labels, sums, counts = cube.query(series, metrics, granularity, start, end)
+        if agg == "mean":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                values = sums / counts
+        else:
+            values = sums
+        values = np.where(counts > 0, values, np.nan)
+        payload = [
+            {
+                "region": region,
+                "resource_type": resource_type,
+                "values": {metric: values[i, j] for j, metric in enumerate(metrics)},
+            }
+            for i, (region, resource_type) in enumerate(series)
+        ]
+    return jsonify({
+        "granularity": granularity,
+        "agg": agg,
+        "metrics": metrics,
+        "dates": iso_dates(labels),
+        "series": payload,
+    })
+
+
+# -----------------------------------------------------------------------------
+# ENGINEERED FEATURES
+# -----------------------------------------------------------------------------
+# Built once per dataset version from the rollup cube; an append only
+# recomputes the days from the batch on.
+DATASETS.add_incremental(
+    "features", lambda table, batch, ds: table.updated(ds.cube, batch["date"].min())
+)
+
+
+@app.route("/api/features", methods=["GET"])
+@etagged
+def features():
+    """
+    Lag and rolling-window features per region x resource_type day (the
+    columns of feature_engineered.csv, kept current with the data).
+
+    Query params:
+      region, resource_type   optional series filters
+      start_date, end_date    inclusive date range
+      columns                 comma separated projection (default: all columns)
+      format                  json (records, default) | columnar
+
+    Lags are null on the first days of a series; rolling windows include the
+    current day and are shorter at the start of a series.
+    """
+    fmt = request.args.get("format", "json").lower()
+    if fmt not in ("json", "columnar"):
+        return jsonify({"error": f"Unknown format: {fmt}"}), 400
+
+    dataset = current_dataset()
+    table = dataset.derived("features", FeatureTable.from_dataset)
+    columns = table.names
+    if request.args.get("columns"):
+        requested = [c.strip() for c in request.args["columns"].split(",") if c.strip()]
+        unknown = [c for c in requested if c not in columns]
+        if unknown:
+            return jsonify({"error": f"Unknown columns: {', '.join(unknown)}"}), 400
+        columns = requested
+    try:
+        start = pd.to_datetime(request.args["start_date"]) if request.args.get("start_date") else None
+        end = pd.to_datetime(request.args["end_date"]) if request.args.get("end_date") else None
+    except (ValueError, TypeError) as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    region, resource_type = request.args.get("region"), request.args.get("resource_type")
+    region_name = dataset.store.canonical("region", region)
+    service_name = dataset.store.canonical("resource_type", resource_type)
+    if (region and region_name is None) or (resource_type and service_name is None):
+        pos = np.empty(0, dtype=np.int64)
+    else:
+        with span("filter"):
+            pos = table.positions(region_name, service_name, start, end)
+
+    with span("aggregate"):
+        regions, resources = table.labels(pos)
+        data = {}
+        for name in columns:
+            if name == "date":
+                data[name] = iso_dates(table.dates[pos])
+            elif name == "region":
+                data[name] = regions
+            elif name == "resource_type":
+                data[name] = resources
+            else:
+                data[name] = table.columns[name][pos]
+    if fmt == "columnar":
+        return jsonify({"columns": columns, "data": data})
+    return jsonify(column_records(**data))
+
+
 # -----------------------------------------------------------------------------
 # FORECAST ENDPOINT
 # -----------------------------------------------------------------------------
 @app.route("/api/forecast", methods=["GET"])
+@etagged
+@heavy
 def forecast():
-    metric_map = {
-        "cpu": "usage_cpu",
-        "storage": "usage_storage",
-        "users": "users_active",
-    }
-
     metric_key = request.args.get("metric", "cpu")
-    metric_col = metric_map.get(metric_key, "usage_cpu")
+    metric_col = METRIC_MAP.get(metric_key, "usage_cpu")
     region = request.args.get("region")
     service = request.args.get("service")
-    horizon = int(request.args.get("horizon", 30))
-    _model = request.args.get("model", "best")
+    model = parse_model(request.args.get("model"))
+    try:
+        horizon = parse_horizon(request.args.get("horizon", 30))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    dataset = current_dataset()
+    engine = dataset.derived("forecast_engine", ForecastEngine.from_dataset)
+    key = engine.key(
+        dataset.store.canonical("region", region),
+        dataset.store.canonical("resource_type", service),
+        metric_col,
+    )
+    if key not in engine.panel.index or (region and not key[0]) or (service and not key[1]):
+        return jsonify([])
 
-    df = get_filtered_df(
-        {"region": region, "resource_type": service}
-    ).sort_values("date")
+    result = lookup_forecasts(dataset, horizon, model, [key])
+    return jsonify(result.records(0))
+
+
+@app.route("/api/forecast/batch", methods=["GET", "POST"])
+@heavy
+def forecast_batch():
+    """
+    Forecast many series in one call.
+
+    POST body: {"series": [{"region": ..., "service": ..., "metric": "cpu"}, ...],
+                "horizon": 30, "model": "best"}
+    GET (or a POST without "series") forecasts every region x service x metric.
+    Region/service may be omitted in an entry to get the all-regions /
+    all-services aggregate.
+    """
+    params = request.args.to_dict()
+    if request.method == "POST":
+        params.update(request.get_json(silent=True) or {})
+    model = parse_model(params.get("model"))
+    try:
+        horizon = parse_horizon(params.get("horizon", 30))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    dataset = current_dataset()
+    store = dataset.store
+    engine = dataset.derived("forecast_engine", ForecastEngine.from_dataset)
+
+    if params.get("series"):
+        if not isinstance(params["series"], list) or not all(isinstance(x, dict) for x in params["series"]):
+            return jsonify({"error": "series must be a list of objects"}), 400
+        keys, unknown = [], []
+        for spec in params["series"]:
+            metric_col = METRIC_MAP.get(spec.get("metric", "cpu"))
+            region = store.canonical("region", spec.get("region"))
+            service = store.canonical("resource_type", spec.get("service"))
+            key = engine.key(region, service, metric_col)
+            if (
+                metric_col is None
+                or key not in engine.panel.index
+                or (spec.get("region") and not region)
+                or (spec.get("service") and not service)
+            ):
+                unknown.append(spec)
+            else:
+                keys.append(key)
+        if unknown:
+            return jsonify({"error": "Unknown series", "series": unknown}), 400
+    else:
+        keys = [k for k in engine.panel.keys if k[0] and k[1]]
 
-    if metric_col not in df.columns:
-        return jsonify({"error": f"Metric column not found: {metric_col}"}), 400
+    result = lookup_forecasts(dataset, horizon, model, keys)
+    metric_names = {v: k for k, v in METRIC_MAP.items()}
+    series = [
+        {
+            "region": region,
+            "service": service,
+            "metric": metric_names.get(metric_col, metric_col),
+            "model": str(result.models[i]),
+            "forecast_value": result.forecast[i].tolist(),
+            "lower_ci": result.lower[i].tolist(),
+            "upper_ci": result.upper[i].tolist(),
+        }
+        for i, (region, service, metric_col) in enumerate(result.keys)
+    ]
+    return jsonify({"dates": result.labels.tolist(), "series": series})
 
-    if df.empty:
-        return jsonify([])
 
-    # Baseline forecast: simple moving average of last 7 days + small trend
-    last_window = df.tail(7)[metric_col]
-    baseline = last_window.mean()
-    if len(last_window) > 1:
-        slope = (last_window.iloc[-1] - last_window.iloc[0]) / (len(last_window) - 1)
-    else:
-        slope = 0.0
-
-    last_date = df["date"].max()
-    result = []
-    for i in range(1, horizon + 1):
-        forecast_date = last_date + timedelta(days=i)
-        forecast_val = baseline + slope * i
-        lower = forecast_val * 0.9
-        upper = forecast_val * 1.1
-        result.append(
-            {
-                "date": forecast_date.strftime("%Y-%m-%d"),
-                "forecast_value": float(forecast_val),
-                "actual_value": None,
-                "lower_ci": float(lower),
-                "upper_ci": float(upper),
-            }
-        )
+MAX_HORIZON = 365
 
-    return jsonify(result)
+
+def lookup_forecasts(dataset, horizon, model, keys):
+    """Serve from the precomputed store; compute inline only if it is not ready."""
+    engine = dataset.derived("forecast_engine", ForecastEngine.from_dataset)
+    rows = [engine.panel.index[k] for k in keys]
+    with span("model"):
+        result = FORECASTS.get(dataset.version, model, horizon, rows)
+        if result is None:
+            result = engine.forecast(horizon, model, keys=keys)
+    return result
+
+
+def parse_horizon(value):
+    try:
+        horizon = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("horizon must be an integer") from None
+    if not 1 <= horizon <= MAX_HORIZON:
+        raise ValueError(f"horizon must be between 1 and {MAX_HORIZON}")
+    return horizon
+
+
+def parse_model(value):
+    # the dashboard still offers arima/lightgbm/lstm; anything unknown means "best"
+    value = (value or "best").lower()
+    return value if value in MODELS else "best"
 
 
 # -----------------------------------------------------------------------------
 # MODEL COMPARISON
 # -----------------------------------------------------------------------------
 @app.route("/api/model-comparison", methods=["GET"])
+@etagged
 def model_comparison():
     metric = request.args.get("metric", "cpu")
+    metric_col = METRIC_MAP.get(metric, "usage_cpu")
 
-    models = [
-        {
-            "name": "ARIMA",
-            "mae": 12.4,
-            "rmse": 18.2,
-            "mape": 6.5,
-            "train_time": 3.1,
-            "infer_time": 1.2,
-            "is_best": False,
-        },
-        {
-            "name": "LightGBM",
-            "mae": 8.1,
-            "rmse": 12.3,
-            "mape": 4.1,
-            "train_time": 12.4,
-            "infer_time": 3.5,
-            "is_best": metric in ["cpu", "storage"],
-        },
-        {
-            "name": "LSTM",
-            "mae": 7.5,
-            "rmse": 11.0,
-            "mape": 3.9,
-            "train_time": 30.0,
-            "infer_time": 5.0,
-            "is_best": metric == "users",
-        },
-    ]
-    return jsonify(models)
+    results = BACKTESTS.get(current_dataset().version)
+    if results is None:
+        response = jsonify({"error": "Backtests for this dataset version are still running"})
+        response.headers["Retry-After"] = "5"
+        return response, 503
+    return jsonify(results.summary(metric_col))
 
 
 # -----------------------------------------------------------------------------
 # CAPACITY PLANNING
 # -----------------------------------------------------------------------------
+def capacity_selection(dataset, region, service, metric):
+    """
+    (CapacityBase, group indices, metric columns) selected by the region,
+    service and metric params of the capacity endpoints. "Compute" is the
+    legacy service alias for all resource types with the cpu metric; an
+    unknown metric raises ValueError, an unknown region or service selects
+    no groups.
+    """
+    store = dataset.store
+    if service and service.lower() == "compute" and store.canonical("resource_type", service) is None:
+        service, metric = None, "cpu"
+    if metric == "all":
+        metric_cols = list(METRIC_MAP.values())
+    elif metric in METRIC_MAP:
+        metric_cols = [METRIC_MAP[metric]]
+    else:
+        raise ValueError(f"Unknown metric: {metric}")
+
+    with span("aggregate"):
+        features = dataset.derived("features", FeatureTable.from_dataset)
+        base = dataset.derived(
+            "capacity_base", lambda ds: CapacityBase(features, list(METRIC_MAP.values()))
+        )
+    region_name = store.canonical("region", region)
+    service_name = store.canonical("resource_type", service)
+    if (region and region_name is None) or (service and service_name is None):
+        return base, [], metric_cols
+    groups = [
+        i for i, (reg, res) in enumerate(base.groups)
+        if (region_name is None or reg == region_name) and (service_name is None or res == service_name)
+    ]
+    return base, groups, metric_cols
+
+
 @app.route("/api/capacity-planning", methods=["GET"])
+@etagged
 def capacity_planning():
+    """
+    Demand vs capacity for every region x resource_type group in one call.
+
+    Query params:
+      region    optional region filter
+      service   optional resource_type filter ("Compute" is the legacy
+                alias for all resource types with the cpu metric)
+      metric    cpu (default) | storage | users | all
+      horizon   forecast days used for the demand side
+    """
     region = request.args.get("region")
-    service = request.args.get("service", "Compute")
-    _horizon = int(request.args.get("horizon", 30))
-
-    df = get_filtered_df({"region": region})
-    if df.empty:
+    service = request.args.get("service")
+    metric = request.args.get("metric", "cpu")
+    try:
+        horizon = parse_horizon(request.args.get("horizon", 30))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    dataset = current_dataset()
+    try:
+        base, groups, metric_cols = capacity_selection(dataset, region, service, metric)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    if not groups:
         return jsonify([])
 
-    rows = []
-    grouped = df.groupby(["region", "resource_type"])
-    for (reg, res), g in grouped:
-        if service == "Compute" and "usage_cpu" in g.columns:
-            demand_metric = g["usage_cpu"]
-        elif service == "Storage" and "usage_storage" in g.columns:
-            demand_metric = g["usage_storage"]
-        else:
-            continue
+    keys = [(base.groups[i][0], base.groups[i][1], m) for m in metric_cols for i in groups]
+    # forecast demand over the horizon comes from the precomputed store
+    predicted = lookup_forecasts(dataset, horizon, "best", keys)
+    demand = predicted.forecast.max(axis=1)
+    with span("aggregate"):
+        capacity = np.concatenate([base.capacity[m][groups] for m in metric_cols])
+        recent = np.concatenate([base.recent[m][groups] for m in metric_cols])
+        result = plan(demand, capacity)
+
+    metric_names = {v: k for k, v in METRIC_MAP.items()}
+    rows = [
+        {
+            "region": reg,
+            "service": res,
+            "metric": metric_names[m],
+            "forecast_demand": round(float(demand[i]), 2),
+            "recent_demand": round(float(recent[i]), 2),
+            "available_capacity": round(float(capacity[i]), 2),
+            "utilization": round(float(result["utilization"][i]), 3),
+            "recommended_adjustment": f"{result['adjustment'][i]:+.0f} units",
+            "risk_level": str(result["risk"][i]),
+        }
+        for i, (reg, res, m) in enumerate(keys)
+    ]
+    return jsonify(rows)
 
-        forecast_demand = float(demand_metric.tail(7).mean()) * 1.1
-        available_capacity = float(demand_metric.tail(30).max())
 
-        gap = forecast_demand - available_capacity
-        if gap > 0:
-            recommended = f"+{gap:.0f} units"
-        else:
-            recommended = f"{gap:.0f} units"
+DEFAULT_SIMULATION_PATHS = 2000
+MAX_SIMULATION_PATHS = 20000
+SCENARIO_KNOBS = ("user_growth", "economic_index_shift", "cloud_market_demand_shift")
+
+
+@app.route("/api/capacity/simulate", methods=["GET", "POST"])
+@etagged
+@heavy
+def capacity_simulate():
+    """
+    What-if Monte Carlo over the capacity-planning groups.
+
+    Params (query string, or a JSON body on POST):
+      region, service, metric   as for /api/capacity-planning
+      horizon                   forecast days simulated (default 30)
+      user_growth               % growth of active users, reached on the last day
+      holiday_rate              share of holiday days (0..1); omitted = none drawn
+      economic_index_shift      % shift of economic_index
+      cloud_market_demand_shift % shift of cloud_market_demand
+      paths                     trajectories per series (default 2000)
+      seed                      random seed (default 0), same seed = same result
+      confidence                quantile of the simulated peak recommended as
+                                capacity (default 0.95)
+
+    Per series: the probability that demand exceeds the available capacity
+    on some day of the horizon, percentiles of the simulated peak and the
+    matching headroom (% above the current capacity the peak needs;
+    negative = spare).
+    """
+    params = request.args.to_dict()
+    if request.method == "POST":
+        params.update(request.get_json(silent=True) or {})
+    try:
+        horizon = parse_horizon(params.get("horizon", 30))
+        paths = int(params.get("paths", DEFAULT_SIMULATION_PATHS))
+        seed = int(params.get("seed", 0))
+        confidence = float(params.get("confidence", 0.95))
+        scenario = {knob: float(params.get(knob) or 0.0) for knob in SCENARIO_KNOBS}
+        holiday_rate = params.get("holiday_rate")
+        holiday_rate = None if holiday_rate in (None, "") else float(holiday_rate)
+    except (TypeError, ValueError) as exc:
+        return jsonify({"error": f"Invalid parameter: {exc}"}), 400
+    if not 1 <= paths <= MAX_SIMULATION_PATHS:
+        return jsonify({"error": f"paths must be between 1 and {MAX_SIMULATION_PATHS}"}), 400
+    if not 0 < confidence < 1:
+        return jsonify({"error": "confidence must be between 0 and 1"}), 400
+    if holiday_rate is not None and not 0 <= holiday_rate <= 1:
+        return jsonify({"error": "holiday_rate must be between 0 and 1"}), 400
+    if not all(np.isfinite(v) for v in scenario.values()):
+        return jsonify({"error": "scenario shifts must be finite"}), 400
+
+    dataset = current_dataset()
+    try:
+        base, groups, metric_cols = capacity_selection(
+            dataset, params.get("region"), params.get("service"), params.get("metric", "cpu")
+        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    response = {
+        "scenario": {**scenario, "holiday_rate": holiday_rate},
+        "horizon": horizon,
+        "paths": paths,
+        "confidence": confidence,
+        "series": [],
+    }
+    if not groups:
+        return jsonify(response)
+
+    keys = [(base.groups[i][0], base.groups[i][1], m) for m in metric_cols for i in groups]
+    predicted = lookup_forecasts(dataset, horizon, "best", keys)
+    engine = dataset.derived("forecast_engine", ForecastEngine.from_dataset)
+    with span("model"):
+        simulator = dataset.derived(
+            "simulator", lambda ds: DemandSimulator.from_dataset(ds, engine, list(METRIC_MAP.values()))
+        )
+        capacity = np.concatenate([base.capacity[m][groups] for m in metric_cols])
+        result = simulator.simulate(
+            [simulator.index[k] for k in keys], predicted.forecast, capacity,
+            paths=paths, seed=seed, holiday_rate=holiday_rate, confidence=confidence, **scenario,
+        )
 
-        ratio = forecast_demand / available_capacity if available_capacity > 0 else 0
-        if ratio > 1.15:
-            risk = "high"
-        elif ratio > 0.95:
-            risk = "medium"
-        else:
-            risk = "low"
+    labels = [quantile_label(q) for q in PEAK_QUANTILES]
+    metric_names = {v: k for k, v in METRIC_MAP.items()}
 
-        rows.append(
-            {
-                "region": reg,
-                "service": service,
-                "forecast_demand": round(forecast_demand, 2),
-                "available_capacity": round(available_capacity, 2),
-                "recommended_adjustment": recommended,
-                "risk_level": risk,
-            }
-        )
+    def rounded(values, digits=2):
+        return {label: None if np.isnan(v) else round(float(v), digits) for label, v in zip(labels, values)}
 
-    return jsonify(rows)
+    response["series"] = [
+        {
+            "region": reg,
+            "service": res,
+            "metric": metric_names[m],
+            "available_capacity": round(float(capacity[i]), 2),
+            "baseline_peak": round(float(result["baseline_peak"][i]), 2),
+            "expected_peak": round(float(result["expected_peak"][i]), 2),
+            "peak_percentiles": rounded(result["peak"][i]),
+            "headroom_percentiles": rounded(result["headroom"][i], 1),
+            "recommended_capacity": round(float(result["recommended_capacity"][i]), 2),
+            "breach_probability": round(float(result["breach_probability"][i]), 4),
+            "risk_level": str(result["risk"][i]),
+        }
+        for i, (reg, res, m) in enumerate(keys)
+    ]
+    return jsonify(response)
 
 
 # -----------------------------------------------------------------------------
@@ -485,171 +1199,334 @@ def capacity_planning():
 @app.route("/api/monitoring", methods=["GET"])
 def monitoring():
     metric = request.args.get("metric", "cpu")
-    window_days = int(request.args.get("windowDays", 30))
+    metric_col = METRIC_MAP.get(metric, "usage_cpu")
+    try:
+        window_days = int(request.args.get("windowDays", 30))
+    except ValueError:
+        return jsonify({"error": "windowDays must be an integer"}), 400
+
+    store = current_dataset().store
+    filters = {}
+    for col, param in (("region", "region"), ("resource_type", "service")):
+        value = request.args.get(param)
+        filters[col] = store.canonical(col, value)
+        if value and filters[col] is None:
+            return jsonify({"error": f"Unknown {param}: {value}"}), 400
+    region, service = filters["region"], filters["resource_type"]
+    monitor = MONITORING.monitor
+    keys = [
+        k for k in (monitor.keys if monitor else [])
+        if k[0] and k[1] and k[2] == metric_col
+        and (region is None or k[0] == region)
+        and (service is None or k[1] == service)
+    ]
 
-    today = datetime.today().date()
-    dates = [today - timedelta(days=i) for i in range(window_days)][::-1]
+    result = MONITORING.summary(keys, max(1, window_days))
+    if result is None:
+        response = jsonify({"error": "Monitoring has not run for this dataset yet"})
+        response.headers["Retry-After"] = "5"
+        return response, 503
+    return jsonify(result)
 
-    base = 90.0
-    noise = np.random.normal(0, 2, size=len(dates))
-    trend = base + np.linspace(-2, 2, len(dates)) + noise
-    trend = np.clip(trend, 70, 99)
 
-    accuracy_trend = [
-        {"date": d.strftime("%Y-%m-%d"), "value": float(v)}
-        for d, v in zip(dates, trend)
+# -----------------------------------------------------------------------------
+# ANOMALY ALERTS
+# -----------------------------------------------------------------------------
+# Detector state is built once per dataset version; an append feeds only the
+# new days through it.
+ALERT_METRICS = tuple(METRIC_MAP.values())
+MAX_ALERTS_PAGE = 1000
+
+DATASETS.add_incremental(
+    "anomalies",
+    lambda detector, batch, ds: detector.advanced(ds.cube, ALERT_METRICS, batch["date"].min()),
+)
+
+
+@app.route("/api/alerts", methods=["GET"])
+@etagged
+def alerts():
+    """
+    Anomalous days of every region x resource_type x metric series, most
+    severe first.
+
+    Query params:
+      region, resource_type (or service)   optional series filters
+      metric        cpu | storage | users | all (default)
+      severity      minimum severity: medium (default) | high | critical
+      detector      only alerts raised by zscore | ewma | seasonal
+      start_date, end_date   inclusive date range
+      limit         page size (default 50, at most MAX_ALERTS_PAGE)
+      offset / cursor   where the page starts; ``next_cursor`` in the
+                    response points at the next page
+    """
+    metric = request.args.get("metric", "all")
+    if metric != "all" and metric not in METRIC_MAP:
+        return jsonify({"error": f"Unknown metric: {metric}"}), 400
+    bounds = dict(SEVERITIES)
+    severity = request.args.get("severity", SEVERITIES[-1][0])
+    if severity not in bounds:
+        return jsonify({"error": f"Unknown severity: {severity}"}), 400
+    detector_name = request.args.get("detector")
+    if detector_name and detector_name not in DETECTORS:
+        return jsonify({"error": f"Unknown detector: {detector_name}"}), 400
+    try:
+        offset = int(request.args.get("offset", 0))
+        if request.args.get("cursor"):
+            offset = decode_cursor(request.args["cursor"])
+        limit = int(request.args.get("limit", 50))
+        if offset < 0 or not 1 <= limit <= MAX_ALERTS_PAGE:
+            raise ValueError(f"offset must be >= 0 and limit between 1 and {MAX_ALERTS_PAGE}")
+        start = pd.to_datetime(request.args["start_date"]) if request.args.get("start_date") else None
+        end = pd.to_datetime(request.args["end_date"]) if request.args.get("end_date") else None
+    except (ValueError, TypeError) as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    dataset = current_dataset()
+    store = dataset.store
+    region = request.args.get("region")
+    service = request.args.get("resource_type") or request.args.get("service")
+    region_name = store.canonical("region", region)
+    service_name = store.canonical("resource_type", service)
+    if (region and region_name is None) or (service and service_name is None):
+        return jsonify({"total": 0, "alerts": [], "next_cursor": None})
+
+    with span("aggregate"):
+        detector = dataset.derived("anomalies", lambda ds: AnomalyDetector.from_cube(ds.cube, ALERT_METRICS))
+    metric_col = None if metric == "all" else METRIC_MAP[metric]
+    series = None
+    if region_name or service_name or metric_col:
+        series = [
+            i for i, (reg, res, m) in enumerate(detector.keys)
+            if (region_name is None or reg == region_name)
+            and (service_name is None or res == service_name)
+            and (metric_col is None or m == metric_col)
+        ]
+    with span("filter"):
+        pos = detector.select(series, start, end, bounds[severity], detector_name)
+        page, total, next_offset = page_positions(pos, offset, limit)
+
+    a = detector.alerts
+    keys = [detector.keys[i] for i in a["series"][page]]
+    score = a["score"][page]
+    fired = a["detectors"][page]
+    metric_names = {v: k for k, v in METRIC_MAP.items()}
+    rows = [
+        {
+            "date": date,
+            "region": reg,
+            "resource_type": res,
+            "metric": metric_names[m],
+            "value": round(float(value), 2),
+            "expected": round(float(expected), 2),
+            "score": round(float(z), 2),
+            "severity": level,
+            "direction": "spike" if z > 0 else "drop",
+            "detectors": [name for bit, name in enumerate(DETECTORS) if flags >> bit & 1],
+        }
+        for date, (reg, res, m), value, expected, z, level, flags in zip(
+            iso_dates(a["date"][page]), keys, a["value"][page], a["expected"][page],
+            score, severity_of(np.abs(score)), fired,
+        )
     ]
+    return jsonify({
+        "total": total,
+        "alerts": rows,
+        "next_cursor": encode_cursor(next_offset) if next_offset is not None else None,
+    })
 
-    current_accuracy = float(trend[-1])
-    drift = float(trend[-1] - trend[0])
 
-    if current_accuracy > 85:
-        health = "green"
-    elif current_accuracy > 70:
-        health = "yellow"
-    else:
-        health = "red"
-
-    result = {
-        "accuracy_trend": accuracy_trend,
-        "current_accuracy": current_accuracy,
-        "drift": drift,
-        "last_retrain": (today - timedelta(days=7)).strftime("%Y-%m-%d"),
-        "health": health,
-    }
-    return jsonify(result)
+# -----------------------------------------------------------------------------
+# DRIVER ANALYSIS
+# -----------------------------------------------------------------------------
+@app.route("/api/drivers", methods=["GET"])
+@etagged
+def drivers():
+    """
+    Correlations, lagged cross-correlations and holiday/weekend effects of
+    usage vs economic_index, cloud_market_demand and holiday.
+
+    Query params:
+      group_by      series (default: every region x resource_type) | region
+                    | resource_type | all
+      region, resource_type   filters
+      metric        cpu | storage | users (or the column name); default all
+      max_lag       days of driver lead in the cross-correlations (0..MAX_LAG,
+                    default MAX_LAG)
+      start_date, end_date    inclusive range; the full range is precomputed
+                              per dataset version, other ranges are computed
+                              from the cached daily panel
+
+    Correlations are null where a pair has too few shared days or no
+    variance.
+    """
+    group_by = request.args.get("group_by", "series")
+    if group_by not in GROUP_LEVELS:
+        return jsonify({"error": f"Unknown group_by: {group_by}"}), 400
+    metric = request.args.get("metric")
+    if metric:
+        metric = METRIC_MAP.get(metric, metric)
+        if metric not in USAGE_METRICS:
+            return jsonify({"error": f"Unknown metric: {request.args['metric']}"}), 400
+    metrics = [metric] if metric else list(USAGE_METRICS)
+    try:
+        max_lag = int(request.args.get("max_lag", MAX_LAG))
+        if not 0 <= max_lag <= MAX_LAG:
+            raise ValueError(f"max_lag must be between 0 and {MAX_LAG}")
+        start = pd.to_datetime(request.args["start_date"]) if request.args.get("start_date") else None
+        end = pd.to_datetime(request.args["end_date"]) if request.args.get("end_date") else None
+    except (ValueError, TypeError) as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    dataset = current_dataset()
+    store = dataset.store
+    filters = {}
+    for col in ("region", "resource_type"):
+        value = request.args.get(col)
+        filters[col] = store.canonical(col, value)
+        if value and filters[col] is None:
+            return jsonify({"error": f"Unknown {col}: {value}"}), 400
+
+    with span("aggregate"):
+        analysis = dataset.derived("drivers", DriverAnalysis.from_dataset)
+        rows = analysis.select(group_by, filters["region"], filters["resource_type"])
+        if start is None and end is None:
+            result, positions = analysis.results, rows
+        else:
+            result, positions = analysis.compute(start, end, rows), range(len(rows))
+
+    def value(x, digits=4):
+        return None if np.isnan(x) else round(float(x), digits)
+
+    m_idx = [USAGE_METRICS.index(m) for m in metrics]
+    groups = []
+    for key, i in zip(rows, positions):
+        region, resource_type = analysis.keys[key]
+        corr = result["correlation"][i]
+        cross = result["cross_correlation"][i]
+        cross_correlation = {}
+        for m, a in zip(metrics, m_idx):
+            cross_correlation[m] = {}
+            for b, driver in enumerate(DRIVERS):
+                r = cross[a, b, :max_lag + 1]
+                best = None if np.isnan(r).all() else int(np.nanargmax(np.abs(r)))
+                cross_correlation[m][driver] = {
+                    "r": [value(x) for x in r],
+                    "best_lag": best,
+                    "best_r": None if best is None else value(r[best]),
+                }
+        effects = {
+            name: {
+                m: {
+                    "mean_on": value(stats["mean_on"][i, a], 2),
+                    "mean_off": value(stats["mean_off"][i, a], 2),
+                    "lift_pct": value(stats["lift_pct"][i, a], 2),
+                    "effect_size": value(stats["effect_size"][i, a], 3),
+                    "days_on": int(stats["days_on"][i, a]),
+                    "days_off": int(stats["days_off"][i, a]),
+                }
+                for m, a in zip(metrics, m_idx)
+            }
+            for name, stats in result["effects"].items()
+        }
+        groups.append({
+            "region": region,
+            "resource_type": resource_type,
+            "days": int(result["days"][i]),
+            "correlation": {
+                v: {w: value(corr[a, b]) for b, w in enumerate(VARIABLES)} for a, v in enumerate(VARIABLES)
+            },
+            "cross_correlation": cross_correlation,
+            "effects": effects,
+        })
+    return jsonify({
+        "group_by": group_by,
+        "variables": list(VARIABLES),
+        "drivers": list(DRIVERS),
+        "max_lag": max_lag,
+        "groups": groups,
+    })
 
 
 # -----------------------------------------------------------------------------
 # CHATBOT (Context-Aware)
 # -----------------------------------------------------------------------------
-from flask import session
-
-# Enable server-side session memory
+# Only a chat id lives in the (signed) cookie; the last CHAT_HISTORY_TURNS
+# messages of each conversation are kept server-side.
 app.secret_key = "supersecretkey123"   # (Replace with a real key)
 app.config["SESSION_PERMANENT"] = False
 
+CHAT_SESSION_BACKEND = os.environ.get("CHAT_SESSION_BACKEND", "memory")
+CHAT_SESSION_DB = os.environ.get("CHAT_SESSION_DB", os.path.join(DATA_DIR, ".cache", "chat_sessions.sqlite3"))
+CHAT_SESSION_TTL = float(os.environ.get("CHAT_SESSION_TTL", "3600"))
+CHAT_SESSION_MAX = int(os.environ.get("CHAT_SESSION_MAX", "10000"))
+CHAT_HISTORY_TURNS = int(os.environ.get("CHAT_HISTORY_TURNS", "20"))
+CHAT_SESSIONS = make_session_store(
+    CHAT_SESSION_BACKEND, history=CHAT_HISTORY_TURNS, ttl=CHAT_SESSION_TTL,
+    path=CHAT_SESSION_DB, maxsize=CHAT_SESSION_MAX,
+)
+
 
 @app.route("/api/chatbot", methods=["POST"])
 def chatbot():
-    from flask import session
-
     data = request.get_json()
     raw_msg = (data.get("message") or "").strip()
-    msg = raw_msg.lower()
 
     # Init memory
-    if "chat_history" not in session:
-        session["chat_history"] = []
-    history = session["chat_history"]
-    history.append({"role": "user", "content": raw_msg})
-
-    # Normalizer: strip punctuation, collapse whitespace, keep only alnum + spaces
-    import re
-    def normalize_text(s: str) -> str:
-        return re.sub(r"\s+", " ", re.sub(r"[^a-z0-9 ]+", " ", s.lower())).strip()
-
-    norm_msg = normalize_text(msg)
-
-    # Helper: match multi-word candidates robustly
-    def find_best_matches(candidates):
-        """
-        Return list of candidates that match the message.
-        Matching strategy (in order):
-         1) normalized full-candidate is substring of normalized message (multiword exact)
-         2) all candidate tokens present in message tokens (order not required)
-         3) at least one token present (fallback)
-        Return candidates sorted by token count desc (prefer longer/more specific names).
-        """
-        cand_norm = []
-        for c in candidates:
-            c_norm = normalize_text(str(c))
-            tokens = [t for t in c_norm.split() if t]
-            cand_norm.append((c, c_norm, tokens))
-
-        # Prefer exact substring matches first
-        exact = [c for (c, c_norm, tokens) in cand_norm if c_norm and c_norm in norm_msg]
-        if exact:
-            # sort by token count desc
-            return sorted(exact, key=lambda x: -len(normalize_text(x).split()))
-
-        msg_tokens = norm_msg.split()
-        all_tokens = []
-        partial = []
-        for (c, c_norm, tokens) in cand_norm:
-            if tokens and all(t in msg_tokens for t in tokens):
-                all_tokens.append(c)
-            elif tokens and any(t in msg_tokens for t in tokens):
-                partial.append(c)
-
-        if all_tokens:
-            return sorted(all_tokens, key=lambda x: -len(normalize_text(x).split()))
-        if partial:
-            return sorted(partial, key=lambda x: -len(normalize_text(x).split()))
-        return []
-
-    # Collect candidate lists
-    regions = list(DF_RAW["region"].dropna().unique())
-    services = list(DF_RAW["resource_type"].dropna().unique())
-
-    # RULE 1: Region comparison (explicit "compare" or " vs " or " vs. ")
-    if "compare" in norm_msg or " vs " in norm_msg:
-        found_regions = find_best_matches(regions)
-        if len(found_regions) >= 2:
-            r1, r2 = found_regions[0], found_regions[1]
-            reply = compare_regions(r1, r2)
-            history.append({"role": "assistant", "content": reply})
-            session["chat_history"] = history
-            return jsonify({"response": reply})
-
-    # RULE 2: Service summary (e.g., "compute service summary" or "storage summary")
-    found_services = find_best_matches(services)
-    if found_services:
-        svc = found_services[0]
-        reply = summarize_service(svc)
-        history.append({"role": "assistant", "content": reply})
-        session["chat_history"] = history
-        return jsonify({"response": reply})
-
-    # RULE 3: Region summary (single region mentioned)
-    found_regions = find_best_matches(regions)
-    if len(found_regions) >= 1:
-        r = found_regions[0]
-        reply = summarize_region(r)
-        history.append({"role": "assistant", "content": reply})
-        session["chat_history"] = history
-        return jsonify({"response": reply})
-
-    # RULE 4: Forecast / Capacity / Highest
-    if "forecast" in norm_msg:
-        reply = "To generate forecasts, open the Forecast page and choose region, service, and model."
-    elif "capacity" in norm_msg:
-        reply = "Capacity planning highlights demand–capacity gaps and recommended adjustments."
-    elif "highest" in norm_msg or "max" in norm_msg:
-        df = DF_RAW.groupby("region")["usage_cpu"].mean().sort_values(ascending=False)
-        reply = f"Highest average CPU region is **{df.index[0]}** at {df.iloc[0]:.2f}%."
-    else:
-        reply = (
-            f"You said: \"{raw_msg}\".\n"
-            "Try asking:\n"
-            "- \"summary of east us\"\n"
-            "- \"compare east and west\"\n"
-            "- \"compute service summary\"\n"
-        )
-
-    history.append({"role": "assistant", "content": reply})
-    session["chat_history"] = history
+    chat_id = session.get("chat_id")
+    if not chat_id:
+        chat_id = session["chat_id"] = secrets.token_urlsafe(16)
+
+    # matcher and per-entity summaries are compiled once per dataset version
+    with span("chat"):
+        engine = current_dataset().derived("chat_engine", ChatEngine.from_dataset)
+        reply = engine.reply(raw_msg)
+
+    CHAT_SESSIONS.append(
+        chat_id,
+        {"role": "user", "content": raw_msg},
+        {"role": "assistant", "content": reply},
+    )
     return jsonify({"response": reply})
 
 # -----------------------------------------------------------------------------
 # MAIN
 # -----------------------------------------------------------------------------
+def start_background_workers(workers=1):
+    """Start this process's watcher/refresh threads (threads don't survive fork).
+
+    ``workers`` is the number of server processes; with more than one and
+    INGEST_PERSIST on, the watcher is always started, since appends made
+    through another worker only reach this one through the source file.
+    """
+    BACKTESTS.start()
+    FORECAST_SCHEDULER.start()
+    interval = DATASET_WATCH_INTERVAL
+    if interval <= 0 and INGEST_PERSIST and workers > 1:
+        interval = INGEST_WATCH_INTERVAL
+    DATASETS.watch(interval)
+
+
+def create_app(start_workers=True):
+    """
+    WSGI factory. The dataset, forecasts and backtests are built when this
+    module is imported, so a pre-forking server (gunicorn --preload, see
+    wsgi.py / gunicorn.conf.py) builds them once and every worker shares the
+    memory copy-on-write. Pass start_workers=False in the master and call
+    start_background_workers() after the fork instead.
+    """
+    if start_workers:
+        start_background_workers()
+    return app
+
+
 if __name__ == "__main__":
+    # Development server only; use gunicorn -c gunicorn.conf.py wsgi:app in production
     print("=" * 60)
     print("🚀 Starting Flask Backend Server")
     print("=" * 60)
     print(f"📁 Data directory: {DATA_DIR}")
-    print(f"📊 Loaded {len(DF_RAW)} rows")
+    print(f"📊 Loaded {len(DATASETS.current)} rows (version {DATASETS.current.version})")
     print(f"🌐 CORS enabled for: http://localhost:3000")
     print("=" * 60)
-    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    create_app().run(host="0.0.0.0", port=5000, debug=True)
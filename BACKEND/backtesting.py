@@ -0,0 +1,242 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+
+import numpy as np
+
+from dataset import VersionedJob
+from forecasting import MODEL_SPECS, MODELS, ForecastEngine
+
+# -----------------------------------------------------------------------------
+# ROLLING-ORIGIN BACKTESTS
+# -----------------------------------------------------------------------------
+# For each fold the models are fit on everything before the origin and scored
+# on the next ``horizon`` days; origins step back ``step`` days at a time.
+# Series are split into chunks that run in a process pool, and fit/predict
+# wall-times are measured around the real model calls.
+
+MODEL_LABELS = {
+    "seasonal_naive": "Seasonal Naive",
+    "holt_winters": "Holt-Winters",
+    "linear_trend": "Linear Trend",
+}
+MIN_SERIES_PER_WORKER = 64
+
+
+def backtest_chunk(Y, folds, horizon, step, models=MODELS):
+    """Error sums per series and timings for every model on one chunk of rows."""
+    n, T = Y.shape
+    out = {}
+    for model in models:
+        fit, predict = MODEL_SPECS[model]
+        abs_sum = np.zeros(n)
+        sq_sum = np.zeros(n)
+        ape_sum = np.zeros(n)
+        ape_count = np.zeros(n)
+        points = 0
+        fit_time = infer_time = 0.0
+        for k in range(folds):
+            origin = T - horizon - k * step
+            if origin < 2:
+                break
+            actual = Y[:, origin:origin + horizon]
+
+            started = time.perf_counter()
+            state = fit(Y[:, :origin])
+            fit_time += time.perf_counter() - started
+            started = time.perf_counter()
+            fc = predict(state, horizon)[0]
+            infer_time += time.perf_counter() - started
+
+            err = fc - actual
+            abs_sum += np.abs(err).sum(axis=1)
+            sq_sum += (err ** 2).sum(axis=1)
+            nonzero = np.abs(actual) > 1e-9
+            ape_sum += np.where(nonzero, np.abs(err) / np.where(nonzero, np.abs(actual), 1), 0).sum(axis=1)
+            ape_count += nonzero.sum(axis=1)
+            points += horizon
+        out[model] = {
+            "abs_sum": abs_sum, "sq_sum": sq_sum, "ape_sum": ape_sum, "ape_count": ape_count,
+            "points": points, "fit_time": fit_time, "infer_time": infer_time,
+        }
+    return out
+
+
+def _pool(workers):
+    # Fork only while this is the only thread (the import-time build in the
+    # gunicorn master or the dev server): a child forked from a threaded
+    # process (gthread workers, the watcher, a background job) can block
+    # forever on a lock another thread held. spawn/forkserver are no way out,
+    # since their children re-import __main__, which may be app.py. Anything
+    # else runs the chunks on threads.
+    if threading.active_count() == 1 and "fork" in multiprocessing.get_all_start_methods():
+        return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork"))
+    return ThreadPoolExecutor(workers)
+
+
+def run_backtest(panel, folds=4, horizon=14, step=7, workers=1):
+    Y = panel.values
+    workers = max(1, min(workers, len(Y) // MIN_SERIES_PER_WORKER))
+    started = time.perf_counter()
+    if workers == 1:
+        parts = [backtest_chunk(Y, folds, horizon, step)]
+    else:
+        chunks = np.array_split(Y, workers)
+        with _pool(workers) as pool:
+            job = partial(backtest_chunk, folds=folds, horizon=horizon, step=step)
+            parts = list(pool.map(job, chunks))
+    wall_time = time.perf_counter() - started
+
+    models = {}
+    for model in MODELS:
+        pieces = [p[model] for p in parts]
+        cat = {k: np.concatenate([p[k] for p in pieces]) for k in ("abs_sum", "sq_sum", "ape_sum", "ape_count")}
+        points = max(pieces[0]["points"], 1)
+        models[model] = {
+            "mae": cat["abs_sum"] / points,
+            "rmse": np.sqrt(cat["sq_sum"] / points),
+            "mape": 100.0 * cat["ape_sum"] / np.maximum(cat["ape_count"], 1),
+            "fit_time": sum(p["fit_time"] for p in pieces),
+            "infer_time": sum(p["infer_time"] for p in pieces),
+        }
+    return BacktestResults(
+        keys=panel.keys, models=models, folds=folds, horizon=horizon, step=step,
+        workers=workers, wall_time=wall_time,
+    )
+
+
+class BacktestResults:
+    def __init__(self, keys, models, folds, horizon, step, workers=1, wall_time=0.0, computed_at=None):
+        self.keys = [tuple(k) for k in keys]
+        self.models = models
+        self.folds = folds
+        self.horizon = horizon
+        self.step = step
+        self.workers = workers
+        self.wall_time = wall_time
+        self.computed_at = computed_at or datetime.now(timezone.utc).isoformat()
+
+    def best_models(self):
+        """Model with the lowest backtest MAE for every series."""
+        stacked = np.vstack([self.models[m]["mae"] for m in MODELS])
+        return np.array(MODELS)[np.argmin(stacked, axis=0)]
+
+    def summary(self, metric_col):
+        """Per-model accuracy and cost over every series of ``metric_col``."""
+        rows = np.array([k[2] == metric_col for k in self.keys])
+        if not rows.any():
+            return []
+        best = self.best_models()[rows]
+        summary = []
+        for model in MODELS:
+            m = self.models[model]
+            summary.append(
+                {
+                    "name": MODEL_LABELS[model],
+                    "model": model,
+                    "mae": round(float(m["mae"][rows].mean()), 3),
+                    "rmse": round(float(np.sqrt((m["rmse"][rows] ** 2).mean())), 3),
+                    "mape": round(float(m["mape"][rows].mean()), 3),
+                    "train_time": round(float(m["fit_time"]), 4),
+                    "infer_time": round(float(m["infer_time"]), 4),
+                    "series_won": int((best == model).sum()),
+                    "is_best": False,
+                }
+            )
+        min(summary, key=lambda r: r["mae"])["is_best"] = True
+        return summary
+
+    def to_json(self):
+        return {
+            "keys": [list(k) for k in self.keys],
+            "models": {
+                m: {k: (v.tolist() if isinstance(v, np.ndarray) else v) for k, v in stats.items()}
+                for m, stats in self.models.items()
+            },
+            "folds": self.folds,
+            "horizon": self.horizon,
+            "step": self.step,
+            "workers": self.workers,
+            "wall_time": self.wall_time,
+            "computed_at": self.computed_at,
+        }
+
+    @classmethod
+    def from_json(cls, payload):
+        models = {
+            m: {k: (np.asarray(v) if isinstance(v, list) else v) for k, v in stats.items()}
+            for m, stats in payload["models"].items()
+        }
+        return cls(
+            keys=payload["keys"], models=models, folds=payload["folds"],
+            horizon=payload["horizon"], step=payload["step"], workers=payload.get("workers", 1),
+            wall_time=payload.get("wall_time", 0.0), computed_at=payload.get("computed_at"),
+        )
+
+
+class BacktestRunner(VersionedJob):
+    """Backtests every series once per dataset version and keeps the results.
+
+    Results are persisted as JSON under ``cache_dir`` (one file per version)
+    and feed the forecast engine's per-series "best" model choice.
+    """
+
+    name = "backtest-runner"
+
+    def __init__(self, datasets, mode="sync", interval=0, workers=1, cache_dir=None,
+                 folds=4, horizon=14, step=7, keep_versions=2):
+        super().__init__(datasets, mode=mode, interval=interval)
+        self.workers = workers
+        self.cache_dir = cache_dir
+        self.folds = folds
+        self.horizon = horizon
+        self.step = step
+        self.keep_versions = keep_versions
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def get(self, version):
+        return self._results.get(version)
+
+    def _path(self, version):
+        return os.path.join(self.cache_dir, f"{version}.json")
+
+    def refresh(self, dataset):
+        engine = dataset.derived("forecast_engine", ForecastEngine.from_dataset)
+        results = self._results.get(dataset.version) or self._load(dataset.version)
+        if results is None or results.keys != list(engine.panel.keys):
+            results = run_backtest(
+                engine.panel, folds=self.folds, horizon=self.horizon, step=self.step,
+                workers=self.workers,
+            )
+            self._save(dataset.version, results)
+        with self._lock:
+            self._results[dataset.version] = results
+            for old in list(self._results)[:-self.keep_versions]:
+                del self._results[old]
+        if len(engine.panel):
+            engine.set_best_models(results.best_models())
+        self._notify(dataset, results)
+
+    def _load(self, version):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(version)) as fh:
+                return BacktestResults.from_json(json.load(fh))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save(self, version, results):
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = self._path(version) + ".tmp"
+        with open(tmp, "w") as fh:
+            json.dump(results.to_json(), fh)
+        os.replace(tmp, self._path(version))
@@ -0,0 +1,368 @@
+"""
+Benchmark suite for the Flask API.
+
+    python benchmarks/run.py --sizes 10k,1m
+    python benchmarks/run.py --sizes 10k --save-baseline
+    python benchmarks/run.py --sizes 10k --compare benchmarks/baselines
+
+Each size runs in its own process with CLEANED_PATH pointing at a synthetic
+dataset (generated once under benchmarks/.data/). That process imports the
+app, drives every /api route through the Flask test client, times the data
+helpers on their own, and writes latency percentiles, throughput and peak
+RSS to benchmarks/results/<size>.json. With --compare, the run is checked
+against earlier JSON files and exits with status 1 on a regression.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+DATA_DIR = os.path.join(BENCH_DIR, ".data")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from synth import dataset_path, parse_size  # noqa: E402
+
+# a change only counts as a regression above both limits
+DEFAULT_THRESHOLD = 0.25
+NOISE_FLOOR_MS = 1.0
+
+
+# -----------------------------------------------------------------------------
+# MEASUREMENT
+# -----------------------------------------------------------------------------
+def rss_mb():
+    """Current resident set size (Linux only, else None)."""
+    try:
+        with open("/proc/self/statm") as fh:
+            pages = int(fh.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def summarize(samples, elapsed, cold=None):
+    ms = np.asarray(samples) * 1000.0
+    return {
+        "n": int(len(ms)),
+        "cold_ms": round(cold * 1000.0, 3) if cold is not None else None,
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+        "throughput_rps": round(len(ms) / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def measure(fn, iterations, time_budget, concurrency=1):
+    """Call ``fn`` once cold, then up to ``iterations`` times (per thread) within ``time_budget`` s."""
+    started = time.perf_counter()
+    fn()
+    cold = time.perf_counter() - started
+
+    samples = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + time_budget
+
+    def loop():
+        local = []
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            fn()
+            local.append(time.perf_counter() - t0)
+            if t0 > deadline:
+                break
+        with lock:
+            samples.extend(local)
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        loop()
+    else:
+        threads = [threading.Thread(target=loop) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    return summarize(samples, time.perf_counter() - started, cold)
+
+
+# -----------------------------------------------------------------------------
+# SCENARIOS
+# -----------------------------------------------------------------------------
+def route_scenarios(app_module):
+    """(name, method, path, json_body) for every benchmarked request."""
+    store = app_module.current_dataset().store
+    dates = store.dates
+    region = store.categories("region")[0]
+    other = store.categories("region")[-1]
+    service = store.categories("resource_type")[0]
+    start = str(np.datetime_as_string(dates[len(dates) // 4], unit="D"))
+    end = str(np.datetime_as_string(dates[len(dates) // 2], unit="D"))
+    return [
+        ("health", "GET", "/api/health", None),
+        ("filters_options", "GET", "/api/filters/options", None),
+        ("kpis", "GET", "/api/kpis", None),
+        ("kpis_filtered", "GET", f"/api/kpis?region={region}&resource_type={service}", None),
+        ("sparklines", "GET", "/api/sparklines", None),
+        ("percentiles_range", "GET", f"/api/percentiles?region={region}&start_date={start}&end_date={end}", None),
+        ("percentiles_top_regions", "GET", "/api/percentiles?group_by=region&q=p95&top=5", None),
+        ("data_raw_page", "GET", "/api/data/raw?limit=1000", None),
+        ("data_raw_range_csv", "GET",
+         f"/api/data/raw?format=csv&region={region}&start_date={start}&end_date={end}", None),
+        ("time_series_daily", "GET", "/api/time-series", None),
+        ("time_series_weekly", "GET", f"/api/time-series?region={region}&aggregation=weekly", None),
+        ("features_series", "GET",
+         f"/api/features?region={region}&resource_type={service}&start_date={start}", None),
+        ("forecast", "GET", f"/api/forecast?region={region}&service={service}&horizon=30", None),
+        ("forecast_long", "GET", "/api/forecast?horizon=180", None),
+        ("forecast_batch", "GET", "/api/forecast/batch?horizon=30", None),
+        ("forecast_batch_post", "POST", "/api/forecast/batch",
+         {"series": [{"region": region, "metric": "cpu"}, {"service": service, "metric": "users"}], "horizon": 14}),
+        ("model_comparison", "GET", "/api/model-comparison", None),
+        ("capacity_planning", "GET", "/api/capacity-planning?metric=all", None),
+        ("capacity_simulate", "GET", "/api/capacity/simulate?metric=all", None),
+        ("capacity_simulate_scenario", "POST", "/api/capacity/simulate",
+         {"metric": "all", "user_growth": 20, "holiday_rate": 0.3, "economic_index_shift": 5, "seed": 7}),
+        ("monitoring", "GET", "/api/monitoring", None),
+        ("alerts", "GET", f"/api/alerts?region={region}&limit=100", None),
+        ("drivers", "GET", "/api/drivers", None),
+        ("drivers_range", "GET", f"/api/drivers?region={region}&start_date={start}&end_date={end}", None),
+        ("chatbot_summary", "POST", "/api/chatbot", {"message": f"summary of {region}"}),
+        ("chatbot_compare", "POST", "/api/chatbot", {"message": f"compare {region} vs {other}"}),
+    ]
+
+
+def helper_scenarios(app_module):
+    """(name, callable, iterations cap) for helpers benchmarked without HTTP."""
+    from anomalies import AnomalyDetector
+    from capacity import CapacityBase
+    from chatbot import ChatEngine
+    from dataset import Dataset
+    from drivers import DriverAnalysis
+    from features import FeatureTable
+    from forecasting import METRIC_MAP, ForecastEngine
+    from simulation import DemandSimulator
+
+    dataset = app_module.current_dataset()
+    store = dataset.store
+    regions = store.categories("region")
+    service = store.categories("resource_type")[0]
+    dates = store.dates
+    start = str(np.datetime_as_string(dates[len(dates) // 4], unit="D"))
+    end = str(np.datetime_as_string(dates[len(dates) // 2], unit="D"))
+    chat = dataset.derived("chat_engine", ChatEngine.from_dataset)
+    get_filtered_df = app_module.get_filtered_df
+
+    return [
+        ("get_filtered_df_all", lambda: get_filtered_df({}), None),
+        ("get_filtered_df_region", lambda: get_filtered_df({"region": regions[0]}), None),
+        ("get_filtered_df_region_service",
+         lambda: get_filtered_df({"region": regions[0], "resource_type": service}), None),
+        ("get_filtered_df_date_range",
+         lambda: get_filtered_df({"start_date": start, "end_date": end}), None),
+        ("summarize_region", lambda: chat.summarize_region(regions[0]), None),
+        ("compare_regions", lambda: chat.compare_regions(regions[0], regions[-1]), None),
+        ("summarize_service", lambda: chat.summarize_service(service), None),
+        ("chat_reply", lambda: chat.reply(f"compare {regions[0]} vs {regions[-1]}"), None),
+        # per-version build costs (paid on load/reload, not per request)
+        ("build_dataset", lambda: Dataset(dataset.df, dataset.version), 3),
+        ("build_chat_engine", lambda: ChatEngine.from_dataset(dataset), 3),
+        ("build_sketches", lambda: app_module.build_sketches(dataset), 3),
+        ("build_features", lambda: FeatureTable.from_dataset(dataset), 3),
+        ("build_anomaly_detector", lambda: AnomalyDetector.from_cube(dataset.cube, tuple(METRIC_MAP.values())), 3),
+        ("build_capacity_base",
+         lambda: CapacityBase(FeatureTable.from_dataset(dataset), list(METRIC_MAP.values())), 3),
+        ("build_forecast_engine", lambda: ForecastEngine.from_dataset(dataset), 3),
+        ("build_driver_analysis", lambda: DriverAnalysis.from_dataset(dataset), 3),
+        ("build_simulator", lambda: DemandSimulator.from_dataset(
+            dataset, dataset.derived("forecast_engine", ForecastEngine.from_dataset), list(METRIC_MAP.values())), 3),
+    ]
+
+
+def run_worker(args):
+    """Benchmark one dataset inside this process and write the JSON report."""
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    import app as app_module
+    startup = time.perf_counter() - started
+    rss_loaded = rss_mb()
+
+    flask_app = app_module.app
+    routes = {}
+    covered = set()
+    for name, method, path, body in route_scenarios(app_module):
+        covered.add(path.split("?")[0])
+        clients = threading.local()
+
+        def call(method=method, path=path, body=body):
+            client = getattr(clients, "client", None)
+            if client is None:
+                client = clients.client = flask_app.test_client()
+            response = client.open(path, method=method, json=body)
+            response.get_data()
+            response.close()
+            if response.status_code >= 400:
+                raise RuntimeError(f"{method} {path} -> {response.status_code}")
+
+        result = measure(call, args.iterations, args.time_budget, args.concurrency)
+        routes[name] = {"method": method, "path": path, **result}
+        print(f"  {name:<32} p50 {result['p50_ms']:>9.2f} ms  p95 {result['p95_ms']:>9.2f} ms"
+              f"  {result['throughput_rps'] or 0:>8.1f} req/s")
+
+    helpers = {}
+    for name, fn, cap in helper_scenarios(app_module):
+        iterations = min(args.iterations, cap) if cap else args.iterations
+        result = measure(fn, iterations, args.time_budget)
+        helpers[name] = result
+        print(f"  {name:<32} p50 {result['p50_ms']:>9.2f} ms  p95 {result['p95_ms']:>9.2f} ms")
+
+    uncovered = sorted(
+        rule.rule for rule in flask_app.url_map.iter_rules()
+        if rule.rule.startswith("/api/") and rule.rule not in covered
+    )
+    report = {
+        "size": args.size,
+        "rows": len(app_module.current_dataset()),
+        "dataset": args.csv,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "iterations": args.iterations,
+        "concurrency": args.concurrency,
+        "startup_s": round(startup, 3),
+        "rss_before_mb": rss_before,
+        "rss_loaded_mb": rss_loaded,
+        "peak_rss_mb": peak_rss_mb(),
+        "routes": routes,
+        "helpers": helpers,
+        # state-changing routes are left out on purpose
+        "uncovered_routes": uncovered,
+    }
+    with open(args.out, "w") as fh:
+        json.dump(report, fh, indent=2)
+
+
+# -----------------------------------------------------------------------------
+# COMPARISON
+# -----------------------------------------------------------------------------
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """Rows of (section, name, stat, old, new, change) that regressed."""
+    regressions = []
+    for section in ("routes", "helpers"):
+        for name, new in report.get(section, {}).items():
+            old = baseline.get(section, {}).get(name)
+            if old is None:
+                continue
+            for stat in ("p50_ms", "p95_ms"):
+                before, after = old[stat], new[stat]
+                if after > before * (1 + threshold) and after - before > NOISE_FLOOR_MS:
+                    regressions.append((section, name, stat, before, after, after / before - 1))
+    old_peak, new_peak = baseline.get("peak_rss_mb"), report.get("peak_rss_mb")
+    if old_peak and new_peak and new_peak > old_peak * (1 + threshold):
+        regressions.append(("memory", "peak_rss", "mb", old_peak, new_peak, new_peak / old_peak - 1))
+    return regressions
+
+
+def baseline_path(location, size):
+    if os.path.isdir(location):
+        return os.path.join(location, f"{size}.json")
+    return location
+
+
+# -----------------------------------------------------------------------------
+# ENTRY POINT
+# -----------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10k", help="comma-separated sizes: 10k, 1m, 10m or row counts")
+    parser.add_argument("--iterations", type=int, default=50, help="max timed calls per scenario (per thread)")
+    parser.add_argument("--time-budget", type=float, default=5.0, help="seconds per scenario before stopping early")
+    parser.add_argument("--concurrency", type=int, default=1, help="threads driving each route at once")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--compare", help="baseline JSON file, or a directory of <size>.json files")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown that counts as a regression")
+    parser.add_argument("--save-baseline", action="store_true", help=f"also copy results to {BASELINE_DIR}")
+    # internal: run one size in this process
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", help=argparse.SUPPRESS)
+    parser.add_argument("--csv", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args)
+        return 0
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    failed = False
+    for size in [s.strip() for s in args.sizes.split(",") if s.strip()]:
+        print(f"== {size} ({parse_size(size):,} rows)")
+        csv_path = dataset_path(size, DATA_DIR, seed=args.seed)
+        out = os.path.join(RESULTS_DIR, f"{size}.json")
+        env = dict(
+            os.environ,
+            CLEANED_PATH=csv_path,
+            BACKTEST_DIR=os.path.join(DATA_DIR, ".cache", "backtests"),
+        )
+        cmd = [
+            sys.executable, os.path.abspath(__file__), "--worker", "--size", size, "--csv", csv_path,
+            "--out", out, "--iterations", str(args.iterations), "--time-budget", str(args.time_budget),
+            "--concurrency", str(args.concurrency),
+        ]
+        if subprocess.run(cmd, cwd=BACKEND_DIR, env=env).returncode != 0:
+            print(f"✗ benchmark for {size} failed")
+            failed = True
+            continue
+        with open(out) as fh:
+            report = json.load(fh)
+        print(f"  startup {report['startup_s']:.2f}s, peak RSS {report['peak_rss_mb'] or 0:.0f} MB -> {out}")
+
+        if args.save_baseline:
+            os.makedirs(BASELINE_DIR, exist_ok=True)
+            with open(os.path.join(BASELINE_DIR, f"{size}.json"), "w") as fh:
+                json.dump(report, fh, indent=2)
+
+        if args.compare:
+            path = baseline_path(args.compare, size)
+            if not os.path.exists(path):
+                print(f"  no baseline at {path}")
+                continue
+            with open(path) as fh:
+                regressions = compare(report, json.load(fh), args.threshold)
+            for section, name, stat, before, after, change in regressions:
+                print(f"  ✗ {section}/{name} {stat}: {before:.2f} -> {after:.2f} (+{change:.0%})")
+            if regressions:
+                failed = True
+            else:
+                print(f"  ✓ no regressions against {path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------------------------------------------
+# SYNTHETIC DATASETS IN THE cleaned_merged.csv SCHEMA
+# -----------------------------------------------------------------------------
+# Rows are laid out like the real file (one block per date, ordered by region
+# and resource type). Larger sizes add regions first (up to MAX_REGIONS), then
+# span up to MAX_DAYS days, then repeat each (date, region, resource_type)
+# row, so the series count stays realistic while the row count grows.
+
+COLUMNS = [
+    "date", "region", "resource_type", "usage_cpu", "usage_storage", "users_active",
+    "economic_index", "cloud_market_demand", "holiday",
+]
+BASE_REGIONS = ["East US", "West US", "North Europe", "Southeast Asia"]
+RESOURCE_TYPES = ["VM", "Storage", "Container"]
+START_DATE = "2023-01-01"
+MAX_REGIONS = 64
+MAX_DAYS = 730
+CHUNK_DAYS = 30
+
+SIZES = {
+    "10k": 10_000,
+    "1m": 1_000_000,
+    "10m": 10_000_000,
+}
+
+
+def parse_size(size):
+    """'10k' / '1m' / '10m' or a plain row count."""
+    key = str(size).lower()
+    if key in SIZES:
+        return SIZES[key]
+    if key.endswith("k"):
+        return int(float(key[:-1]) * 1_000)
+    if key.endswith("m"):
+        return int(float(key[:-1]) * 1_000_000)
+    return int(key)
+
+
+def layout(rows):
+    """(regions, days, repeats) for a dataset of ``rows`` rows."""
+    n_regions = min(MAX_REGIONS, max(len(BASE_REGIONS), rows // (MAX_DAYS * len(RESOURCE_TYPES))))
+    regions = BASE_REGIONS + [f"Region {i:02d}" for i in range(len(BASE_REGIONS) + 1, n_regions + 1)]
+    per_day = len(regions) * len(RESOURCE_TYPES)
+    days = max(1, min(MAX_DAYS, math.ceil(rows / per_day)))
+    repeats = math.ceil(rows / (days * per_day))
+    return regions, days, repeats
+
+
+def _chunk(rng, day0, n_days, regions, repeats, series_bias):
+    n_series = len(regions) * len(RESOURCE_TYPES)
+    shape = (n_days, n_series, repeats)
+    day = np.arange(day0, day0 + n_days)[:, None, None]
+    weekly = np.sin(2 * np.pi * day / 7)
+    trend = day / MAX_DAYS
+
+    cpu = 74 + 8 * weekly + 6 * trend + series_bias[None, :, None] + rng.normal(0, 9, shape)
+    storage = 1240 + 120 * weekly + 150 * trend + 10 * series_bias[None, :, None] + rng.normal(0, 300, shape)
+    users = 350 + 30 * weekly + 20 * trend + 3 * series_bias[None, :, None] + rng.normal(0, 60, shape)
+
+    dates = pd.date_range(START_DATE, periods=day0 + n_days, freq="D")[day0:]
+    daily_econ = 99 + 8 * np.sin(2 * np.pi * np.arange(day0, day0 + n_days) / 90) + rng.normal(0, 3, n_days)
+    daily_demand = 1 + 0.1 * np.sin(2 * np.pi * np.arange(day0, day0 + n_days) / 60) + rng.normal(0, 0.05, n_days)
+    daily_holiday = (rng.random(n_days) < 0.28).astype(np.int8)
+
+    per_day = n_series * repeats
+    series = np.tile(np.repeat(np.arange(n_series), repeats), n_days)
+    day_idx = np.repeat(np.arange(n_days), per_day)
+    return pd.DataFrame({
+        "date": np.asarray(dates.strftime("%Y-%m-%d"))[day_idx],
+        "region": np.asarray(regions)[series // len(RESOURCE_TYPES)],
+        "resource_type": np.asarray(RESOURCE_TYPES)[series % len(RESOURCE_TYPES)],
+        "usage_cpu": np.clip(np.rint(cpu), 50, 99).astype(np.int64).ravel(),
+        "usage_storage": np.clip(np.rint(storage), 500, 1999).astype(np.int64).ravel(),
+        "users_active": np.clip(np.rint(users), 200, 499).astype(np.int64).ravel(),
+        "economic_index": np.round(daily_econ, 2)[day_idx],
+        "cloud_market_demand": np.round(daily_demand, 2)[day_idx],
+        "holiday": daily_holiday[day_idx],
+    }, columns=COLUMNS)
+
+
+def generate_dataset(rows, path, seed=42):
+    """Write a synthetic dataset of exactly ``rows`` rows to ``path`` (CSV)."""
+    rng = np.random.default_rng(seed)
+    regions, days, repeats = layout(rows)
+    series_bias = rng.normal(0, 4, len(regions) * len(RESOURCE_TYPES))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    written = 0
+    with open(tmp, "w", newline="") as fh:
+        for day0 in range(0, days, CHUNK_DAYS):
+            n_days = min(CHUNK_DAYS, days - day0)
+            chunk = _chunk(rng, day0, n_days, regions, repeats, series_bias)
+            chunk = chunk.iloc[:rows - written]
+            chunk.to_csv(fh, header=written == 0, index=False)
+            written += len(chunk)
+            if written >= rows:
+                break
+    os.replace(tmp, path)
+    return path
+
+
+def dataset_path(size, data_dir, seed=42):
+    """Path of the cached synthetic CSV for ``size``, generating it if missing."""
+    rows = parse_size(size)
+    path = os.path.join(data_dir, f"synthetic_{rows}_{seed}.csv")
+    if not os.path.exists(path):
+        generate_dataset(rows, path, seed=seed)
+    return path
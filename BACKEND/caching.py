@@ -0,0 +1,49 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+# -----------------------------------------------------------------------------
+# RESPONSE CACHING HELPERS
+# -----------------------------------------------------------------------------
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Small thread-safe LRU mapping with a fixed number of entries."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+
+def make_etag(version, path, args):
+    """Strong validator for a GET: same dataset version + same query => same body."""
+    query = "&".join(f"{k}={v}" for k, v in sorted(args.items(multi=True)))
+    return hashlib.sha1(f"{version}|{path}?{query}".encode()).hexdigest()[:24]
@@ -0,0 +1,44 @@
+import numpy as np
+
+from features import rolling_name
+
+# -----------------------------------------------------------------------------
+# CAPACITY PLANNING ENGINE
+# -----------------------------------------------------------------------------
+# Capacity and recent demand are read off the feature table: the available
+# capacity of a group is the peak of its last CAPACITY_WINDOW days (the
+# rolling max on its latest day) and the recent demand the mean of its last
+# RECENT_WINDOW days. Forecast demand comes from the forecast store.
+
+CAPACITY_WINDOW = 30
+RECENT_WINDOW = 7
+HEADROOM = 0.10
+RISK_HIGH = 1.15
+RISK_MEDIUM = 0.95
+
+
+class CapacityBase:
+    """Per-group capacity and recent demand for every metric of one dataset."""
+
+    def __init__(self, features, metrics):
+        self.groups = list(features.series)
+        self.metrics = tuple(metrics)
+        self.capacity = {}
+        self.recent = {}
+        for metric in self.metrics:
+            self.capacity[metric] = features.last(rolling_name(metric, "max", CAPACITY_WINDOW))
+            self.recent[metric] = features.last(rolling_name(metric, "mean", RECENT_WINDOW))
+
+
+def plan(demand, capacity, headroom=HEADROOM):
+    """Vectorized gap, adjustment and risk tier for arrays of demand/capacity."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(capacity > 0, demand / capacity, 0.0)
+    adjustment = demand * (1 + headroom) - capacity
+    risk = np.select([ratio > RISK_HIGH, ratio > RISK_MEDIUM], ["high", "medium"], "low")
+    return {
+        "gap": demand - capacity,
+        "adjustment": adjustment,
+        "utilization": ratio,
+        "risk": risk,
+    }
@@ -0,0 +1,265 @@
+import re
+from collections import deque
+
+import pandas as pd
+
+# -----------------------------------------------------------------------------
+# CHATBOT ENGINE
+# -----------------------------------------------------------------------------
+# Built once per dataset version. Region/service names and intent keywords are
+# compiled into one Aho-Corasick automaton, so a single pass over the
+# normalized message finds every exact mention; a token -> entity inverted
+# index covers the looser "all tokens" / "any token" matches. Every answer is
+# a precomputed per-entity summary, so a request never touches the dataframe.
+
+_NON_ALNUM = re.compile(r"[^a-z0-9 ]+")
+_SPACES = re.compile(r"\s+")
+
+# intent -> keywords, checked as substrings of the normalized message
+INTENT_KEYWORDS = {
+    "compare": ("compare", " vs "),
+    "forecast": ("forecast",),
+    "capacity": ("capacity",),
+    "highest": ("highest", "max"),
+}
+
+FORECAST_REPLY = "To generate forecasts, open the Forecast page and choose region, service, and model."
+CAPACITY_REPLY = "Capacity planning highlights demand–capacity gaps and recommended adjustments."
+
+
+def normalize_text(s):
+    """Lowercase, strip punctuation, collapse whitespace."""
+    return _SPACES.sub(" ", _NON_ALNUM.sub(" ", str(s).lower())).strip()
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton; ``find(text)`` returns the ids of every pattern found."""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [set()]
+        for pid, pattern in enumerate(patterns):
+            node = 0
+            for ch in pattern:
+                if ch not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(set())
+                    self.goto[node][ch] = len(self.goto) - 1
+                node = self.goto[node][ch]
+            self.out[node].add(pid)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                nxt = self.goto[f].get(ch, 0)
+                self.fail[child] = nxt if nxt != child else 0
+                self.out[child] |= self.out[self.fail[child]]
+
+    def find(self, text):
+        found = set()
+        node = 0
+        for ch in text:
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            found |= self.out[node]
+        return found
+
+
+class EntityIndex:
+    """Region or service names with their normalized tokens."""
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.norms = [normalize_text(n) for n in self.names]
+        self.tokens = [set(n.split()) for n in self.norms]
+        self.token_index = {}
+        for i, tokens in enumerate(self.tokens):
+            for t in tokens:
+                self.token_index.setdefault(t, []).append(i)
+
+    def match(self, exact, msg_tokens):
+        """
+        Names mentioned in the message, most specific first.
+         1) normalized name is a substring of the message (``exact`` ids)
+         2) all name tokens present in the message
+         3) at least one token present (fallback)
+        """
+        if exact:
+            ids = exact
+        else:
+            hits = {}
+            for t in msg_tokens:
+                for i in self.token_index.get(t, ()):
+                    hits[i] = hits.get(i, 0) + 1
+            full = [i for i, n in hits.items() if n == len(self.tokens[i])]
+            ids = full or list(hits)
+        ranked = sorted(ids, key=lambda i: (-len(self.norms[i].split()), i))
+        return [self.names[i] for i in ranked]
+
+
+class ChatEngine:
+    def __init__(self, regions, services, region_stats, service_stats, highest):
+        self.regions = EntityIndex(regions)
+        self.services = EntityIndex(services)
+        self.region_stats = region_stats
+        self.service_stats = service_stats
+        self.highest = highest
+
+        # one automaton over region names, service names and intent keywords
+        patterns = []
+        self._owners = []
+        for kind, index in (("region", self.regions), ("service", self.services)):
+            for i, norm in enumerate(index.norms):
+                if norm:
+                    patterns.append(norm)
+                    self._owners.append((kind, i))
+        for intent, keywords in INTENT_KEYWORDS.items():
+            for kw in keywords:
+                patterns.append(kw)
+                self._owners.append(("intent", intent))
+        self.automaton = KeywordAutomaton(patterns)
+
+    @classmethod
+    def from_dataset(cls, dataset):
+        store = dataset.store
+        metrics = ["usage_cpu", "usage_storage", "users_active"]
+
+        # per region / resource type: metric sums and counts plus the CPU peak
+        # (earliest date on ties), accumulated over the store's frames
+        totals = {"region": {}, "resource_type": {}}
+        for df in store.scan(columns=["date", "region", "resource_type", *metrics]):
+            for col, acc in totals.items():
+                grouped = df.groupby(col, observed=True)
+                sums = grouped[metrics].sum()
+                counts = grouped[metrics].count()
+                peaks = df.loc[grouped["usage_cpu"].idxmax()].set_index(col)
+                for name in sums.index:
+                    peak = (peaks.at[name, "usage_cpu"], peaks.at[name, "date"])
+                    if name in acc:
+                        s0, c0, p0 = acc[name]
+                        if (p0[0], peak[1]) >= (peak[0], p0[1]):
+                            peak = p0
+                        acc[name] = (s0 + sums.loc[name], c0 + counts.loc[name], peak)
+                    else:
+                        acc[name] = (sums.loc[name], counts.loc[name], peak)
+
+        def means(acc):
+            return pd.DataFrame({name: s / c for name, (s, c, _) in acc.items()}).T.reindex(columns=metrics)
+
+        region_means = means(totals["region"])
+        region_stats = {}
+        for region, row in region_means.iterrows():
+            peak_cpu, peak_date = totals["region"][region][2]
+            region_stats[region] = {
+                "cpu": row["usage_cpu"],
+                "storage": row["usage_storage"],
+                "users": row["users_active"],
+                "peak_cpu": peak_cpu,
+                "peak_date": peak_date.strftime("%Y-%m-%d"),
+            }
+
+        service_stats = {}
+        for service, row in means(totals["resource_type"]).iterrows():
+            service_stats[service] = {
+                "cpu": row["usage_cpu"],
+                "storage": row["usage_storage"],
+                "users": row["users_active"],
+                "peak_cpu": totals["resource_type"][service][2][0],
+            }
+
+        highest = None
+        if len(region_means):
+            top = region_means["usage_cpu"].sort_values(ascending=False)
+            highest = f"Highest average CPU region is **{top.index[0]}** at {top.iloc[0]:.2f}%."
+
+        return cls(
+            store.categories("region"), store.categories("resource_type"),
+            region_stats, service_stats, highest,
+        )
+
+    # -- replies ----------------------------------------------------------------
+    def summarize_region(self, region):
+        s = self.region_stats.get(region)
+        if s is None:
+            return f"No data found for region '{region}'."
+        return (
+            f"📊 Summary for **{region}**\n"
+            f"- Avg CPU: {s['cpu']:.2f}%\n"
+            f"- Avg Storage: {s['storage']:.2f} GB\n"
+            f"- Avg Users: {s['users']:.0f}\n"
+            f"- Peak CPU: {s['peak_cpu']:.2f}% "
+            f"on {s['peak_date']}"
+        )
+
+    def compare_regions(self, r1, r2):
+        a = self.region_stats.get(r1)
+        b = self.region_stats.get(r2)
+        if a is None or b is None:
+            return "One of the regions has no data."
+        return (
+            f"📌 **{r1} vs {r2}**\n"
+            f"- CPU: {a['cpu']:.1f}% vs {b['cpu']:.1f}%\n"
+            f"- Storage: {a['storage']:.1f}GB vs {b['storage']:.1f}GB\n"
+            f"- Users: {a['users']:.0f} vs {b['users']:.0f}"
+        )
+
+    def summarize_service(self, service):
+        s = self.service_stats.get(service)
+        if s is None:
+            return f"No data found for service '{service}'."
+        return (
+            f"⚙️ Service: **{service}**\n"
+            f"- Avg CPU: {s['cpu']:.2f}%\n"
+            f"- Avg Storage: {s['storage']:.2f} GB\n"
+            f"- Avg Users: {s['users']:.0f}\n"
+            f"- Peak CPU: {s['peak_cpu']:.2f}%"
+        )
+
+    def reply(self, raw_msg):
+        norm = normalize_text(raw_msg)
+        exact = {"region": [], "service": []}
+        intents = set()
+        for pid in self.automaton.find(norm):
+            kind, value = self._owners[pid]
+            if kind == "intent":
+                intents.add(value)
+            else:
+                exact[kind].append(value)
+        msg_tokens = set(norm.split())
+        regions = self.regions.match(exact["region"], msg_tokens)
+
+        # RULE 1: region comparison ("compare" or " vs ")
+        if "compare" in intents and len(regions) >= 2:
+            return self.compare_regions(regions[0], regions[1])
+
+        # RULE 2: service summary
+        services = self.services.match(exact["service"], msg_tokens)
+        if services:
+            return self.summarize_service(services[0])
+
+        # RULE 3: region summary
+        if regions:
+            return self.summarize_region(regions[0])
+
+        # RULE 4: forecast / capacity / highest
+        if "forecast" in intents:
+            return FORECAST_REPLY
+        if "capacity" in intents:
+            return CAPACITY_REPLY
+        if "highest" in intents and self.highest:
+            return self.highest
+        return (
+            f"You said: \"{raw_msg}\".\n"
+            "Try asking:\n"
+            "- \"summary of east us\"\n"
+            "- \"compare east and west\"\n"
+            "- \"compute service summary\"\n"
+        )
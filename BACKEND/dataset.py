@@ -0,0 +1,274 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from rollups import RollupCube
+from store import DataStore, prepare_frame
+
+# -----------------------------------------------------------------------------
+# VERSIONED DATASET
+# -----------------------------------------------------------------------------
+# A Dataset is one immutable version of the data plus everything derived from
+# it (store indexes, rollup cube, and any memoized results registered through
+# ``derived``). The DatasetManager builds new versions off the request path
+# and swaps them in with a single reference assignment, so a request that
+# already holds a Dataset keeps using it until it finishes.
+
+
+class AppendUnsupported(Exception):
+    """Raised by ``appended`` for datasets that cannot take new rows."""
+
+
+class Dataset:
+    def __init__(self, df, version, source=None, store=None, cube=None):
+        self.store = DataStore(df) if store is None else store
+        self.df = self.store.df
+        self.cube = RollupCube.build(self.df) if cube is None else cube
+        self.version = version
+        self.source = source
+        self.loaded_at = datetime.now(timezone.utc)
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.store)
+
+    def derived(self, name, builder):
+        """Compute ``builder(self)`` once for this version and memoize it."""
+        try:
+            return self._derived[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = builder(self)
+            return self._derived[name]
+
+    def appended(self, batch, version, incremental=None, check=None):
+        """This version plus ``batch``; returns (dataset, built_incrementally).
+
+        ``check(self, batch)`` returns the batch to append (or raises to
+        reject it); ``version`` is the new version id, or a callable
+        ``version(self, batch)`` run on the checked batch.
+        When the batch does not start before the last stored date, the store
+        and cube are extended from the batch alone, and every derived value
+        named in ``incremental`` that this version already holds is carried
+        over via ``merge(old_value, batch_frame, new_dataset)``. Otherwise
+        the whole frame is rebuilt.
+        """
+        if check is not None:
+            batch = check(self, batch)
+        if callable(version):
+            version = version(self, batch)
+        batch = prepare_frame(batch)
+        if len(self.df) and batch["date"].iloc[0] < self.df["date"].iloc[-1]:
+            df = prepare_frame(pd.concat([self.df, batch], ignore_index=True))
+            return Dataset(df, version, source=self.source), False
+
+        store = self.store.append(batch)
+        cube = self.cube.merge(RollupCube.build(batch, metrics=self.cube.metrics))
+        dataset = Dataset(store.df, version, source=self.source, store=store, cube=cube)
+        batch = store.df.iloc[len(self.df):]
+        for name, merge in (incremental or {}).items():
+            if name in self._derived:
+                dataset._derived[name] = merge(self._derived[name], batch, dataset)
+        return dataset, True
+
+
+def _source_stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+class DatasetManager:
+    """Owns the current Dataset and replaces it on reload.
+
+    ``loader()`` must return ``(data, version)`` for ``source_path``; the
+    Dataset is made with ``build(data, version, source=source_path)``.
+    Warmers run against a freshly built Dataset before it becomes current;
+    listeners are told about the swap afterwards. Incremental mergers carry
+    derived values over to versions created by ``append``.
+    """
+
+    def __init__(self, source_path, loader, build=Dataset):
+        self.source_path = source_path
+        self._loader = loader
+        self._build = build
+        self._current = None
+        self._stat = None
+        self._reload_lock = threading.Lock()
+        self._warmers = []
+        self._listeners = []
+        self._incremental = {}
+        self._watcher = None
+
+    @property
+    def current(self):
+        return self._current
+
+    def add_warmer(self, fn):
+        self._warmers.append(fn)
+        return fn
+
+    def add_listener(self, fn):
+        self._listeners.append(fn)
+        return fn
+
+    def add_incremental(self, name, merge):
+        """``merge(old_value, batch, dataset)`` updates derived value ``name`` on append."""
+        self._incremental[name] = merge
+        return merge
+
+    def load(self):
+        self.reload(force=True)
+        return self._current
+
+    def reload(self, force=False):
+        """Rebuild from the source file; returns (dataset, changed)."""
+        with self._reload_lock:
+            stat = _source_stat(self.source_path)
+            if not force and self._current is not None and stat == self._stat:
+                return self._current, False
+
+            data, version = self._loader()
+            if not force and self._current is not None and version == self._current.version:
+                self._stat = stat
+                return self._current, False
+            return self._swap(self._build(data, version, source=self.source_path), stat), True
+
+    def publish(self, dataset):
+        """Swap in a dataset that was built elsewhere (e.g. from an append)."""
+        with self._reload_lock:
+            return self._swap(dataset, _source_stat(self.source_path))
+
+    def append(self, batch, version, persist=None, check=None):
+        """Publish the current dataset plus ``batch`` as ``version(current, batch)``.
+
+        Everything runs under the reload lock, so concurrent appends see
+        each other: ``check(current, batch)`` returns the batch to append
+        (or raises to reject it; datasets that cannot append raise
+        AppendUnsupported first), then the dataset is built and
+        ``persist(batch)`` (e.g. appending the rows to the source file)
+        runs without the watcher seeing the write as an outside change.
+        Returns (dataset, built_incrementally).
+        """
+        with self._reload_lock:
+            current = self._current
+            checked = []
+
+            def admit(dataset, rows):
+                rows = check(dataset, rows) if check is not None else rows
+                checked.append(rows)
+                return rows
+
+            dataset, incremental = current.appended(batch, version, self._incremental, check=admit)
+            if persist is not None:
+                persist(checked[0])
+            return self._swap(dataset, _source_stat(self.source_path)), incremental
+
+    def _swap(self, dataset, stat):
+        for warm in self._warmers:
+            warm(dataset)
+        previous, self._current = self._current, dataset
+        self._stat = stat
+        for notify in self._listeners:
+            notify(dataset, previous)
+        return dataset
+
+    def watch(self, interval):
+        """Poll the source file every ``interval`` seconds in a daemon thread.
+
+        Threads do not survive fork, so a forked worker calls this again to
+        get its own watcher.
+        """
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return self._watcher
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    dataset, changed = self.reload()
+                    if changed:
+                        print(f"✓ Reloaded dataset version {dataset.version} ({len(dataset)} rows)")
+                except Exception as exc:  # keep serving the old version
+                    print(f"⚠ Dataset reload failed: {exc}")
+
+        self._watcher = threading.Thread(target=run, name="dataset-watcher", daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+
+class VersionedJob:
+    """Runs ``refresh(dataset)`` once per dataset version.
+
+    mode "sync": registered as a warmer, so a new version only becomes
+    current once the job has run for it (readers stay on the old version).
+    mode "background": runs in a worker thread after the swap.
+    ``interval`` > 0 additionally re-checks the current version periodically.
+    ``install()`` registers the job; ``start()`` launches its thread (call it
+    again in each forked worker).
+    """
+
+    name = "job"
+
+    def __init__(self, datasets, mode="sync", interval=0):
+        self.datasets = datasets
+        self.mode = mode
+        self.interval = interval
+        self.last_error = None
+        self._pending = threading.Event()
+        self._thread = None
+        self._listeners = []
+
+    def add_listener(self, fn):
+        """``fn(dataset, result)`` is called after each refresh."""
+        self._listeners.append(fn)
+        return fn
+
+    def install(self):
+        if self.mode == "sync":
+            self.datasets.add_warmer(self.refresh)
+        else:
+            self.datasets.add_listener(lambda new, old: self._pending.set())
+        return self
+
+    def start(self):
+        needs_thread = self.mode != "sync" or self.interval > 0
+        if needs_thread and (self._thread is None or not self._thread.is_alive()):
+            if self.datasets.current is not None:
+                self._pending.set()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def refresh(self, dataset):
+        raise NotImplementedError
+
+    def _notify(self, dataset, result):
+        for notify in self._listeners:
+            notify(dataset, result)
+
+    def _run(self):
+        while True:
+            self._pending.wait(self.interval if self.interval > 0 else None)
+            self._pending.clear()
+            dataset = self.datasets.current
+            if dataset is None:
+                continue
+            try:
+                started = time.perf_counter()
+                self.refresh(dataset)
+                self.last_error = None
+                elapsed = time.perf_counter() - started
+                if elapsed > 1:
+                    print(f"✓ {self.name} finished for {dataset.version} in {elapsed:.1f}s")
+            except Exception as exc:  # keep the worker alive
+                self.last_error = str(exc)
+                print(f"⚠ {self.name} failed: {exc}")
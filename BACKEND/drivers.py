@@ -0,0 +1,175 @@
+import numpy as np
+
+from features import calendar_columns
+
+# -----------------------------------------------------------------------------
+# DRIVER ANALYSIS
+# -----------------------------------------------------------------------------
+# How usage moves with the exogenous columns, for every key of the rollup
+# cube (region x resource_type pairs, each region, each resource type and
+# the whole fleet), from the daily means:
+#
+#   correlation        Pearson matrix of all VARIABLES
+#   cross-correlation  r of each usage metric with each driver lagged by
+#                      0..MAX_LAG days (driver leads usage)
+#   effects            holiday and weekend days vs the rest: means, % lift
+#                      and Cohen's d
+#
+# All groups go through one pass: the daily panel is [group, variable, day]
+# with NaN where a group has no rows, and every statistic is a masked sum
+# over the day axis (einsum), so each pair of variables uses the days both
+# have values.
+
+USAGE_METRICS = ("usage_cpu", "usage_storage", "users_active")
+DRIVERS = ("economic_index", "cloud_market_demand", "holiday")
+VARIABLES = USAGE_METRICS + DRIVERS
+MAX_LAG = 14
+MIN_DAYS = 3                # fewer shared days -> no correlation (null)
+GROUP_LEVELS = ("series", "region", "resource_type", "all")
+
+
+def pairwise_corr(X, Y):
+    """Pearson r of every row pair of X [g, a, T] and Y [g, b, T] -> [g, a, b].
+
+    Each pair uses the days where both rows have values; pairs with fewer
+    than MIN_DAYS such days or no variance are NaN.
+    """
+    mx, my = ~np.isnan(X), ~np.isnan(Y)
+    x0, y0 = np.where(mx, X, 0.0), np.where(my, Y, 0.0)
+    mx, my = mx.astype(float), my.astype(float)
+    n = np.einsum("gat,gbt->gab", mx, my)
+    sx = np.einsum("gat,gbt->gab", x0, my)
+    sy = np.einsum("gat,gbt->gab", mx, y0)
+    sxx = np.einsum("gat,gbt->gab", x0 ** 2, my)
+    syy = np.einsum("gat,gbt->gab", mx, y0 ** 2)
+    sxy = np.einsum("gat,gbt->gab", x0, y0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        vx = sxx - sx ** 2 / n
+        vy = syy - sy ** 2 / n
+        r = (sxy - sx * sy / n) / np.sqrt(vx * vy)
+    # relative tolerance: a constant column leaves only rounding noise in v
+    ok = (n >= MIN_DAYS) & (vx > 1e-9 * sxx) & (vy > 1e-9 * syy)
+    return np.where(ok, np.clip(r, -1.0, 1.0), np.nan)
+
+
+def lagged_corr(X, Y, max_lag):
+    """r of X [g, a, T] with Y [g, b, T] shifted 0..max_lag days back -> [g, a, b, lag]."""
+    T = X.shape[2]
+    out = np.full((X.shape[0], X.shape[1], Y.shape[1], max_lag + 1), np.nan)
+    for lag in range(min(max_lag, T - 1) + 1):
+        out[..., lag] = pairwise_corr(X[:, :, lag:], Y[:, :, :T - lag])
+    return out
+
+
+def split_effects(values, flag):
+    """Flagged days vs the rest for values [g, m, T] and a flag [g, T] or [T].
+
+    Returns arrays [g, m]: mean_on, mean_off, lift_pct, effect_size (Cohen's
+    d with the pooled standard deviation), days_on, days_off.
+    """
+    valid = ~np.isnan(values)
+    x = np.where(valid, values, 0.0)
+    flag = np.broadcast_to(flag, values.shape[::2])[:, None, :]
+    stats = {}
+    for side, mask in (("on", valid & flag), ("off", valid & ~flag)):
+        n = mask.sum(axis=2)
+        s = np.where(mask, x, 0.0).sum(axis=2)
+        ss = np.where(mask, x ** 2, 0.0).sum(axis=2)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(n > 0, s / n, np.nan)
+            var = np.where(n > 1, (ss - n * mean ** 2) / (n - 1), np.nan)
+        stats[side] = (n, mean, np.maximum(var, 0.0))
+    (n_on, mean_on, var_on), (n_off, mean_off, var_off) = stats["on"], stats["off"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pooled = np.sqrt(((n_on - 1) * var_on + (n_off - 1) * var_off) / (n_on + n_off - 2))
+        lift = np.where(mean_off != 0, (mean_on / mean_off - 1) * 100, np.nan)
+        d = np.where(pooled > 0, (mean_on - mean_off) / pooled, np.nan)
+    return {
+        "mean_on": mean_on,
+        "mean_off": mean_off,
+        "lift_pct": lift,
+        "effect_size": d,
+        "days_on": n_on,
+        "days_off": n_off,
+    }
+
+
+class DriverAnalysis:
+    """Daily panel of every cube key plus the full-range statistics.
+
+    ``keys`` are (region, resource_type) with None for "all values";
+    ``panel`` is [key, VARIABLES, dates].
+    """
+
+    def __init__(self, keys, dates, panel):
+        self.keys = keys
+        self.dates = dates
+        self.panel = panel
+        self.results = self.compute()
+
+    @classmethod
+    def from_cube(cls, cube):
+        missing = [v for v in VARIABLES if v not in cube.metrics]
+        if missing:
+            raise KeyError(f"Dataset has no column(s): {', '.join(missing)}")
+        # pairs first, then each region, each resource type and the fleet
+        keys = sorted(
+            ((r, t) for r, t, g in cube.keys() if g == "daily"),
+            key=lambda k: (k[0] is None, k[1] is None, k[0] or "", k[1] or ""),
+        )
+        if not keys:
+            return cls([], np.array([], dtype="datetime64[D]"), np.empty((0, len(VARIABLES), 0)))
+        start = min(cube.get(*k).dates[0] for k in keys)
+        end = max(cube.get(*k).dates[-1] for k in keys)
+        dates = np.arange(start, end + 1, dtype="datetime64[D]")
+        panel = np.full((len(keys), len(VARIABLES), len(dates)), np.nan)
+        for i, key in enumerate(keys):
+            rollup = cube.get(*key)
+            cols = (rollup.dates - start).astype(np.int64)
+            for j, variable in enumerate(VARIABLES):
+                panel[i, j, cols] = rollup.mean(variable)
+        return cls(keys, dates, panel)
+
+    @classmethod
+    def from_dataset(cls, dataset):
+        return cls.from_cube(dataset.cube)
+
+    def select(self, group_by="series", region=None, resource_type=None):
+        """Indices of the keys at one GROUP_LEVELS level matching the filters."""
+        level = {
+            "series": lambda r, t: r is not None and t is not None,
+            "region": lambda r, t: r is not None and t is None,
+            "resource_type": lambda r, t: r is None and t is not None,
+            "all": lambda r, t: r is None and t is None,
+        }[group_by]
+        return [
+            i for i, (r, t) in enumerate(self.keys)
+            if level(r, t)
+            and (region is None or r == region)
+            and (resource_type is None or t == resource_type)
+        ]
+
+    def compute(self, start=None, end=None, rows=None):
+        """Statistics of the keys ``rows`` (default all) over [start, end] (inclusive days).
+
+        Arrays are indexed by position in ``rows``.
+        """
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(start, "D")))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, np.datetime64(end, "D"), "right"))
+        panel = self.panel if rows is None else self.panel[np.asarray(rows, dtype=np.int64)]
+        panel, dates = panel[:, :, lo:max(lo, hi)], self.dates[lo:max(lo, hi)]
+        usage = panel[:, :len(USAGE_METRICS)]
+        drivers = panel[:, len(USAGE_METRICS):]
+        holiday = drivers[:, DRIVERS.index("holiday")]
+        weekend = calendar_columns(dates)["is_weekend"].astype(bool)
+        return {
+            "days": (~np.isnan(usage)).any(axis=1).sum(axis=1),
+            "correlation": pairwise_corr(panel, panel),
+            "cross_correlation": lagged_corr(usage, drivers, MAX_LAG),
+            "effects": {
+                # aggregated keys average the 0/1 flag; a day counts as a
+                # holiday when most of its rows are
+                "holiday": split_effects(usage, np.nan_to_num(holiday) >= 0.5),
+                "weekend": split_effects(usage, weekend),
+            },
+        }
@@ -0,0 +1,122 @@
+import base64
+
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# RAW DATA EXPORT
+# -----------------------------------------------------------------------------
+# Chunked serializers for /api/data/raw. Each streamer pulls formatted frames
+# from a ``source(columns)`` callable (store positions cut into
+# ``chunk_rows`` slices, or a partition scan), so memory stays flat
+# regardless of how many rows are exported.
+
+EXPORT_FORMATS = {
+    "json": "application/json",
+    "columnar": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+DEFAULT_CHUNK_ROWS = 5000
+
+
+def encode_cursor(offset):
+    return base64.urlsafe_b64encode(str(int(offset)).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        offset = int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except ValueError as exc:
+        raise ValueError(f"Invalid cursor: {cursor}") from exc
+    if offset < 0:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return offset
+
+
+def page_positions(pos, offset=0, limit=None):
+    """Apply offset/limit to a store position selection (slice or array)."""
+    total = (pos.stop - pos.start) if isinstance(pos, slice) else len(pos)
+    stop = total if limit is None else min(total, offset + limit)
+    start = min(offset, total)
+    if isinstance(pos, slice):
+        page = slice(pos.start + start, pos.start + stop)
+    else:
+        page = pos[start:stop]
+    next_offset = stop if stop < total else None
+    return page, total, next_offset
+
+
+def _chunks(df, pos, columns, chunk_rows):
+    if isinstance(pos, slice):
+        starts = range(pos.start, pos.stop, chunk_rows)
+        for s in starts:
+            yield _format_chunk(df.iloc[s:min(s + chunk_rows, pos.stop)], columns)
+    else:
+        for s in range(0, len(pos), chunk_rows):
+            yield _format_chunk(df.take(pos[s:s + chunk_rows]), columns)
+
+
+def _format_chunk(chunk, columns):
+    chunk = chunk[columns]
+    if "date" in columns:
+        chunk = chunk.assign(date=np.datetime_as_string(chunk["date"].values, unit="D"))
+    return chunk
+
+
+def row_source(df, pos, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Source over store positions (slice or array) of ``df``."""
+    return lambda columns: _chunks(df, pos, columns, chunk_rows)
+
+
+def frame_source(scan):
+    """Source over the frames yielded by ``scan(columns)``."""
+    return lambda columns: (_format_chunk(frame, columns) for frame in scan(columns))
+
+
+def stream_json(source, columns):
+    yield "["
+    first = True
+    for chunk in source(columns):
+        if chunk.empty:
+            continue
+        body = chunk.to_json(orient="records")[1:-1]
+        yield body if first else "," + body
+        first = False
+    yield "]"
+
+
+def stream_ndjson(source, columns):
+    for chunk in source(columns):
+        if not chunk.empty:
+            yield chunk.to_json(orient="records", lines=True).rstrip("\n") + "\n"
+
+
+def stream_csv(source, columns):
+    yield ",".join(columns) + "\n"
+    for chunk in source(columns):
+        yield chunk.to_csv(index=False, header=False)
+
+
+def stream_columnar(source, columns):
+    # {"columns": [...], "data": {"col": [...], ...}} streamed one column at a time
+    yield '{"columns":[' + ",".join(f'"{c}"' for c in columns) + '],"data":{'
+    for i, col in enumerate(columns):
+        yield ("," if i else "") + f'"{col}":['
+        first = True
+        for chunk in source([col]):
+            if chunk.empty:
+                continue
+            body = chunk[col].to_json(orient="values")[1:-1]
+            yield body if first else "," + body
+            first = False
+        yield "]"
+    yield "}}"
+
+
+STREAMERS = {
+    "json": stream_json,
+    "columnar": stream_columnar,
+    "ndjson": stream_ndjson,
+    "csv": stream_csv,
+}
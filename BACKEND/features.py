@@ -0,0 +1,226 @@
+import numpy as np
+
+from rollups import bucket_dates
+
+# -----------------------------------------------------------------------------
+# FEATURE ENGINE
+# -----------------------------------------------------------------------------
+# The columns of feature_engineered.csv (calendar fields, usage_cpu lags,
+# 7/30 day rolling mean/max/min, allocations and ratios), computed per
+# region x resource_type series from the daily rollups of the cube, so they
+# follow reloads, appends and partitioned datasets instead of being a frozen
+# snapshot. All series are laid out back to back in flat arrays sorted by
+# (series, date); every kernel takes the index of each row's first series
+# row and works on the whole table at once. Rolling windows count days of
+# the series and, like pandas' rolling(window, min_periods=1), include the
+# current day and shrink at the start of a series.
+#
+# On append only the days from the first batch date on are recomputed, from
+# a look-back of LOOKBACK earlier days per series.
+
+LAGS = {"usage_cpu": (1, 3, 7)}
+ROLLING_METRICS = ("usage_cpu", "usage_storage", "users_active")
+ROLLING_WINDOWS = (7, 30)
+# metric -> (allocation column, allocated units, ratio column)
+ALLOCATIONS = {
+    "usage_cpu": ("cpu_allocation", 100.0, "utilization_ratio"),
+    "usage_storage": ("storage_allocation", 2000.0, "storage_efficiency"),
+}
+LOOKBACK = max(max(ROLLING_WINDOWS) - 1, max(k for lags in LAGS.values() for k in lags))
+
+
+def rolling_name(metric, stat, window):
+    return f"{metric}_rolling_{stat}_{window}d"
+
+
+def grouped_shift(values, first, k):
+    """``values`` k rows back within each series (NaN before the series starts)."""
+    src = np.arange(len(values)) - k
+    out = np.full(len(values), np.nan)
+    ok = src >= first
+    out[ok] = values[src[ok]]
+    return out
+
+
+def grouped_rolling_mean(values, first, window):
+    """Mean of the non-NaN values in the last ``window`` rows of each series."""
+    valid = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    end = np.arange(1, len(values) + 1)
+    lo = np.maximum(first, end - window)
+    n = counts[end] - counts[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n > 0, (sums[end] - sums[lo]) / n, np.nan)
+
+
+def grouped_rolling_extreme(ufunc, values, first, window):
+    """np.fmax/np.fmin over the last ``window`` rows of each series.
+
+    Sparse table: level k holds the extreme of 2**k rows starting at each
+    position, and any window is covered by two overlapping blocks of one
+    level, so every row is answered with two lookups.
+    """
+    n = len(values)
+    if not n:
+        return np.empty(0)
+    end = np.arange(n)
+    lo = np.maximum(first, end - window + 1)
+    level = np.floor(np.log2(end - lo + 1)).astype(np.int64)
+    levels = [values.astype(float)]
+    for k in range(1, int(level.max()) + 1):
+        prev, step = levels[-1], 1 << (k - 1)
+        levels.append(ufunc(prev, prev[np.minimum(end + step, n - 1)]))
+    table = np.stack(levels)
+    return ufunc(table[level, lo], table[level, end - (1 << level) + 1])
+
+
+def calendar_columns(dates):
+    days = np.asarray(dates, dtype="datetime64[D]")
+    # 1970-01-01 was a Thursday; pandas counts Monday as 0
+    dow = (days.view("int64") + 3) % 7
+    months = days.astype("datetime64[M]").view("int64")
+    return {
+        "day_of_week": dow,
+        "month": months % 12 + 1,
+        "year": months // 12 + 1970,
+        "quarter": (months % 12) // 3 + 1,
+        "is_weekend": (dow >= 5).astype(np.int64),
+    }
+
+
+def compute_features(dates, base, first):
+    """Feature columns for flat (series, date)-sorted ``base`` columns."""
+    columns = dict(base)
+    columns.update(calendar_columns(dates))
+    for metric, lags in LAGS.items():
+        for k in lags:
+            columns[f"{metric}_lag_{k}"] = grouped_shift(base[metric], first, k)
+    for metric in ROLLING_METRICS:
+        values = base[metric]
+        for window in ROLLING_WINDOWS:
+            columns[rolling_name(metric, "mean", window)] = grouped_rolling_mean(values, first, window)
+            columns[rolling_name(metric, "max", window)] = grouped_rolling_extreme(np.fmax, values, first, window)
+            columns[rolling_name(metric, "min", window)] = grouped_rolling_extreme(np.fmin, values, first, window)
+    for allocation, units, _ in ALLOCATIONS.values():
+        columns[allocation] = np.full(len(dates), units)
+    for metric, (_, units, ratio) in ALLOCATIONS.items():
+        columns[ratio] = base[metric] / units
+    return columns
+
+
+class FeatureTable:
+    """Engineered features of every region x resource_type daily series.
+
+    Rows of series ``i`` are ``offsets[i]:offsets[i + 1]`` of ``dates`` and
+    of every array in ``columns``.
+    """
+
+    def __init__(self, series, offsets, dates, columns):
+        self.series = series
+        self.offsets = offsets
+        self.dates = dates
+        self.columns = columns
+        self._index = {key: i for i, key in enumerate(series)}
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def names(self):
+        return ["date", "region", "resource_type", *self.columns]
+
+    @classmethod
+    def from_dataset(cls, dataset):
+        return cls.from_cube(dataset.cube)
+
+    @classmethod
+    def from_cube(cls, cube, previous=None, since=None):
+        """Features for every series of ``cube``.
+
+        With ``previous`` (the table of an earlier version whose rows before
+        ``since`` are unchanged), rows before ``since`` are copied from it
+        and only the rest is computed.
+        """
+        keys = sorted(
+            (region, resource_type) for region, resource_type, granularity in cube.keys()
+            if region is not None and resource_type is not None and granularity == "daily"
+        )
+        since = None if since is None else bucket_dates([since])[0]
+        metrics = list(cube.metrics)
+
+        kept, computed = [], []     # per series: (start, stop) in previous / in the inputs
+        inputs = {"dates": [], "first": [], **{m: [] for m in metrics}}
+        rows = 0
+        for key in keys:
+            rollup = cube.get(*key)
+            start = cut = 0
+            if previous is not None and since is not None and key in previous._index:
+                cut = int(np.searchsorted(rollup.dates, since))
+                start = int(previous.offsets[previous._index[key]])
+            lo = max(0, cut - LOOKBACK)
+            kept.append((start, start + cut))
+            inputs["dates"].append(rollup.dates[lo:])
+            inputs["first"].append(np.full(len(rollup) - lo, rows))
+            for m in metrics:
+                inputs[m].append(rollup.mean(m)[lo:])
+            computed.append((rows + cut - lo, rows + len(rollup) - lo))
+            rows += len(rollup) - lo
+
+        def flat(parts, dtype):
+            return np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+
+        dates = flat(inputs["dates"], "datetime64[D]")
+        first = flat(inputs["first"], np.int64)
+        fresh = compute_features(dates, {m: flat(inputs[m], float) for m in metrics}, first)
+
+        def splice(old, new):
+            parts = []
+            for (a, b), (c, d) in zip(kept, computed):
+                if b > a:
+                    parts.append(old[a:b])
+                parts.append(new[c:d])
+            return flat(parts, new.dtype)
+
+        old_dates = previous.dates if previous is not None else dates
+        sizes = [(b - a) + (d - c) for (a, b), (c, d) in zip(kept, computed)]
+        return cls(
+            keys,
+            np.concatenate(([0], np.cumsum(sizes, dtype=np.int64))),
+            splice(old_dates, dates),
+            {
+                name: splice(previous.columns[name] if previous is not None else values, values)
+                for name, values in fresh.items()
+            },
+        )
+
+    def updated(self, cube, since):
+        """Table for ``cube`` (this version plus rows dated ``since`` or later)."""
+        return FeatureTable.from_cube(cube, previous=self, since=since)
+
+    def positions(self, region=None, resource_type=None, start=None, end=None):
+        """Row positions of the matching series within [start, end] (inclusive days)."""
+        start = None if start is None else np.datetime64(start, "D")
+        end = None if end is None else np.datetime64(end, "D")
+        parts = []
+        for i, (reg, res) in enumerate(self.series):
+            if (region is not None and reg != region) or (resource_type is not None and res != resource_type):
+                continue
+            a, b = int(self.offsets[i]), int(self.offsets[i + 1])
+            dates = self.dates[a:b]
+            lo = a + int(np.searchsorted(dates, start)) if start is not None else a
+            hi = a + int(np.searchsorted(dates, end, "right")) if end is not None else b
+            if hi > lo:
+                parts.append(np.arange(lo, hi))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def labels(self, pos):
+        """(region, resource_type) name arrays for row positions ``pos``."""
+        which = np.searchsorted(self.offsets, pos, "right") - 1
+        regions = np.array([r for r, _ in self.series], dtype=object)
+        resources = np.array([t for _, t in self.series], dtype=object)
+        return regions[which], resources[which]
+
+    def last(self, name):
+        """Value of column ``name`` on the latest day of every series."""
+        return self.columns[name][self.offsets[1:] - 1]
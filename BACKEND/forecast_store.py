@@ -0,0 +1,117 @@
+import os
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+from dataset import VersionedJob
+from forecasting import MODELS, ForecastEngine, ForecastResult
+
+# -----------------------------------------------------------------------------
+# PRECOMPUTED FORECAST STORE
+# -----------------------------------------------------------------------------
+# The scheduler forecasts every series with every model once per dataset
+# version, out to FORECAST_PRECOMPUTE_HORIZON days. Point forecasts and
+# intervals for step k do not depend on the requested horizon, so any shorter
+# horizon is served by slicing the stored arrays. Requests only do a dict
+# lookup and a slice; model cost is paid on the refresh path.
+
+STORE_MODELS = ("best",) + MODELS
+
+
+class ForecastStore:
+    """Forecasts per (dataset version, model); keeps the last few versions."""
+
+    def __init__(self, horizon=90, keep_versions=2, cache_dir=None):
+        self.horizon = horizon
+        self.keep_versions = keep_versions
+        self.cache_dir = cache_dir
+        self._entries = {}
+        self._computed_at = {}
+        self._lock = threading.Lock()
+
+    def has(self, version):
+        return version in self._computed_at
+
+    def computed_at(self, version):
+        return self._computed_at.get(version)
+
+    def versions(self):
+        return list(self._computed_at)
+
+    def get(self, version, model, horizon=None, rows=None):
+        """Stored result sliced to ``rows``/``horizon``, or None if not precomputed."""
+        result = self._entries.get((version, model))
+        if result is None or (horizon is not None and horizon > self.horizon):
+            return None
+        return result.subset(rows, horizon)
+
+    def put(self, version, results, computed_at=None):
+        with self._lock:
+            for model, result in results.items():
+                self._entries[(version, model)] = result
+            self._computed_at[version] = computed_at or datetime.now(timezone.utc)
+            # drop the oldest versions beyond keep_versions
+            for old in list(self._computed_at)[:-self.keep_versions]:
+                del self._computed_at[old]
+                for key in [k for k in self._entries if k[0] == old]:
+                    del self._entries[key]
+
+    # -- optional on-disk persistence (one .npz per version/model) -------------
+    def _path(self, version, model):
+        return os.path.join(self.cache_dir, version, f"{model}_{self.horizon}.npz")
+
+    def load_from_disk(self, version, engine):
+        if not self.cache_dir:
+            return None
+        results = {}
+        for model in STORE_MODELS:
+            try:
+                with np.load(self._path(version, model), allow_pickle=False) as data:
+                    results[model] = ForecastResult(
+                        engine.panel.keys, data["dates"], data["models"],
+                        data["forecast"], data["lower"], data["upper"],
+                    )
+            except (OSError, KeyError, ValueError):
+                return None
+        return results
+
+    def save_to_disk(self, version, results):
+        if not self.cache_dir:
+            return
+        os.makedirs(os.path.join(self.cache_dir, version), exist_ok=True)
+        for model, r in results.items():
+            tmp = self._path(version, model) + ".tmp.npz"
+            np.savez(
+                tmp, dates=r.dates, models=r.models.astype(str),
+                forecast=r.forecast, lower=r.lower, upper=r.upper,
+            )
+            os.replace(tmp, self._path(version, model))
+
+
+class ForecastScheduler(VersionedJob):
+    """Fills the ForecastStore for each dataset version.
+
+    In "background" mode callers fall back to computing the requested
+    series inline until the refresh for the current version finishes.
+    """
+
+    name = "forecast-scheduler"
+
+    def __init__(self, store, datasets, mode="sync", interval=0):
+        super().__init__(datasets, mode=mode, interval=interval)
+        self.store = store
+
+    def refresh(self, dataset):
+        if self.store.has(dataset.version):
+            return
+        engine = dataset.derived("forecast_engine", ForecastEngine.from_dataset)
+        results = self.store.load_from_disk(dataset.version, engine)
+        if results is None:
+            results = {
+                model: engine.forecast(self.store.horizon, model)
+                for model in STORE_MODELS
+            }
+            self.store.save_to_disk(dataset.version, results)
+        self.store.put(dataset.version, results)
+        self._notify(dataset, results)
@@ -0,0 +1,279 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------------------------------------------
+# FORECASTING ENGINE
+# -----------------------------------------------------------------------------
+# Every (region, resource_type, metric) daily series -- including the "all
+# regions" / "all resource types" aggregates -- is laid out as one row of a
+# dense [n_series, n_days] panel built from the rollup cube. Each model fits
+# all rows at once with array ops, so forecasting one series or the whole
+# fleet costs about the same number of Python-level steps.
+
+METRIC_MAP = {
+    "cpu": "usage_cpu",
+    "storage": "usage_storage",
+    "users": "users_active",
+}
+MODELS = ("seasonal_naive", "holt_winters", "linear_trend")
+SEASON = 7
+Z_95 = 1.959964
+HOLDOUT_DAYS = 14
+
+# Holt-Winters smoothing grid searched per series (alpha, beta, gamma)
+HW_GRID = list(itertools.product((0.2, 0.5, 0.8), (0.01, 0.1), (0.1, 0.3)))
+
+
+def _ffill_rows(values):
+    """Forward fill NaNs along each row, then back fill any leading gap."""
+    return pd.DataFrame(values).ffill(axis=1).bfill(axis=1).to_numpy()
+
+
+class SeriesPanel:
+    def __init__(self, keys, dates, values):
+        self.keys = keys
+        self.index = {k: i for i, k in enumerate(keys)}
+        self.dates = dates
+        self.values = values
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_cube(cls, cube, metrics=tuple(METRIC_MAP.values())):
+        daily = [(k[0], k[1]) for k in cube.keys() if k[2] == "daily"]
+        if not daily:
+            return cls([], np.array([], dtype="datetime64[D]"), np.empty((0, 0)))
+        start = min(cube.get(r, t).dates[0] for r, t in daily)
+        end = max(cube.get(r, t).dates[-1] for r, t in daily)
+        dates = np.arange(start, end + 1, dtype="datetime64[D]")
+
+        keys = []
+        values = np.full((len(daily) * len(metrics), len(dates)), np.nan)
+        for i, ((region, resource), metric) in enumerate(itertools.product(sorted(daily, key=str), metrics)):
+            rollup = cube.get(region, resource)
+            cols = (rollup.dates - start).astype(np.int64)
+            values[i, cols] = rollup.mean(metric)
+            keys.append((region, resource, metric))
+        return cls(keys, dates, _ffill_rows(values))
+
+
+# -----------------------------------------------------------------------------
+# MODELS (all vectorized over rows of Y: [n_series, T])
+# fit_*(Y) returns a state dict holding the in-sample residuals ("resid");
+# predict_*(state, horizon) returns (forecast [n, h], interval scale [h]).
+# -----------------------------------------------------------------------------
+def fit_seasonal_naive(Y, m=SEASON):
+    T = Y.shape[1]
+    m = min(m, T)
+    resid = Y[:, m:] - Y[:, :-m] if T > m else np.zeros((len(Y), 1))
+    return {"last": Y[:, T - m:], "m": m, "resid": resid}
+
+
+def predict_seasonal_naive(state, horizon):
+    steps = np.arange(horizon)
+    m = state["m"]
+    return state["last"][:, steps % m], np.sqrt(steps // m + 1.0)
+
+
+def fit_linear_trend(Y):
+    T = Y.shape[1]
+    x = np.arange(T, dtype=float)
+    xm = x.mean()
+    sxx = max(((x - xm) ** 2).sum(), 1e-12)
+    ym = Y.mean(axis=1, keepdims=True)
+    slope = ((Y - ym) * (x - xm)).sum(axis=1, keepdims=True) / sxx
+    intercept = ym - slope * xm
+    resid = Y - (intercept + slope * x)
+    return {"intercept": intercept, "slope": slope, "T": T, "xm": xm, "sxx": sxx, "resid": resid}
+
+
+def predict_linear_trend(state, horizon):
+    T, xm, sxx = state["T"], state["xm"], state["sxx"]
+    xf = np.arange(T, T + horizon, dtype=float)
+    fc = state["intercept"] + state["slope"] * xf
+    return fc, np.sqrt(1.0 + 1.0 / T + (xf - xm) ** 2 / sxx)
+
+
+def _holt_winters_pass(Y, alpha, beta, gamma, m):
+    n, T = Y.shape
+    level = Y[:, :m].mean(axis=1)
+    trend = (Y[:, m:2 * m].mean(axis=1) - level) / m
+    season = Y[:, :m] - level[:, None]
+    resid = np.empty((n, T - m))
+    for t in range(m, T):
+        s = season[:, t % m]
+        pred = level + trend + s
+        resid[:, t - m] = Y[:, t] - pred
+        new_level = alpha * (Y[:, t] - s) + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        season[:, t % m] = gamma * (Y[:, t] - new_level) + (1 - gamma) * s
+        level = new_level
+    return level, trend, season, resid
+
+
+def fit_holt_winters(Y, m=SEASON):
+    """Additive Holt-Winters; smoothing parameters picked per series by SSE."""
+    n, T = Y.shape
+    if T < 2 * m + 1:
+        return {"fallback": fit_linear_trend(Y), "resid": None}
+
+    best_sse = np.full(n, np.inf)
+    state = {
+        "level": np.empty(n), "trend": np.empty(n), "season": np.empty((n, m)),
+        "alpha": np.empty(n), "resid": np.empty((n, T - m)), "T": T, "m": m,
+    }
+    for alpha, beta, gamma in HW_GRID:
+        level, trend, season, r = _holt_winters_pass(Y, alpha, beta, gamma, m)
+        sse = (r ** 2).sum(axis=1)
+        better = sse < best_sse
+        if not better.any():
+            continue
+        best_sse[better] = sse[better]
+        state["level"][better] = level[better]
+        state["trend"][better] = trend[better]
+        state["season"][better] = season[better]
+        state["resid"][better] = r[better]
+        state["alpha"][better] = alpha
+    return state
+
+
+def predict_holt_winters(state, horizon):
+    if "fallback" in state:
+        return predict_linear_trend(state["fallback"], horizon)
+    T, m = state["T"], state["m"]
+    steps = np.arange(1, horizon + 1)
+    fc = state["level"][:, None] + state["trend"][:, None] * steps + state["season"][:, (T + steps - 1) % m]
+    # approximate h-step variance growth for the chosen alpha
+    scale = np.sqrt(1.0 + (steps - 1) * float(np.mean(state["alpha"])) ** 2)
+    return fc, scale
+
+
+MODEL_SPECS = {
+    "seasonal_naive": (fit_seasonal_naive, predict_seasonal_naive),
+    "holt_winters": (fit_holt_winters, predict_holt_winters),
+    "linear_trend": (fit_linear_trend, predict_linear_trend),
+}
+
+
+def _residuals(state):
+    return state["fallback"]["resid"] if "fallback" in state else state["resid"]
+
+
+def run_model(Y, horizon, model):
+    """Fit + predict; returns (forecast, in-sample residuals, interval scale)."""
+    fit, predict = MODEL_SPECS[model]
+    state = fit(Y)
+    fc, scale = predict(state, horizon)
+    return fc, _residuals(state), scale
+
+
+def fit_forecast(Y, horizon, model):
+    """Point forecast plus residual-based 95% interval for every row of Y."""
+    fc, resid, scale = run_model(Y, horizon, model)
+    return fc, *prediction_interval(fc, resid, scale)
+
+
+def prediction_interval(fc, resid, scale):
+    sigma = np.sqrt(np.nanmean(resid ** 2, axis=1, keepdims=True))
+    half = Z_95 * sigma * scale[None, :]
+    return fc - half, fc + half
+
+
+def holdout_errors(Y, models=MODELS, holdout=HOLDOUT_DAYS):
+    """Per-series MAE of each model on the last ``holdout`` days."""
+    T = Y.shape[1]
+    if T <= holdout + 2 * SEASON:
+        return {m: np.zeros(len(Y)) for m in models}
+    train, test = Y[:, :-holdout], Y[:, -holdout:]
+    return {
+        m: np.abs(run_model(train, holdout, m)[0] - test).mean(axis=1)
+        for m in models
+    }
+
+
+def forecast_rows(Y, horizon, chosen):
+    """Forecast each row of Y with its own model name from ``chosen``."""
+    n = len(Y)
+    fc = np.empty((n, horizon))
+    lower = np.empty((n, horizon))
+    upper = np.empty((n, horizon))
+    for name in MODELS:
+        sel = chosen == name
+        if sel.any():
+            fc[sel], lower[sel], upper[sel] = fit_forecast(Y[sel], horizon, name)
+    return fc, lower, upper
+
+
+class ForecastResult:
+    def __init__(self, keys, dates, models, forecast, lower, upper):
+        self.keys = keys
+        self.dates = dates
+        self.labels = np.datetime_as_string(dates, unit="D")
+        self.models = models
+        self.forecast = forecast
+        self.lower = lower
+        self.upper = upper
+
+    def subset(self, rows=None, horizon=None):
+        """Rows ``rows`` (all if None) truncated to the first ``horizon`` days."""
+        rows = slice(None) if rows is None else rows
+        h = slice(None, horizon)
+        keys = self.keys if isinstance(rows, slice) else [self.keys[r] for r in rows]
+        return ForecastResult(
+            keys, self.dates[h], self.models[rows],
+            self.forecast[rows, h], self.lower[rows, h], self.upper[rows, h],
+        )
+
+    def records(self, i):
+        """Rows in the /api/forecast response shape for series ``i``."""
+        # tolist() converts whole rows at once instead of float() per element
+        return [
+            {
+                "date": d,
+                "forecast_value": f,
+                "actual_value": None,
+                "lower_ci": lo,
+                "upper_ci": hi,
+            }
+            for d, f, lo, hi in zip(
+                self.labels.tolist(), self.forecast[i].tolist(), self.lower[i].tolist(), self.upper[i].tolist()
+            )
+        ]
+
+
+class ForecastEngine:
+    def __init__(self, panel):
+        self.panel = panel
+        self._best = None
+
+    @classmethod
+    def from_dataset(cls, dataset):
+        return cls(SeriesPanel.from_cube(dataset.cube))
+
+    def key(self, region, resource_type, metric):
+        return (region or None, resource_type or None, metric)
+
+    def set_best_models(self, models):
+        """Override the per-series "best" choice (e.g. from backtest results)."""
+        self._best = np.asarray(models)
+
+    def best_models(self):
+        """Model with the lowest holdout MAE for every series (computed once)."""
+        if self._best is None:
+            errors = holdout_errors(self.panel.values)
+            stacked = np.vstack([errors[m] for m in MODELS])
+            self._best = np.array(MODELS)[np.argmin(stacked, axis=0)]
+        return self._best
+
+    def forecast(self, horizon, model="best", keys=None):
+        panel = self.panel
+        rows = np.arange(len(panel)) if keys is None else np.array([panel.index[k] for k in keys], dtype=int)
+        chosen = self.best_models()[rows] if model == "best" else np.full(len(rows), model)
+        fc, lower, upper = forecast_rows(panel.values[rows], horizon, chosen)
+
+        last = panel.dates[-1] if len(panel.dates) else np.datetime64("today", "D")
+        dates = last + np.arange(1, horizon + 1).astype("timedelta64[D]")
+        return ForecastResult([panel.keys[r] for r in rows], dates, chosen, fc, lower, upper)
@@ -0,0 +1,32 @@
+import gc
+import os
+
+# -----------------------------------------------------------------------------
+# GUNICORN SETTINGS (gunicorn -c gunicorn.conf.py wsgi:app)
+# -----------------------------------------------------------------------------
+# The app is loaded once in the master and the workers fork from it, so the
+# dataset arrays, rollups and precomputed forecasts are shared copy-on-write.
+# Every knob can be overridden from the environment.
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", str(min(4, os.cpu_count() or 1))))
+worker_class = "gthread"
+threads = int(os.environ.get("WORKER_THREADS", "8"))
+timeout = int(os.environ.get("WORKER_TIMEOUT", "120"))
+max_requests = int(os.environ.get("MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+preload_app = True
+
+
+def when_ready(server):
+    # move the loaded objects out of the collector's generations so that gc
+    # passes in the workers don't touch (and copy) the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app import start_background_workers
+
+    # with several workers the dataset watcher always runs, so rows ingested
+    # through one worker reach the others (see INGEST_WATCH_INTERVAL)
+    start_background_workers(workers=server.cfg.workers)
@@ -0,0 +1,157 @@
+import hashlib
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from store import CATEGORY_COLUMNS
+
+# -----------------------------------------------------------------------------
+# APPEND INGESTION
+# -----------------------------------------------------------------------------
+# New rows arrive in the cleaned_merged.csv schema (CSV or JSON records).
+# ``validate_batch`` checks them against the live frame's columns and dtypes
+# and returns a typed frame; DatasetManager.append then publishes the current
+# version plus the batch without a full reload. Batches that start on or
+# after the last stored date extend the store, rollups and KPIs from the
+# batch alone. A (date, region, resource_type) key is stored once:
+# ``check_new_keys`` rejects batches that repeat one, so a retried POST
+# cannot append its rows twice.
+
+MAX_ERRORS = 20
+KEY_COLUMNS = ["date", "region", "resource_type"]
+
+
+class IngestError(ValueError):
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class IngestConflict(IngestError):
+    """Rows whose keys are already stored or repeat within the batch."""
+
+    def __init__(self, errors, keys):
+        super().__init__(errors)
+        self.keys = keys
+
+
+def _rows(mask, limit=5):
+    rows = np.flatnonzero(mask)
+    listed = ", ".join(str(i) for i in rows[:limit])
+    return f"rows {listed}" + (f" (+{len(rows) - limit} more)" if len(rows) > limit else "")
+
+
+def validate_batch(batch, schema):
+    """Typed copy of ``batch`` with the columns/dtypes of ``schema`` (a frame).
+
+    Raises IngestError listing every problem found.
+    """
+    errors = []
+    if not len(batch):
+        raise IngestError(["batch has no rows"])
+    missing = [c for c in schema.columns if c not in batch.columns]
+    extra = [c for c in batch.columns if c not in schema.columns]
+    if missing:
+        errors.append(f"missing columns: {', '.join(missing)}")
+    if extra:
+        errors.append(f"unknown columns: {', '.join(map(str, extra))}")
+    if errors:
+        raise IngestError(errors)
+
+    out = {}
+    dates = pd.to_datetime(batch["date"], errors="coerce", format="mixed")
+    if dates.isna().any():
+        errors.append(f"date: invalid or missing in {_rows(dates.isna())}")
+    out["date"] = dates
+
+    for col in CATEGORY_COLUMNS:
+        values = batch[col].astype("string").str.strip()
+        empty = values.isna() | (values == "")
+        if empty.any():
+            errors.append(f"{col}: missing in {_rows(empty)}")
+        # known names are matched case-insensitively, like DataStore.canonical
+        known = {str(c).lower(): c for c in schema[col].cat.categories}
+        out[col] = values.str.lower().map(known).fillna(values).astype(object)
+
+    for col, dtype in schema.dtypes.items():
+        if col in out:
+            continue
+        values = pd.to_numeric(batch[col], errors="coerce")
+        bad = values.isna()
+        kind = "number"
+        if pd.api.types.is_integer_dtype(dtype):
+            bad |= values.notna() & (values % 1 != 0)
+            kind = "whole number"
+        if bad.any():
+            errors.append(f"{col}: not a {kind} in {_rows(bad)}")
+        elif col.startswith(("usage_", "users_")) and (values < 0).any():
+            errors.append(f"{col}: negative in {_rows(values < 0)}")
+        elif col == "holiday" and not values.isin([0, 1]).all():
+            errors.append(f"holiday: not 0/1 in {_rows(~values.isin([0, 1]))}")
+        out[col] = values
+
+    if errors:
+        raise IngestError(errors[:MAX_ERRORS])
+    frame = pd.DataFrame(out, columns=list(schema.columns))
+    numeric = [c for c in schema.columns if c != "date" and c not in CATEGORY_COLUMNS]
+    return frame.astype({c: schema.dtypes[c] for c in numeric})
+
+
+def _keys(frame):
+    return pd.DataFrame({
+        "date": np.asarray(frame["date"].values, dtype="datetime64[D]"),
+        "region": frame["region"].astype(str).to_numpy(),
+        "resource_type": frame["resource_type"].astype(str).to_numpy(),
+    })
+
+
+def check_new_keys(batch, store):
+    """Raise IngestConflict when a (date, region, resource_type) of ``batch``
+    (as returned by validate_batch) repeats within it or is already in
+    ``store``. Only stored rows within the batch's date range are read.
+    """
+    keys = _keys(batch)
+    repeated = keys.duplicated(keep=False).to_numpy()
+    start, end = keys["date"].min(), keys["date"].max()
+    stored = [_keys(df) for df in store.scan(start_date=start, end_date=end, columns=KEY_COLUMNS)]
+    stored = pd.concat(stored, ignore_index=True).drop_duplicates() if stored else keys.iloc[:0]
+    existing = keys.merge(stored.assign(_stored=True), on=KEY_COLUMNS, how="left")["_stored"].notna().to_numpy()
+
+    errors = []
+    if existing.any():
+        errors.append(f"already stored: {_rows(existing)}")
+    if repeated.any():
+        errors.append(f"repeated within the batch: {_rows(repeated)}")
+    if errors:
+        conflicts = keys[existing | repeated].drop_duplicates().head(MAX_ERRORS)
+        conflicts["date"] = np.datetime_as_string(conflicts["date"].to_numpy(dtype="datetime64[D]"), unit="D")
+        raise IngestConflict(errors, conflicts.to_dict("records"))
+
+
+def batch_version(previous, batch):
+    """Version id for ``previous`` plus ``batch`` (same length as CSV digests)."""
+    h = hashlib.sha1(previous.encode())
+    h.update(pd.util.hash_pandas_object(batch, index=False).to_numpy().tobytes())
+    return h.hexdigest()[:16]
+
+
+def csv_rows(path, batch):
+    """Bytes that append ``batch`` to the CSV at ``path`` in the file's column order."""
+    with open(path, "rb") as fh:
+        header = fh.readline().decode().strip().split(",")
+        fh.seek(0, os.SEEK_END)
+        fh.seek(max(0, fh.tell() - 1))
+        needs_newline = fh.read(1) not in (b"\n", b"")
+    out = io.StringIO()
+    if needs_newline:
+        out.write("\n")
+    batch.to_csv(out, columns=header, header=False, index=False, date_format="%Y-%m-%d", lineterminator="\n")
+    return out.getvalue().encode()
+
+
+def append_csv(path, rows):
+    """Append ``rows`` (from csv_rows) to the CSV at ``path``."""
+    with open(path, "ab") as fh:
+        fh.write(rows)
@@ -0,0 +1,251 @@
+import cProfile
+import pstats
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, has_request_context, jsonify, request
+from flask.json.provider import JSONProvider
+
+# -----------------------------------------------------------------------------
+# REQUEST INSTRUMENTATION
+# -----------------------------------------------------------------------------
+# Views wrap their phases in ``span("filter" | "aggregate" | "model" | ...)``.
+# Each span feeds a per-name latency histogram and the request's
+# Server-Timing header; JSON serialization is timed as "serialize" by the
+# JSON provider. Request counts and latency histograms per endpoint are
+# rendered in the Prometheus text format. ``?profile=1`` (for allowed
+# callers) runs the request under cProfile and returns the breakdown instead
+# of the normal body. With instrumentation disabled, ``span`` hands back a
+# shared no-op context manager and no hooks are installed.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_TOP = 40
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets, self.counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """Process-wide counters and histograms."""
+
+    def __init__(self):
+        self.requests = {}
+        self.latency = {}
+        self.spans = {}
+        self._lock = threading.Lock()
+
+    def observe_request(self, method, endpoint, status, seconds):
+        with self._lock:
+            key = (method, endpoint, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            hist = self.latency.get(endpoint)
+            if hist is None:
+                hist = self.latency[endpoint] = Histogram()
+            hist.observe(seconds)
+
+    def observe_span(self, name, seconds):
+        with self._lock:
+            hist = self.spans.get(name)
+            if hist is None:
+                hist = self.spans[name] = Histogram()
+            hist.observe(seconds)
+
+    def render(self, gauges=None):
+        """Prometheus text exposition; ``gauges`` maps name -> (help, value)."""
+        with self._lock:
+            lines = [
+                "# HELP http_requests_total Requests handled, by endpoint and status.",
+                "# TYPE http_requests_total counter",
+            ]
+            for (method, endpoint, status), n in sorted(self.requests.items()):
+                lines.append(
+                    f'http_requests_total{{method="{method}",endpoint="{_escape(endpoint)}",status="{status}"}} {n}'
+                )
+            lines += [
+                "# HELP http_request_duration_seconds Request latency, by endpoint.",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+            for endpoint, hist in sorted(self.latency.items()):
+                lines += hist.render("http_request_duration_seconds", f'endpoint="{_escape(endpoint)}"')
+            lines += [
+                "# HELP span_duration_seconds Time spent in instrumented phases of a request.",
+                "# TYPE span_duration_seconds histogram",
+            ]
+            for name, hist in sorted(self.spans.items()):
+                lines += hist.render("span_duration_seconds", f'span="{_escape(name)}"')
+        for name, (help_text, value) in (gauges or {}).items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("name", "metrics", "started")
+
+    def __init__(self, name, metrics):
+        self.name = name
+        self.metrics = metrics
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        self.metrics.observe_span(self.name, elapsed)
+        if has_request_context():
+            spans = g.get("_spans")
+            if spans is not None:
+                spans.append((self.name, elapsed))
+        return False
+
+
+class Instrumentation:
+    """
+    ``allow_profile()`` decides (inside a request) whether ``?profile=1`` is
+    honoured; by default it never is.
+    """
+
+    def __init__(self, app=None, enabled=True, allow_profile=None):
+        self.enabled = enabled
+        self.metrics = Metrics()
+        self.allow_profile = allow_profile or (lambda: False)
+        if app is not None:
+            self.init_app(app)
+
+    def span(self, name):
+        if not self.enabled:
+            return _NOOP
+        return _Span(name, self.metrics)
+
+    def init_app(self, app):
+        if not self.enabled:
+            return
+        app.json = InstrumentedJSONProvider(app, app.json, self)
+        app.before_request(self._before)
+        app.after_request(self._after)
+
+    def _before(self):
+        g._started = time.perf_counter()
+        g._spans = []
+        if request.args.get("profile") == "1" and self.allow_profile():
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # another profiler is already active
+                return
+            g._profiler = profiler
+
+    def _after(self, response):
+        started = g.get("_started")
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        spans = g.get("_spans") or []
+        profiler = g.pop("_profiler", None)
+        if profiler is not None:
+            streamed = response.is_streamed
+            if streamed:
+                # drain the stream so its encoding shows up in the profile
+                response.make_sequence()
+            profiler.disable()
+            response = self._profile_response(profiler, response, elapsed, spans, streamed)
+
+        rule = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        method = request.method
+        status = response.status_code
+        if response.is_streamed:
+            # count the whole stream, not just the time to the first byte
+            response.call_on_close(
+                lambda: self.metrics.observe_request(method, rule, status, time.perf_counter() - started)
+            )
+        else:
+            self.metrics.observe_request(method, rule, status, elapsed)
+
+        timings = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in spans]
+        timings.append(f"app;dur={elapsed * 1000:.2f}")
+        response.headers["Server-Timing"] = ", ".join(timings)
+        return response
+
+    def _profile_response(self, profiler, response, elapsed, spans, streamed):
+        stats = pstats.Stats(profiler)
+        rows = []
+        for (filename, line, func), (cc, nc, tt, ct, _) in stats.stats.items():
+            rows.append(
+                {
+                    "function": func,
+                    "location": f"{filename}:{line}",
+                    "calls": nc,
+                    "primitive_calls": cc,
+                    "self_ms": round(tt * 1000, 3),
+                    "cumulative_ms": round(ct * 1000, 3),
+                }
+            )
+        rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+        body = {
+            "path": request.full_path,
+            "status": response.status_code,
+            "elapsed_ms": round(elapsed * 1000, 3),
+            "streamed": streamed,
+            "spans": [{"name": n, "ms": round(s * 1000, 3)} for n, s in spans],
+            "profile": rows[:PROFILE_TOP],
+        }
+        profiled = jsonify(body)
+        profiled.headers["Cache-Control"] = "no-store"
+        response.close()
+        return profiled
+
+
+class InstrumentedJSONProvider(JSONProvider):
+    """Wraps the app's JSON provider and times response serialization."""
+
+    def __init__(self, app, inner, instrumentation):
+        super().__init__(app)
+        self.inner = inner
+        self.instrumentation = instrumentation
+
+    def dumps(self, obj, **kwargs):
+        return self.inner.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        return self.inner.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        with self.instrumentation.span("serialize"):
+            return self.inner.response(*args, **kwargs)
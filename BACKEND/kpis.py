@@ -0,0 +1,173 @@
+import numpy as np
+
+# -----------------------------------------------------------------------------
+# HEADLINE KPIs
+# -----------------------------------------------------------------------------
+# KPIState holds the additive pieces of the /api/kpis payload (sums, counts,
+# peaks with the row they came from, holiday splits, date bounds and the
+# distinct regions/resource types). States of separate row blocks merge into
+# the state of their union, so an append only has to summarize the new rows
+# and a partitioned dataset is summarized one partition at a time.
+
+PEAK_METRICS = ("usage_cpu", "usage_storage", "users_active")
+
+
+class _Peak:
+    __slots__ = ("value", "date", "region", "resource_type")
+
+    def __init__(self, value, date=None, region=None, resource_type=None):
+        self.value = value
+        self.date = date
+        self.region = region
+        self.resource_type = resource_type
+
+    def details(self):
+        return {
+            "date": self.date.strftime("%Y-%m-%d"),
+            "region": self.region,
+            "resource_type": self.resource_type,
+        }
+
+
+class KPIState:
+    def __init__(self, rows, sums, counts, peaks, holiday, min_date, max_date, regions, resource_types):
+        self.rows = rows
+        self.sums = sums
+        self.counts = counts
+        self.peaks = peaks
+        self.holiday = holiday          # holiday value -> (cpu sum, cpu count)
+        self.min_date = min_date
+        self.max_date = max_date
+        self.regions = regions
+        self.resource_types = resource_types
+
+    @classmethod
+    def from_frame(cls, df):
+        sums, counts, peaks = {}, {}, {}
+        for metric in PEAK_METRICS:
+            values = df[metric]
+            sums[metric] = float(values.sum())
+            counts[metric] = int(values.count())
+            if counts[metric]:
+                # first occurrence of the maximum, like idxmax
+                row = df.iloc[int(np.nanargmax(values.to_numpy(dtype="float64")))]
+                peaks[metric] = _Peak(row[metric], row["date"], row["region"], row["resource_type"])
+            else:
+                peaks[metric] = _Peak(None)
+
+        holiday = {}
+        if len(df):
+            cpu = df.groupby("holiday", observed=True)["usage_cpu"].agg(["sum", "count"])
+            holiday = {key: (float(s), int(c)) for key, (s, c) in zip(cpu.index, cpu.to_numpy())}
+
+        return cls(
+            rows=len(df),
+            sums=sums,
+            counts=counts,
+            peaks=peaks,
+            holiday=holiday,
+            min_date=df["date"].min() if len(df) else None,
+            max_date=df["date"].max() if len(df) else None,
+            regions=frozenset(df["region"].dropna().unique()),
+            resource_types=frozenset(df["resource_type"].dropna().unique()),
+        )
+
+    @classmethod
+    def from_frames(cls, frames):
+        state = None
+        for df in frames:
+            part = cls.from_frame(df)
+            state = part if state is None else state.merge(part)
+        return state
+
+    def merge(self, later):
+        """State of this block followed by ``later``.
+
+        Equal peaks keep the earlier date, then the earlier block, which is
+        what idxmax picks on the date-sorted frame.
+        """
+        if not later.rows:
+            return self
+        if not self.rows:
+            return later
+        peaks = {}
+        for metric in PEAK_METRICS:
+            mine, theirs = self.peaks[metric], later.peaks[metric]
+            if mine.value is None or (
+                theirs.value is not None
+                and (theirs.value, mine.date) > (mine.value, theirs.date)
+            ):
+                peaks[metric] = theirs
+            else:
+                peaks[metric] = mine
+        holiday = dict(self.holiday)
+        for key, (s, c) in later.holiday.items():
+            s0, c0 = holiday.get(key, (0.0, 0))
+            holiday[key] = (s0 + s, c0 + c)
+        return KPIState(
+            rows=self.rows + later.rows,
+            sums={m: self.sums[m] + later.sums[m] for m in PEAK_METRICS},
+            counts={m: self.counts[m] + later.counts[m] for m in PEAK_METRICS},
+            peaks=peaks,
+            holiday=holiday,
+            min_date=min(self.min_date, later.min_date),
+            max_date=max(self.max_date, later.max_date),
+            regions=self.regions | later.regions,
+            resource_types=self.resource_types | later.resource_types,
+        )
+
+    def mean(self, metric):
+        count = self.counts[metric]
+        return self.sums[metric] / count if count else float("nan")
+
+    def result(self):
+        if not self.rows:
+            return None
+
+        # Holiday impact on CPU
+        if len(self.holiday) > 1:
+            s1, c1 = self.holiday.get(1, (0.0, 0))
+            s0, c0 = self.holiday.get(0, (0.0, 0))
+            cpu_holiday = s1 / c1 if c1 else float("nan")
+            cpu_work = s0 / c0 if c0 else float("nan")
+            if cpu_work != 0:
+                holiday_pct = (cpu_holiday - cpu_work) / cpu_work * 100.0
+            else:
+                holiday_pct = 0.0
+        else:
+            holiday_pct = 0.0
+
+        days_span = (self.max_date - self.min_date).days + 1
+        cpu, storage, users = (self.peaks[m] for m in PEAK_METRICS)
+        return {
+            "peak_cpu": float(cpu.value),
+            "avg_cpu": self.mean("usage_cpu"),
+            "peak_cpu_details": cpu.details(),
+            "max_storage": float(storage.value),
+            "avg_storage": self.mean("usage_storage"),
+            "max_storage_details": storage.details(),
+            "peak_users": int(users.value),
+            "avg_users": self.mean("users_active"),
+            "peak_users_details": users.details(),
+            "holiday_impact": {
+                "percentage": float(holiday_pct),
+            },
+            "total_regions": len(self.regions),
+            "total_resource_types": len(self.resource_types),
+            "data_points": int(self.rows),
+            "date_range": {
+                "start": self.min_date.strftime("%Y-%m-%d"),
+                "end": self.max_date.strftime("%Y-%m-%d"),
+                "days": int(days_span),
+            },
+        }
+
+
+def compute_kpis(df):
+    return KPIState.from_frame(df).result()
+
+
+def scan_kpis(frames):
+    """KPIs over an iterator of frames (None when nothing matched)."""
+    state = KPIState.from_frames(frames)
+    return None if state is None else state.result()
@@ -0,0 +1,163 @@
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+from forecasting import ForecastEngine, forecast_rows
+
+# -----------------------------------------------------------------------------
+# MODEL-DRIFT MONITORING
+# -----------------------------------------------------------------------------
+# Each time forecasts are refreshed for a new dataset version, the forecasts
+# stored for the previous version are scored against the actuals that have
+# arrived since. Per series the monitor keeps a fixed-size ring buffer of
+# daily accuracy (100 - APE) and a Page-Hinkley drift statistic on the
+# absolute percentage error. Each new day costs O(1) per series; history is
+# never rescanned.
+
+HEALTH_GREEN = 85.0
+HEALTH_YELLOW = 70.0
+# share of series allowed to show drift before health drops below green
+DRIFT_TOLERANCE = 0.25
+
+
+class DriftMonitor:
+    def __init__(self, keys, window=90, delta=0.5, threshold=50.0):
+        n = len(keys)
+        self.keys = list(keys)
+        self.index = {k: i for i, k in enumerate(self.keys)}
+        self.window = window
+        self.delta = delta
+        self.threshold = threshold
+        self.dates = np.full(window, np.datetime64("NaT"), dtype="datetime64[D]")
+        self.accuracy = np.full((n, window), np.nan)
+        self.pos = 0
+        self.filled = 0
+        self.last_date = None
+        # Page-Hinkley running state
+        self.ph_count = np.zeros(n)
+        self.ph_mean = np.zeros(n)
+        self.ph_cum = np.zeros(n)
+        self.ph_min = np.zeros(n)
+
+    def update(self, date, forecast, actual):
+        """Record one day of forecasts vs actuals for every series."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ape = np.where(np.abs(actual) > 1e-9, np.abs(forecast - actual) / np.abs(actual) * 100.0, 0.0)
+        self.dates[self.pos] = date
+        self.accuracy[:, self.pos] = np.clip(100.0 - ape, 0.0, 100.0)
+        self.pos = (self.pos + 1) % self.window
+        self.filled = min(self.filled + 1, self.window)
+        self.last_date = np.datetime64(date, "D")
+
+        self.ph_count += 1
+        self.ph_mean += (ape - self.ph_mean) / self.ph_count
+        self.ph_cum += ape - self.ph_mean - self.delta
+        self.ph_min = np.minimum(self.ph_min, self.ph_cum)
+
+    @property
+    def drift_score(self):
+        return self.ph_cum - self.ph_min
+
+    def recent(self, days):
+        """Ring-buffer columns for the last ``days`` days, oldest first."""
+        days = min(days, self.filled)
+        return (self.pos - days + np.arange(days)) % self.window
+
+    def stats(self, rows, days):
+        cols = self.recent(days)
+        acc = self.accuracy[np.ix_(rows, cols)]
+        with np.errstate(invalid="ignore"):
+            trend = np.nanmean(acc, axis=0) if len(rows) else np.array([])
+        score = self.drift_score[rows]
+        return {
+            "dates": np.datetime_as_string(self.dates[cols], unit="D"),
+            "trend": trend,
+            "drift_score": float(score.mean()) if len(rows) else 0.0,
+            "drifting_series": int((score > self.threshold).sum()),
+        }
+
+
+class MonitoringPipeline:
+    """Feeds the DriftMonitor from forecast refreshes (a ForecastScheduler listener)."""
+
+    def __init__(self, window=90):
+        self.window = window
+        self.monitor = None
+        self.last_retrain = None
+        self._previous = None
+        self._lock = threading.Lock()
+
+    def on_forecasts(self, dataset, results):
+        engine = dataset.derived("forecast_engine", ForecastEngine.from_dataset)
+        panel = engine.panel
+        with self._lock:
+            if self.monitor is None or self.monitor.keys != list(panel.keys):
+                self._bootstrap(engine)
+            elif self._previous is not None:
+                self._score(self._previous, panel)
+            self._previous = results["best"]
+            self.last_retrain = datetime.now(timezone.utc)
+
+    def _score(self, previous, panel):
+        if list(previous.keys) != list(panel.keys) or not len(panel.dates):
+            return
+        # only the dates that are new since the last update
+        last = self.monitor.last_date
+        for j, date in enumerate(previous.dates):
+            if last is not None and date <= last:
+                continue
+            col = int((date - panel.dates[0]).astype(int))
+            if col >= len(panel.dates):
+                break
+            self.monitor.update(date, previous.forecast[:, j], panel.values[:, col])
+
+    def _bootstrap(self, engine):
+        # seed the window by forecasting the last days from the data before them
+        panel = engine.panel
+        self.monitor = DriftMonitor(panel.keys, window=self.window)
+        T = panel.values.shape[1] if len(panel) else 0
+        days = min(self.window, T // 3)
+        if days < 1:
+            return
+        fc = forecast_rows(panel.values[:, :T - days], days, engine.best_models())[0]
+        for j in range(days):
+            col = T - days + j
+            self.monitor.update(panel.dates[col], fc[:, j], panel.values[:, col])
+
+    def summary(self, keys, window_days):
+        with self._lock:
+            monitor = self.monitor
+            if monitor is None:
+                return None
+            rows = [monitor.index[k] for k in keys if k in monitor.index]
+            stats = monitor.stats(np.array(rows, dtype=int), window_days)
+
+        trend = stats["trend"]
+        valid = trend[~np.isnan(trend)] if len(trend) else trend
+        current = float(valid[-1]) if len(valid) else None
+        drift = float(valid[-1] - valid[0]) if len(valid) > 1 else 0.0
+
+        if current is None:
+            health = "unknown"
+        elif current > HEALTH_GREEN and stats["drifting_series"] <= DRIFT_TOLERANCE * len(rows):
+            health = "green"
+        elif current > HEALTH_YELLOW:
+            health = "yellow"
+        else:
+            health = "red"
+
+        return {
+            "accuracy_trend": [
+                {"date": d, "value": float(v)}
+                for d, v in zip(stats["dates"], trend)
+                if not np.isnan(v)
+            ],
+            "current_accuracy": current,
+            "drift": drift,
+            "drift_score": stats["drift_score"],
+            "drifting_series": stats["drifting_series"],
+            "series_count": len(rows),
+            "last_retrain": self.last_retrain.strftime("%Y-%m-%d") if self.last_retrain else None,
+            "health": health,
+        }
@@ -0,0 +1,302 @@
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from dataset import AppendUnsupported, Dataset
+from rollups import RollupCube
+from store import CATEGORY_COLUMNS
+
+# -----------------------------------------------------------------------------
+# OUT-OF-CORE PARTITIONED DATASET
+# -----------------------------------------------------------------------------
+# For data that does not fit in one frame, the CSV is streamed once into
+# month x region partitions on disk, one .npy file per column (the snapshot
+# layout), next to a manifest with each partition's row count and date range:
+#
+#   <root>/<version>/manifest.json
+#   <root>/<version>/2023-01/r000-0/{date,region,resource_type,...}.npy
+#
+# PartitionStore answers the DataStore read API by memory-mapping only the
+# partitions a filter can touch (region from the partition key, dates from
+# the month and the partition's min/max). Scans hand out chunks of about
+# ``chunk_rows`` rows made of consecutive partitions, and the rollup cube and
+# headline KPIs are built by merging per-chunk results, so memory stays
+# bounded by a few chunks.
+
+PARTITION_FORMAT = 1
+MANIFEST = "manifest.json"
+
+
+def _day(value):
+    return np.datetime64(pd.to_datetime(value), "D")
+
+
+def build_partitions(csv_path, root, version, chunk_rows=500_000):
+    """Stream ``csv_path`` into partitions under ``root/version`` (reused if present)."""
+    target = os.path.join(root, version)
+    if os.path.exists(os.path.join(target, MANIFEST)):
+        return target
+    os.makedirs(root, exist_ok=True)
+    tmp = os.path.join(root, f".{version}.{uuid.uuid4().hex[:8]}.tmp")
+    os.makedirs(tmp)
+
+    names = {col: {} for col in CATEGORY_COLUMNS}
+    partitions = []
+    columns = None
+    dtypes = {}
+    rows = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+        if columns is None:
+            columns = list(chunk.columns)
+        chunk["date"] = pd.to_datetime(chunk["date"])
+        chunk = chunk.sort_values("date", kind="stable")
+        codes = {}
+        for col in CATEGORY_COLUMNS:
+            known = names[col]
+            for value in chunk[col].unique():
+                known.setdefault(value, len(known))
+            codes[col] = chunk[col].map(known).to_numpy(dtype=np.int16)
+        months = chunk["date"].values.astype("datetime64[M]")
+
+        for (month, region), idx in chunk.groupby([months, codes["region"]], sort=True).indices.items():
+            part = chunk.iloc[idx]
+            month = str(np.datetime64(month, "M"))
+            name = f"r{int(region):03d}-{len(partitions)}"
+            folder = os.path.join(tmp, month, name)
+            os.makedirs(folder)
+            for col in columns:
+                if col in CATEGORY_COLUMNS:
+                    values = codes[col][idx]
+                elif col == "date":
+                    values = part["date"].values.astype("datetime64[D]")
+                else:
+                    values = part[col].to_numpy()
+                    if values.dtype == object:
+                        raise TypeError(f"Column {col!r} has object dtype and cannot be partitioned")
+                    # keep the widest dtype seen, so every partition loads alike
+                    dtypes[col] = np.promote_types(dtypes.get(col, values.dtype), values.dtype).str
+                np.save(os.path.join(folder, f"{col}.npy"), np.ascontiguousarray(values), allow_pickle=False)
+            dates = part["date"].values
+            partitions.append({
+                "dir": f"{month}/{name}",
+                "month": month,
+                "region": int(region),
+                "resource_types": sorted(int(c) for c in np.unique(codes["resource_type"][idx])),
+                "rows": int(len(part)),
+                "min_date": str(dates[0].astype("datetime64[D]")),
+                "max_date": str(dates[-1].astype("datetime64[D]")),
+            })
+            rows += len(part)
+
+    partitions.sort(key=lambda p: (p["month"], p["region"], p["dir"]))
+    manifest = {
+        "format": PARTITION_FORMAT,
+        "version": version,
+        "rows": rows,
+        "columns": columns or [],
+        "dtypes": dtypes,
+        "categories": {col: [str(v) for v in names[col]] for col in CATEGORY_COLUMNS},
+        "partitions": partitions,
+    }
+    with open(os.path.join(tmp, MANIFEST), "w") as fh:
+        json.dump(manifest, fh)
+    try:
+        os.replace(tmp, target)
+    except OSError:  # another process finished first
+        shutil.rmtree(tmp, ignore_errors=True)
+    _remove_stale(root, keep=version)
+    return target
+
+
+def _remove_stale(root, keep, retain=1):
+    # partitions are read lazily, so the newest ``retain`` older versions stay
+    # for requests that are still scanning them
+    older = [
+        os.path.join(root, entry) for entry in os.listdir(root)
+        if entry != keep and not entry.startswith(".") and os.path.isdir(os.path.join(root, entry))
+    ]
+    older.sort(key=os.path.getmtime, reverse=True)
+    for path in older[retain:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class PartitionStore:
+    """Read side of a partitioned dataset with the DataStore query methods.
+
+    ``df`` is None: callers go through ``scan`` (an iterator of frames, one
+    partition at a time) or the small aggregates built from it.
+    """
+
+    df = None
+
+    def __init__(self, folder, chunk_rows=500_000):
+        self.chunk_rows = chunk_rows
+        with open(os.path.join(folder, MANIFEST)) as fh:
+            manifest = json.load(fh)
+        if manifest.get("format") != PARTITION_FORMAT:
+            raise ValueError(f"Unsupported partition format in {folder}")
+        self.folder = folder
+        self.manifest = manifest
+        self.partitions = manifest["partitions"]
+        # codes on disk follow first appearance in the CSV; frames are handed
+        # out with sorted categories, like prepare_frame
+        self._categories, self._recode = {}, {}
+        for col in CATEGORY_COLUMNS:
+            stored = manifest["categories"][col]
+            self._categories[col] = pd.Index(sorted(stored))
+            self._recode[col] = self._categories[col].get_indexer(stored).astype(np.int16)
+        self._names = {
+            col: {c.lower(): c for c in manifest["categories"][col]} for col in CATEGORY_COLUMNS
+        }
+        self._rows = manifest["rows"]
+        self._regions = self._recode["region"][[p["region"] for p in self.partitions]].astype(np.int64)
+        self._min_dates = np.array([p["min_date"] for p in self.partitions], dtype="datetime64[D]")
+        self._max_dates = np.array([p["max_date"] for p in self.partitions], dtype="datetime64[D]")
+
+    def __len__(self):
+        return self._rows
+
+    @property
+    def columns(self):
+        return list(self.manifest["columns"])
+
+    def date_range(self):
+        if not self.partitions:
+            raise IndexError("empty dataset")
+        return self._min_dates.min(), self._max_dates.max()
+
+    def categories(self, col):
+        return list(self._categories[col])
+
+    def canonical(self, col, value):
+        if value is None:
+            return None
+        return self._names[col].get(str(value).strip().lower())
+
+    def _prune(self, region=None, start=None, end=None):
+        keep = np.ones(len(self.partitions), dtype=bool)
+        if region:
+            name = self.canonical("region", region)
+            if name is None:
+                return []
+            keep &= self._regions == self._categories["region"].get_loc(name)
+        if start is not None:
+            keep &= self._max_dates >= start
+        if end is not None:
+            keep &= self._min_dates <= end
+        return [self.partitions[i] for i in np.flatnonzero(keep)]
+
+    def _arrays(self, part, columns):
+        # raw column arrays of one partition; category codes already recoded
+        folder = os.path.join(self.folder, part["dir"])
+        data = {}
+        for col in columns:
+            values = np.load(os.path.join(folder, f"{col}.npy"))
+            if col in CATEGORY_COLUMNS:
+                values = self._recode[col][values]
+            data[col] = values
+        return data
+
+    def _frame(self, arrays, columns):
+        data = {}
+        for col in columns:
+            values = arrays[col]
+            if col in CATEGORY_COLUMNS:
+                data[col] = pd.Categorical.from_codes(values, categories=self._categories[col])
+            elif col == "date":
+                data[col] = values.astype("datetime64[ns]")
+            else:
+                data[col] = values.astype(self.manifest["dtypes"].get(col, values.dtype), copy=False)
+        return pd.DataFrame(data, columns=columns, copy=False)
+
+    def _load(self, part, columns):
+        return self._frame(self._arrays(part, columns), columns)
+
+    def scan(self, region=None, resource_type=None, start_date=None, end_date=None, columns=None):
+        """Matching rows as date-sorted frames of about ``chunk_rows`` rows."""
+        columns = self.columns if columns is None else list(columns)
+        pending, rows = [], 0
+        for arrays in self._scan_partitions(region, resource_type, start_date, end_date, columns):
+            pending.append(arrays)
+            rows += len(arrays[columns[0]])
+            if rows >= self.chunk_rows:
+                yield self._coalesce(pending, columns)
+                pending, rows = [], 0
+        if pending:
+            yield self._coalesce(pending, columns)
+
+    def _coalesce(self, parts, columns):
+        arrays = {col: np.concatenate([p[col] for p in parts]) for col in columns}
+        if len(parts) > 1 and "date" in arrays:
+            order = np.argsort(arrays["date"], kind="stable")
+            arrays = {col: values[order] for col, values in arrays.items()}
+        return self._frame(arrays, columns)
+
+    def _scan_partitions(self, region, resource_type, start_date, end_date, columns):
+        start = _day(start_date) if start_date else None
+        end = _day(end_date) if end_date else None
+        load = list(columns)
+        if resource_type and "resource_type" not in load:
+            load.append("resource_type")
+        if (start is not None or end is not None) and "date" not in load:
+            load.append("date")
+
+        type_code = None
+        if resource_type:
+            name = self.canonical("resource_type", resource_type)
+            if name is None:
+                return
+            type_code = self._categories["resource_type"].get_loc(name)
+
+        for part in self._prune(region, start, end):
+            arrays = self._arrays(part, load)
+            mask = None
+            if type_code is not None:
+                mask = arrays["resource_type"] == type_code
+            if start is not None:
+                mask = arrays["date"] >= start if mask is None else mask & (arrays["date"] >= start)
+            if end is not None:
+                mask = arrays["date"] <= end if mask is None else mask & (arrays["date"] <= end)
+            if mask is not None:
+                if not mask.any():
+                    continue
+                arrays = {col: arrays[col][mask] for col in columns}
+            yield arrays
+
+    def filter(self, params=None):
+        """Materialized frame of the matching rows (for small selections)."""
+        params = params or {}
+        frames = list(self.scan(
+            region=params.get("region"),
+            resource_type=params.get("resource_type"),
+            start_date=params.get("start_date"),
+            end_date=params.get("end_date"),
+        ))
+        if not frames:
+            return pd.DataFrame(columns=self.columns)
+        return pd.concat(frames, ignore_index=True).sort_values("date", kind="stable", ignore_index=True)
+
+    def rows(self, region=None, resource_type=None):
+        return self.filter({"region": region, "resource_type": resource_type})
+
+    def build_cube(self, metrics=None):
+        if metrics is None:
+            metrics = [c for c in self.columns if c != "date" and c not in CATEGORY_COLUMNS]
+        cube = RollupCube({}, metrics)
+        for df in self.scan():
+            cube = cube.merge(RollupCube.build(df, metrics=metrics))
+        return cube
+
+
+class PartitionedDataset(Dataset):
+    """A Dataset whose rows stay on disk; see PartitionStore."""
+
+    def __init__(self, store, version, source=None):
+        super().__init__(None, version, source=source, store=store, cube=store.build_cube())
+
+    def appended(self, batch, version, incremental=None, check=None):
+        raise AppendUnsupported("Appending is not supported for partitioned datasets")
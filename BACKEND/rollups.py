@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------------------------------------------
+# ROLLUP CUBE
+# -----------------------------------------------------------------------------
+# Per-bucket sums and counts for every numeric metric, keyed by
+# (region, resource_type, granularity). ``None`` in a key position means
+# "all values" for that dimension, so the global daily series lives under
+# (None, None, "daily"). Means are derived as sum / count on read, which keeps
+# the cube additive (rollups can be merged or re-bucketed without the rows).
+
+GRANULARITIES = ("daily", "weekly", "monthly")
+DIMENSIONS = ("region", "resource_type")
+
+
+def bucket_dates(dates, granularity="daily"):
+    """Vectorized period start for each date (weeks start on Monday)."""
+    days = np.asarray(dates, dtype="datetime64[D]")
+    if granularity == "weekly":
+        # 1970-01-01 was a Thursday, so (days + 3) % 7 is 0 on Mondays
+        dow = (days.view("int64") + 3) % 7
+        days = days - dow.astype("timedelta64[D]")
+    elif granularity == "monthly":
+        days = days.astype("datetime64[M]").astype("datetime64[D]")
+    elif granularity != "daily":
+        raise ValueError(f"Unknown granularity: {granularity}")
+    return days
+
+
+class Rollup:
+    """Sums and non-null counts per bucket for one (region, resource_type, granularity)."""
+
+    __slots__ = ("dates", "labels", "sums", "counts")
+
+    def __init__(self, dates, sums, counts):
+        self.dates = dates
+        self.labels = np.datetime_as_string(dates, unit="D")
+        self.sums = sums
+        self.counts = counts
+
+    def __len__(self):
+        return len(self.dates)
+
+    def mean(self, metric):
+        counts = self.counts[metric]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, self.sums[metric] / counts, np.nan)
+
+    def tail(self, n):
+        if n >= len(self):
+            return self
+        return Rollup(
+            self.dates[-n:],
+            {m: v[-n:] for m, v in self.sums.items()},
+            {m: v[-n:] for m, v in self.counts.items()},
+        )
+
+    def merge(self, other):
+        """Bucket-wise sum with another rollup of the same series and granularity."""
+        dates = np.union1d(self.dates, other.dates)
+        mine = np.searchsorted(dates, self.dates)
+        theirs = np.searchsorted(dates, other.dates)
+        sums, counts = {}, {}
+        for m in self.sums:
+            sums[m] = np.zeros(len(dates))
+            sums[m][mine] = self.sums[m]
+            sums[m][theirs] += other.sums[m]
+            counts[m] = np.zeros(len(dates), dtype="int64")
+            counts[m][mine] = self.counts[m]
+            counts[m][theirs] += other.counts[m]
+        return Rollup(dates, sums, counts)
+
+
+class RollupCube:
+    def __init__(self, entries, metrics):
+        self._entries = entries
+        self.metrics = tuple(metrics)
+
+    def get(self, region=None, resource_type=None, granularity="daily"):
+        return self._entries.get((region or None, resource_type or None, granularity))
+
+    def keys(self):
+        return self._entries.keys()
+
+    def merge(self, other):
+        """Cube of the rows behind both cubes (e.g. the current data plus an append).
+
+        Work is proportional to the number of buckets touched, not rows.
+        """
+        entries = dict(self._entries)
+        for key, rollup in other._entries.items():
+            entries[key] = entries[key].merge(rollup) if key in entries else rollup
+        return RollupCube(entries, self.metrics)
+
+    def query(self, series, metrics, granularity="daily", start=None, end=None):
+        """
+        Bucketed sums and counts for many series and metrics in one pass.
+
+        ``series`` is a list of (region, resource_type) keys and ``start`` /
+        ``end`` are inclusive day bounds. The daily rollups are laid out on a
+        shared date axis, clipped to the range and re-bucketed together, so
+        partial weeks/months at the edges only count the days in range.
+        Returns (bucket_dates, sums, counts) with sums/counts shaped
+        (len(series), len(metrics), n_buckets).
+        """
+        daily = [self.get(region, resource_type) for region, resource_type in series]
+        present = [r.dates for r in daily if r is not None]
+        axis = np.unique(np.concatenate(present)) if present else np.array([], dtype="datetime64[D]")
+        if start is not None:
+            axis = axis[axis >= np.datetime64(start, "D")]
+        if end is not None:
+            axis = axis[axis <= np.datetime64(end, "D")]
+
+        sums = np.zeros((len(series), len(metrics), len(axis)))
+        counts = np.zeros((len(series), len(metrics), len(axis)), dtype="int64")
+        if not len(axis):
+            return axis, sums, counts
+        for i, rollup in enumerate(daily):
+            if rollup is None:
+                continue
+            pos = np.searchsorted(axis, rollup.dates)
+            keep = (pos < len(axis)) & (axis[np.minimum(pos, len(axis) - 1)] == rollup.dates)
+            for j, metric in enumerate(metrics):
+                sums[i, j, pos[keep]] = rollup.sums[metric][keep]
+                counts[i, j, pos[keep]] = rollup.counts[metric][keep]
+
+        buckets = bucket_dates(axis, granularity)
+        labels, starts = np.unique(buckets, return_index=True)
+        return labels, np.add.reduceat(sums, starts, axis=2), np.add.reduceat(counts, starts, axis=2)
+
+    @classmethod
+    def build(cls, df, metrics=None):
+        if metrics is None:
+            metrics = [
+                c for c in df.columns
+                if c not in DIMENSIONS and c != "date" and pd.api.types.is_numeric_dtype(df[c])
+            ]
+        entries = {}
+        if df.empty:
+            return cls(entries, metrics)
+
+        values = df[list(metrics)]
+        for granularity in GRANULARITIES:
+            bucket = pd.Series(bucket_dates(df["date"].values, granularity), index=df.index)
+            keys = [bucket.rename("bucket"), df["region"], df["resource_type"]]
+            grouped = values.groupby(keys, observed=True, sort=True)
+            base = pd.concat({"sum": grouped.sum(), "count": grouped.count()}, axis=1)
+
+            # Roll the finest level up to the "all" positions of each dimension
+            levels = {
+                ("region", "resource_type"): base,
+                ("region",): base.groupby(level=["bucket", "region"], observed=True).sum(),
+                ("resource_type",): base.groupby(level=["bucket", "resource_type"], observed=True).sum(),
+                (): base.groupby(level="bucket").sum(),
+            }
+            for dims, frame in levels.items():
+                if dims:
+                    level = list(dims) if len(dims) > 1 else dims[0]
+                    groups = frame.groupby(level=level, observed=True)
+                else:
+                    groups = [((), frame)]
+                for key, part in groups:
+                    key = key if isinstance(key, tuple) else (key,)
+                    named = dict(zip(dims, key))
+                    dates = part.index.get_level_values("bucket").values.astype("datetime64[D]")
+                    entries[(named.get("region"), named.get("resource_type"), granularity)] = Rollup(
+                        dates,
+                        {m: part[("sum", m)].to_numpy(dtype="float64") for m in metrics},
+                        {m: part[("count", m)].to_numpy(dtype="int64") for m in metrics},
+                    )
+        return cls(entries, metrics)
+
+
+def daily_panel(cube, metrics):
+    """(keys, dates, values) of every region x resource_type x metric daily series.
+
+    Days a series has no rows are NaN.
+    """
+    pairs = sorted(
+        (region, resource_type) for region, resource_type, granularity in cube.keys()
+        if region is not None and resource_type is not None and granularity == "daily"
+    )
+    keys = [(region, resource_type, metric) for region, resource_type in pairs for metric in metrics]
+    if not pairs:
+        return keys, np.array([], dtype="datetime64[D]"), np.empty((0, 0))
+    start = min(cube.get(*p).dates[0] for p in pairs)
+    end = max(cube.get(*p).dates[-1] for p in pairs)
+    dates = np.arange(start, end + 1, dtype="datetime64[D]")
+    values = np.full((len(keys), len(dates)), np.nan)
+    for i, pair in enumerate(pairs):
+        rollup = cube.get(*pair)
+        cols = (rollup.dates - start).astype(np.int64)
+        for j, metric in enumerate(metrics):
+            values[i * len(metrics) + j, cols] = rollup.mean(metric)
+    return keys, dates, values
@@ -0,0 +1,194 @@
+import gzip
+import json
+import math
+import zlib
+
+import numpy as np
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+# -----------------------------------------------------------------------------
+# RESPONSE ENCODING
+# -----------------------------------------------------------------------------
+# FastJSONProvider encodes with orjson when it is installed (numpy arrays and
+# scalars natively) and falls back to the stdlib encoder with a numpy-aware
+# ``default``. Both write NaN and +/-inf as null (the stdlib encoder would
+# emit bare NaN, which is not JSON). Views build records straight from numpy
+# columns with ``column_records`` instead of calling float() on every
+# element. Compression negotiates br/gzip from Accept-Encoding for JSON/CSV
+# bodies, and streamed exports are compressed chunk by chunk. A compressed
+# body gets its own strong ETag, the plain one suffixed with the encoding
+# ("<tag>-gzip", "<tag>-br").
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json", "application/x-ndjson", "text/csv", "text/plain", "text/html",
+}
+CONTENT_ENCODINGS = ("br", "gzip")
+
+
+def etag_variants(tag):
+    """``tag`` and the ETag of each compressed representation of the same body."""
+    return (tag, *(f"{tag}-{encoding}" for encoding in CONTENT_ENCODINGS))
+
+
+def iso_dates(values):
+    """Vectorized YYYY-MM-DD strings for datetime-like values."""
+    return np.datetime_as_string(np.asarray(values, dtype="datetime64[D]"), unit="D")
+
+
+def column_records(**columns):
+    """[{name: value, ...}, ...] from equal-length columns (numpy or lists)."""
+    names = list(columns)
+    values = [c.tolist() if isinstance(c, np.ndarray) else list(c) for c in columns.values()]
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+
+def _numpy_default(o):
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    raise TypeError
+
+
+def _finite(o):
+    """``o`` with NaN/+-inf floats (numpy included) replaced by None, like orjson."""
+    if isinstance(o, float):
+        return o if math.isfinite(o) else None
+    if isinstance(o, dict):
+        return {k: _finite(v) for k, v in o.items()}
+    if isinstance(o, (list, tuple)):
+        return [_finite(v) for v in o]
+    if isinstance(o, (np.ndarray, np.generic)):
+        return _finite(o.tolist())
+    return o
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider with an orjson fast path and numpy support."""
+
+    def _default(self, o):
+        try:
+            return _numpy_default(o)
+        except TypeError:
+            # dates keep Flask's HTTP-date format on both paths
+            return DefaultJSONProvider.default(o)
+
+    def _orjson_options(self):
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=self._default, option=self._orjson_options()).decode()
+        kwargs.setdefault("default", self._default)
+        kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+        kwargs.setdefault("sort_keys", self.sort_keys)
+        try:
+            return json.dumps(obj, allow_nan=False, **kwargs)
+        except ValueError:
+            # only payloads holding non-finite floats pay for the rewrite
+            return json.dumps(_finite(obj), allow_nan=False, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        if orjson is None or pretty:
+            return super().response(obj)
+        body = orjson.dumps(
+            obj, default=self._default, option=self._orjson_options() | orjson.OPT_APPEND_NEWLINE
+        )
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def _gzip_stream(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def _brotli_stream(chunks, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in chunks:
+        out = compressor.process(chunk)
+        if out:
+            yield out
+    yield compressor.finish()
+
+
+class Compression:
+    """Negotiated br/gzip for responses of at least ``min_size`` bytes."""
+
+    def __init__(self, app=None, min_size=1024, gzip_level=6, brotli_quality=4):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.after_request(self.compress)
+
+    def choose(self, accept):
+        br = accept.quality("br") if brotli is not None else 0
+        gz = accept.quality("gzip")
+        if br and br >= gz:
+            return "br"
+        if gz:
+            return "gzip"
+        return None
+
+    def compress(self, response):
+        if (
+            request.method == "HEAD"
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        ):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = self.choose(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            inner = response.response
+            chunks = response.iter_encoded()
+            if encoding == "br":
+                response.response = _brotli_stream(chunks, self.brotli_quality)
+            else:
+                response.response = _gzip_stream(chunks, self.gzip_level)
+            if hasattr(inner, "close"):
+                response.call_on_close(inner.close)
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            if encoding == "br":
+                data = brotli.compress(data, quality=self.brotli_quality)
+            else:
+                data = gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+            response.set_data(data)
+        response.headers["Content-Encoding"] = encoding
+        tag, weak = response.get_etag()
+        if tag:
+            response.set_etag(f"{tag}-{encoding}", weak)
+        return response
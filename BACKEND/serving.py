@@ -0,0 +1,57 @@
+import threading
+from functools import wraps
+
+from flask import jsonify, make_response
+
+# -----------------------------------------------------------------------------
+# HEAVY-ENDPOINT ADMISSION
+# -----------------------------------------------------------------------------
+# Forecasts and raw exports can hold a worker thread for a long time. Each
+# process lets at most ``slots`` of them run at once; the remaining threads
+# stay free for cheap calls (KPIs, filters, time series). A heavy request
+# that cannot get a slot within ``timeout`` seconds gets a 503 with
+# Retry-After instead of queueing behind the others. Streamed responses keep
+# their slot until the stream is closed.
+
+
+class HeavyGate:
+    def __init__(self, slots=2, timeout=10.0):
+        self.slots = slots
+        self.timeout = timeout
+        self._semaphore = threading.BoundedSemaphore(slots)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.rejected = 0
+
+    def _acquire(self):
+        if not self._semaphore.acquire(timeout=self.timeout):
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.active += 1
+        return True
+
+    def _release(self):
+        with self._lock:
+            self.active -= 1
+        self._semaphore.release()
+
+    def __call__(self, view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not self._acquire():
+                response = jsonify({"error": "Server busy, retry shortly"})
+                response.headers["Retry-After"] = "5"
+                return response, 503
+            try:
+                response = make_response(view(*args, **kwargs))
+            except BaseException:
+                self._release()
+                raise
+            if response.is_streamed:
+                response.call_on_close(self._release)
+            else:
+                self._release()
+            return response
+        return wrapper
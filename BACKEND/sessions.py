@@ -0,0 +1,148 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+# -----------------------------------------------------------------------------
+# SERVER-SIDE CHAT SESSIONS
+# -----------------------------------------------------------------------------
+# The session cookie only carries a chat id; the conversation lives here.
+# Every session keeps at most ``history`` messages (older ones fall off the
+# front like a ring buffer) and expires ``ttl`` seconds after its last use,
+# so request/response size stays constant however long a chat runs.
+
+
+class MemorySessionStore:
+    """Per-process LRU of chat sessions with a TTL."""
+
+    def __init__(self, history=20, ttl=3600, maxsize=10000):
+        self.history_size = history
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _entry(self, sid, now, create=False):
+        entry = self._sessions.get(sid)
+        if entry is not None and self.ttl and entry[0] < now:
+            del self._sessions[sid]
+            entry = None
+        if entry is None and create:
+            entry = [0.0, deque(maxlen=self.history_size)]
+            self._sessions[sid] = entry
+        if entry is not None:
+            entry[0] = now + self.ttl
+            self._sessions.move_to_end(sid)
+        return entry
+
+    def history(self, sid):
+        with self._lock:
+            entry = self._entry(sid, time.time())
+            return list(entry[1]) if entry else []
+
+    def append(self, sid, *messages):
+        with self._lock:
+            self._entry(sid, time.time(), create=True)[1].extend(messages)
+            while len(self._sessions) > self.maxsize:
+                self._sessions.popitem(last=False)
+
+    def clear(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+
+class SQLiteSessionStore:
+    """Chat sessions in a local SQLite file, shared by every worker process."""
+
+    def __init__(self, path, history=20, ttl=3600):
+        self.path = path
+        self.history_size = history
+        self.ttl = ttl
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # not kept: connections must not be shared across a fork
+        conn = sqlite3.connect(path, timeout=5)
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chat_messages ("
+                " sid TEXT NOT NULL, seq INTEGER NOT NULL, message TEXT NOT NULL,"
+                " PRIMARY KEY (sid, seq))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chat_sessions ("
+                " sid TEXT PRIMARY KEY, next_seq INTEGER NOT NULL, expires REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS chat_sessions_expires ON chat_sessions (expires)")
+        conn.close()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def history(self, sid):
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT expires FROM chat_sessions WHERE sid = ?", (sid,)
+        ).fetchone()
+        if row is None or (self.ttl and row[0] < time.time()):
+            return []
+        rows = conn.execute(
+            "SELECT message FROM chat_messages WHERE sid = ? ORDER BY seq", (sid,)
+        ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def append(self, sid, *messages):
+        now = time.time()
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT next_seq, expires FROM chat_sessions WHERE sid = ?", (sid,)
+            ).fetchone()
+            if row is None or (self.ttl and row[1] < now):
+                conn.execute("DELETE FROM chat_messages WHERE sid = ?", (sid,))
+                seq = 0
+            else:
+                seq = row[0]
+            conn.executemany(
+                "INSERT INTO chat_messages (sid, seq, message) VALUES (?, ?, ?)",
+                [(sid, seq + i, json.dumps(m)) for i, m in enumerate(messages)],
+            )
+            seq += len(messages)
+            # ring buffer: keep the last ``history_size`` messages
+            conn.execute(
+                "DELETE FROM chat_messages WHERE sid = ? AND seq < ?",
+                (sid, seq - self.history_size),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO chat_sessions (sid, next_seq, expires) VALUES (?, ?, ?)",
+                (sid, seq, now + self.ttl),
+            )
+            self._expire(conn, now)
+
+    def _expire(self, conn, now):
+        if not self.ttl:
+            return
+        expired = "SELECT sid FROM chat_sessions WHERE expires < ?"
+        conn.execute(f"DELETE FROM chat_messages WHERE sid IN ({expired})", (now,))
+        conn.execute("DELETE FROM chat_sessions WHERE expires < ?", (now,))
+
+    def clear(self, sid):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM chat_messages WHERE sid = ?", (sid,))
+            conn.execute("DELETE FROM chat_sessions WHERE sid = ?", (sid,))
+
+
+def make_session_store(backend, history=20, ttl=3600, path=None, maxsize=10000):
+    if backend == "sqlite":
+        return SQLiteSessionStore(path, history=history, ttl=ttl)
+    if backend == "memory":
+        return MemorySessionStore(history=history, ttl=ttl, maxsize=maxsize)
+    raise ValueError(f"Unknown chat session backend: {backend}")
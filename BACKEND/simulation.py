@@ -0,0 +1,163 @@
+import numpy as np
+
+from forecasting import MODELS, SEASON, run_model
+from rollups import daily_panel
+
+# -----------------------------------------------------------------------------
+# CAPACITY SIMULATION
+# -----------------------------------------------------------------------------
+# What-if demand for region x resource_type x metric series. Per dataset
+# version the simulator keeps, for every series, the in-sample residuals of
+# its best forecast model and its sensitivity to the scenario drivers (a
+# ridge regression of the daily means on users_active, holiday,
+# economic_index and cloud_market_demand, solved for all series at once).
+# A simulation shifts the stored best forecast by the scenario and draws
+# ``paths`` trajectories per series by block-bootstrapping the residuals
+# (blocks of SEASON days keep the weekly shape of the errors). Everything is
+# float32 array ops over [series, paths, days], chunked by series to bound
+# memory.
+
+DRIVERS = ("users_active", "holiday", "economic_index", "cloud_market_demand")
+RIDGE = 1.0
+BLOCK = SEASON
+RECENT_DAYS = 30            # driver levels the percentage shifts apply to
+CHUNK_ELEMENTS = 1 << 21    # series x paths x days simulated at a time
+PEAK_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+BREACH_HIGH = 0.5
+BREACH_MEDIUM = 0.1
+
+
+def _ridge(X, y, drop):
+    """Per-series ridge slopes of y [n, T] on X [n, T, k] (NaN days skipped).
+
+    Regressors are standardized per series; columns flagged in ``drop``
+    [n, k] or without variance get a zero slope.
+    """
+    valid = ~np.isnan(y) & ~np.isnan(X).any(axis=2)
+    w = valid.astype(float)
+    count = np.maximum(w.sum(axis=1), 1.0)
+    X = np.nan_to_num(X)
+    y = np.nan_to_num(y)
+    Xc = (X - (X * w[..., None]).sum(axis=1, keepdims=True) / count[:, None, None]) * w[..., None]
+    yc = (y - (y * w).sum(axis=1, keepdims=True) / count[:, None]) * w
+    sd = np.sqrt((Xc ** 2).sum(axis=1) / count[:, None])
+    keep = (sd > 1e-12) & ~drop
+    scale = np.where(keep, sd, 1.0)
+    Z = Xc / scale[:, None, :] * keep[:, None, :]
+    A = np.einsum("ntk,ntl->nkl", Z, Z) + RIDGE * np.eye(X.shape[2])
+    b = np.einsum("ntk,nt->nk", Z, yc)
+    coef = np.linalg.solve(A, b[..., None])[..., 0]
+    return np.where(keep, coef / scale, 0.0)
+
+
+def risk_levels(breach):
+    return np.select([breach >= BREACH_HIGH, breach >= BREACH_MEDIUM], ["high", "medium"], "low")
+
+
+class DemandSimulator:
+    """Residuals and driver sensitivities of every series of one dataset version."""
+
+    def __init__(self, keys, residuals, betas, recent, holiday_rate):
+        self.keys = keys
+        self.index = {k: i for i, k in enumerate(keys)}
+        self.residuals = residuals          # [n, L] in-sample errors of the best model
+        self.betas = betas                  # [n, len(DRIVERS)] demand per unit of each driver
+        self.recent = recent                # [n, len(DRIVERS)] recent mean of each driver
+        self.holiday_rate = holiday_rate    # [n] historical share of holiday days
+
+    @classmethod
+    def from_dataset(cls, dataset, engine, metrics):
+        cube = dataset.cube
+        keys, dates, target = daily_panel(cube, metrics)
+        _, _, drivers = daily_panel(cube, DRIVERS)
+        n, T = len(keys), len(dates)
+        # the drivers of a region x resource_type pair, repeated for each metric
+        X = np.repeat(drivers.reshape(-1, len(DRIVERS), T), len(metrics), axis=0).transpose(0, 2, 1)
+        drop = np.array([[m == d for d in DRIVERS] for _, _, m in keys], dtype=bool).reshape(n, len(DRIVERS))
+        betas = _ridge(X, target, drop)
+        with np.errstate(invalid="ignore"):
+            recent = np.nan_to_num(np.nanmean(X[:, -RECENT_DAYS:, :], axis=1))
+            holiday_rate = np.nan_to_num(np.nanmean(X[:, :, DRIVERS.index("holiday")], axis=1))
+
+        # residuals of each series' best model on the forecasting panel
+        panel = engine.panel
+        rows = np.array([panel.index[k] for k in keys], dtype=int)
+        chosen = engine.best_models()[rows] if n else np.array([], dtype=str)
+        parts = {}
+        for name in MODELS:
+            sel = np.flatnonzero(chosen == name)
+            if len(sel):
+                parts[name] = (sel, run_model(panel.values[rows[sel]], 1, name)[1])
+        length = min((r.shape[1] for _, r in parts.values()), default=1)
+        residuals = np.zeros((n, max(length, 1)))
+        for sel, r in parts.values():
+            residuals[sel] = np.nan_to_num(r[:, r.shape[1] - length:])
+        return cls(keys, residuals, betas, recent, holiday_rate)
+
+    def shifts(self, rows, horizon, user_growth=0.0, economic_index_shift=0.0, cloud_market_demand_shift=0.0):
+        """Deterministic scenario shift of demand [len(rows), horizon].
+
+        user_growth (%) ramps in linearly to its full value on the last day;
+        the other shifts (%) apply from the first day. users_active itself
+        moves one for one with the user growth.
+        """
+        b, recent = self.betas[rows], self.recent[rows]
+        users, econ, market = (DRIVERS.index(d) for d in ("users_active", "economic_index", "cloud_market_demand"))
+        own = np.array([self.keys[r][2] == "users_active" for r in rows], dtype=bool)
+        ramp = np.arange(1, horizon + 1) / horizon
+        users_effect = np.where(own, 1.0, b[:, users])[:, None] * recent[:, users, None] * user_growth / 100 * ramp
+        step = (
+            b[:, econ] * recent[:, econ] * economic_index_shift / 100
+            + b[:, market] * recent[:, market] * cloud_market_demand_shift / 100
+        )
+        return users_effect + step[:, None]
+
+    def simulate(self, rows, baseline, capacity, paths=2000, seed=0, holiday_rate=None,
+                 confidence=0.95, **scenario):
+        """Monte Carlo peaks of ``baseline`` [len(rows), horizon] against ``capacity``.
+
+        ``holiday_rate`` (0..1) makes every simulated day a holiday with that
+        probability, adding each series' holiday effect relative to its
+        historical rate. Returns per-series arrays.
+        """
+        rows = np.asarray(rows, dtype=int)
+        n, horizon = baseline.shape
+        mean = baseline + self.shifts(rows, horizon, **scenario)
+        holiday_beta = self.betas[rows, DRIVERS.index("holiday")]
+        # every block a path can draw, [series * L, BLOCK]: one gather per block
+        resid = self.residuals[rows].astype(np.float32)
+        length = resid.shape[1]
+        blocks = np.stack([np.roll(resid, -k, axis=1) for k in range(BLOCK)], axis=2).reshape(-1, BLOCK)
+        n_blocks = -(-horizon // BLOCK)
+
+        rng = np.random.default_rng(seed)
+        peaks = np.empty((n, paths), dtype=np.float32)
+        step = max(1, CHUNK_ELEMENTS // (paths * horizon))
+        for a in range(0, n, step):
+            sl = slice(a, min(a + step, n))
+            m = sl.stop - sl.start
+            starts = rng.integers(0, length, size=(m, paths, n_blocks), dtype=np.int32)
+            starts += (np.arange(sl.start, sl.stop, dtype=np.int32) * length)[:, None, None]
+            demand = np.take(blocks, starts, axis=0).reshape(m, paths, -1)[:, :, :horizon]
+            demand = demand + mean[sl, None, :].astype(np.float32)
+            if holiday_rate is not None:
+                holidays = rng.random((m, paths, horizon), dtype=np.float32) < holiday_rate
+                offset = holidays - self.holiday_rate[rows[sl], None, None].astype(np.float32)
+                demand += holiday_beta[sl, None, None].astype(np.float32) * offset
+            np.maximum(demand, 0.0, out=demand)
+            peaks[sl] = demand.max(axis=2)
+
+        capacity = np.asarray(capacity, dtype=float)
+        peak_q = np.quantile(peaks, (*PEAK_QUANTILES, confidence), axis=1).T.astype(float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            headroom = np.where(capacity[:, None] > 0, (peak_q[:, :-1] / capacity[:, None] - 1) * 100, np.nan)
+        breach = (peaks > capacity[:, None]).mean(axis=1)
+        return {
+            "baseline_peak": mean.max(axis=1),
+            "expected_peak": peaks.mean(axis=1, dtype=float),
+            "peak": peak_q[:, :-1],
+            "headroom": headroom,
+            "recommended_capacity": peak_q[:, -1],
+            "breach_probability": breach,
+            "risk": risk_levels(breach),
+        }
@@ -0,0 +1,261 @@
+import math
+
+import numpy as np
+
+from rollups import DIMENSIONS, bucket_dates
+
+# -----------------------------------------------------------------------------
+# QUANTILE SKETCHES
+# -----------------------------------------------------------------------------
+# Values are counted in logarithmic buckets (DDSketch): bucket i holds
+# (gamma**(i-1), gamma**i], so the representative value of a bucket is within
+# RELATIVE_ACCURACY of every value in it, and any quantile read from merged
+# counts has that relative error. Counts are additive, so sketches merge by
+# summing, like the rollup cube.
+#
+# SketchCube keeps, for every (region, resource_type) key of the cube (None =
+# all values) and for daily and monthly buckets, the non-zero bucket counts
+# of each metric as a sparse table sorted by (date, bucket). A date range is
+# answered from the monthly sketches of the months it covers plus the daily
+# sketches of the days at its edges, i.e. a bincount over a few thousand
+# entries regardless of how many rows are behind them.
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+MIN_VALUE = 1e-6            # smaller values (and zero) share bucket 0
+MAX_VALUE = 1e12            # larger values are clamped into the top bucket
+MIN_INDEX = math.floor(math.log(MIN_VALUE) / LOG_GAMMA)
+N_BINS = math.ceil(math.log(MAX_VALUE) / LOG_GAMMA) - MIN_INDEX + 1
+SKETCH_GRANULARITIES = ("daily", "monthly")
+DEFAULT_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+def to_bins(values):
+    """Bucket index of every value; -1 for NaN (not counted)."""
+    values = np.asarray(values, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        idx = np.ceil(np.log(values) / LOG_GAMMA) - MIN_INDEX
+    bins = np.where(values > MIN_VALUE, np.clip(idx, 1, N_BINS - 1), 0)
+    return np.where(np.isnan(values), -1, bins).astype(np.int16)
+
+
+def bin_values(bins):
+    """Representative value of each bucket (the relative-error midpoint)."""
+    bins = np.asarray(bins, dtype=float)
+    upper = np.exp((bins + MIN_INDEX) * LOG_GAMMA)
+    return np.where(bins > 0, 2 * upper / (GAMMA + 1), 0.0)
+
+
+def quantiles(hist, qs):
+    """Quantiles ``qs`` of a dense bucket histogram (NaN when it is empty)."""
+    total = hist.sum()
+    if not total:
+        return np.full(len(qs), np.nan)
+    cum = np.cumsum(hist)
+    # nearest rank on the 0-based rank q * (n - 1)
+    ranks = np.asarray(qs, dtype=float) * (total - 1)
+    return bin_values(np.searchsorted(cum, ranks, side="right"))
+
+
+class Sketches:
+    """Bucket counts per date for one metric of one key, sorted by (date, bucket).
+
+    Entries of date ``dates[i]`` are ``offsets[i]:offsets[i + 1]``.
+    """
+
+    __slots__ = ("dates", "offsets", "bins", "counts")
+
+    def __init__(self, dates, offsets, bins, counts):
+        self.dates = dates
+        self.offsets = offsets
+        self.bins = bins
+        self.counts = counts
+
+    @classmethod
+    def from_sorted(cls, axis, cells, bins, counts):
+        """Entries sorted by (cell, bucket) with unique pairs; ``cells`` index ``axis``."""
+        labels, starts = np.unique(cells, return_index=True)
+        return cls(
+            axis[labels],
+            np.append(starts, len(cells)).astype(np.int64),
+            bins.astype(np.int16),
+            counts.astype(np.int64),
+        )
+
+    @classmethod
+    def from_entries(cls, dates, bins, counts):
+        """Aggregate (date, bucket, count) entries given in any order."""
+        axis, cells = np.unique(dates, return_inverse=True)
+        uniq, inverse = np.unique(cells.astype(np.int64) * N_BINS + bins, return_inverse=True)
+        summed = np.bincount(inverse, weights=counts, minlength=len(uniq))
+        return cls.from_sorted(axis, uniq // N_BINS, uniq % N_BINS, summed)
+
+    def merge(self, other):
+        """Sketches of both; only dates from ``other``'s first date on are re-aggregated."""
+        if not len(other.dates):
+            return self
+        cut = int(np.searchsorted(self.dates, other.dates[0]))
+        a = int(self.offsets[cut])
+        tail_dates = np.concatenate([
+            np.repeat(self.dates[cut:], np.diff(self.offsets[cut:])),
+            np.repeat(other.dates, np.diff(other.offsets)),
+        ])
+        tail = Sketches.from_entries(
+            tail_dates,
+            np.concatenate([self.bins[a:], other.bins]),
+            np.concatenate([self.counts[a:], other.counts]),
+        )
+        return Sketches(
+            np.concatenate([self.dates[:cut], tail.dates]),
+            np.concatenate([self.offsets[:cut], tail.offsets + a]),
+            np.concatenate([self.bins[:a], tail.bins]),
+            np.concatenate([self.counts[:a], tail.counts]),
+        )
+
+    def span(self, start=None, end=None):
+        """Entry range [a, b) of the dates within [start, end]."""
+        lo = 0 if start is None else int(np.searchsorted(self.dates, start))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, end, side="right"))
+        return int(self.offsets[lo]), int(self.offsets[max(lo, hi)])
+
+
+class SketchCube:
+    def __init__(self, entries, metrics):
+        self._entries = entries     # (region, resource_type, granularity) -> {metric: Sketches}
+        self.metrics = tuple(metrics)
+
+    def get(self, region=None, resource_type=None, granularity="daily"):
+        return self._entries.get((region or None, resource_type or None, granularity))
+
+    def keys(self):
+        return self._entries.keys()
+
+    @classmethod
+    def build(cls, df, metrics):
+        entries = {}
+        if df.empty:
+            return cls(entries, metrics)
+        names = {dim: df[dim].cat.categories for dim in DIMENSIONS}
+        # one extra code per dimension stands for "all values"
+        n_resources = len(names["resource_type"]) + 1
+        codes = {dim: df[dim].cat.codes.to_numpy().astype(np.int64) for dim in DIMENSIONS}
+        valid = (codes["region"] >= 0) & (codes["resource_type"] >= 0)
+        bins = {m: to_bins(df[m].to_numpy(dtype=float)) for m in metrics}
+        levels = [("region", "resource_type"), ("region",), ("resource_type",), ()]
+
+        for granularity in SKETCH_GRANULARITIES:
+            axis, cells = np.unique(bucket_dates(df["date"].values, granularity), return_inverse=True)
+            cells = cells.astype(np.int64)
+            for dims in levels:
+                region = codes["region"] if "region" in dims else len(names["region"])
+                resource = codes["resource_type"] if "resource_type" in dims else len(names["resource_type"])
+                key = np.broadcast_to(region * n_resources + resource, cells.shape)
+                for metric in metrics:
+                    keep = valid & (bins[metric] >= 0)
+                    code = (key[keep] * len(axis) + cells[keep]) * N_BINS + bins[metric][keep]
+                    uniq, counts = np.unique(code, return_counts=True)
+                    if not len(uniq):
+                        continue
+                    series, rest = np.divmod(uniq, len(axis) * N_BINS)
+                    splits = np.flatnonzero(np.diff(series)) + 1
+                    for lo, hi in zip([0, *splits], [*splits, len(uniq)]):
+                        r, t = divmod(int(series[lo]), n_resources)
+                        name = (
+                            names["region"][r] if "region" in dims else None,
+                            names["resource_type"][t] if "resource_type" in dims else None,
+                            granularity,
+                        )
+                        entries.setdefault(name, {})[metric] = Sketches.from_sorted(
+                            axis, rest[lo:hi] // N_BINS, rest[lo:hi] % N_BINS, counts[lo:hi]
+                        )
+        return cls(entries, metrics)
+
+    @classmethod
+    def from_frames(cls, frames, metrics):
+        cube = cls({}, metrics)
+        for df in frames:
+            cube = cube.merge(cls.build(df, metrics))
+        return cube
+
+    @classmethod
+    def from_dataset(cls, dataset, metrics):
+        return cls.from_frames(dataset.store.scan(columns=["date", *DIMENSIONS, *metrics]), metrics)
+
+    def merge(self, other):
+        entries = dict(self._entries)
+        for key, sketches in other._entries.items():
+            if key in entries:
+                entries[key] = {m: entries[key][m].merge(s) for m, s in sketches.items()}
+            else:
+                entries[key] = sketches
+        return SketchCube(entries, self.metrics)
+
+    def histogram(self, metric, region=None, resource_type=None, start=None, end=None):
+        """Dense bucket counts of ``metric`` for a key and inclusive date range.
+
+        Whole months inside the range come from the monthly sketches, the
+        days around them from the daily ones.
+        """
+        monthly = self.get(region, resource_type, "monthly")
+        hist = np.zeros(N_BINS, dtype=np.int64)
+        if monthly is None:
+            return hist
+        monthly, daily = monthly[metric], self.get(region, resource_type, "daily")[metric]
+        start = None if start is None else np.datetime64(start, "D")
+        end = None if end is None else np.datetime64(end, "D")
+
+        if start is None and end is None:
+            ranges = [(monthly, None, None)]
+        else:
+            # whole months in range: from start's month (or the next one when
+            # start is not the 1st) to end's month (or the one before)
+            first = last = None
+            if start is not None:
+                first = start.astype("datetime64[M]")
+                first += int(first.astype("datetime64[D]") < start)
+            if end is not None:
+                last = end.astype("datetime64[M]")
+                last -= int((end + 1).astype("datetime64[M]") == last)
+            if first is not None and last is not None and first > last:
+                ranges = [(daily, start, end)]
+            else:
+                lo = None if first is None else first.astype("datetime64[D]")
+                hi = None if last is None else last.astype("datetime64[D]")
+                ranges = [(monthly, lo, hi)]
+                if start is not None:
+                    ranges.append((daily, start, lo - 1))
+                if end is not None:
+                    ranges.append((daily, (last + 1).astype("datetime64[D]"), end))
+
+        for sketches, lo, hi in ranges:
+            a, b = sketches.span(lo, hi)
+            if b > a:
+                hist += np.bincount(sketches.bins[a:b], weights=sketches.counts[a:b], minlength=N_BINS).astype(np.int64)
+        return hist
+
+    def quantiles(self, metric, qs=DEFAULT_QUANTILES, region=None, resource_type=None, start=None, end=None):
+        """({"p95": value, ...}, count) for a key and date range."""
+        hist = self.histogram(metric, region, resource_type, start, end)
+        values = quantiles(hist, qs)
+        return {quantile_label(q): v for q, v in zip(qs, values)}, int(hist.sum())
+
+
+def quantile_label(q):
+    return "p" + f"{q * 100:g}".replace(".", "_")
+
+
+def parse_quantiles(value):
+    """Quantiles from "0.5,0.95" or "p50,p95" (ValueError when out of range)."""
+    qs = []
+    for item in value.split(","):
+        item = item.strip().lower()
+        if not item:
+            continue
+        q = float(item[1:]) / 100 if item.startswith("p") else float(item)
+        if not 0 <= q <= 1:
+            raise ValueError(f"quantile out of range: {item}")
+        qs.append(q)
+    if not qs:
+        raise ValueError("no quantiles given")
+    return qs
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------------------------------------------
+# BINARY DATASET SNAPSHOT
+# -----------------------------------------------------------------------------
+# After the first CSV parse the prepared frame (date-sorted, categoricals) is
+# written next to the CSV as one .npy file per column:
+#
+#   data/processed/.cache/cleaned_merged.csv.json        <- pointer (fingerprint)
+#   data/processed/.cache/cleaned_merged.csv.<id>/*.npy  <- column files
+#
+# Later starts memory-map the column files instead of parsing the CSV, so
+# every worker process shares the same page-cache pages. The pointer records
+# the CSV size/mtime and a SHA-1 of its contents; a size/mtime mismatch falls
+# back to the hash, so a plain `touch` does not force a rebuild.
+#
+# Appends made through the API do not rehash the file: the new version id is
+# chained from the previous id and the appended bytes, and recorded in
+#
+#   data/processed/.cache/cleaned_merged.csv.version.json
+#
+# with the file size and a SHA-1 of the appended tail. A reload that finds
+# the file still ending in that tail reuses the id, so every worker agrees
+# on it; any other change falls back to the content hash.
+
+SNAPSHOT_FORMAT = 1
+CACHE_DIRNAME = ".cache"
+
+
+def _cache_dir(csv_path):
+    return os.path.join(os.path.dirname(os.path.abspath(csv_path)), CACHE_DIRNAME)
+
+
+def _pointer_path(csv_path):
+    return os.path.join(_cache_dir(csv_path), os.path.basename(csv_path) + ".json")
+
+
+def _version_path(csv_path):
+    return os.path.join(_cache_dir(csv_path), os.path.basename(csv_path) + ".version.json")
+
+
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.sha1()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _stat(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def load_snapshot(csv_path):
+    """Memory-mapped frame for ``csv_path``, or None if missing/stale."""
+    try:
+        with open(_pointer_path(csv_path)) as fh:
+            meta = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if meta.get("format") != SNAPSHOT_FORMAT:
+        return None
+
+    stat = _stat(csv_path)
+    if {k: meta.get(k) for k in stat} != stat:
+        if meta.get("sha1") != file_digest(csv_path):
+            return None
+        # same contents, new mtime: re-stamp the pointer so we skip the hash next time
+        meta.update(stat)
+        _write_json(_pointer_path(csv_path), meta)
+
+    folder = os.path.join(_cache_dir(csv_path), meta["dir"])
+    try:
+        columns = {}
+        for col in meta["columns"]:
+            data = np.load(os.path.join(folder, col["file"]), mmap_mode="r")
+            if col["kind"] == "category":
+                data = pd.Categorical.from_codes(data, categories=col["categories"])
+            columns[col["name"]] = data
+    except (OSError, ValueError, KeyError):
+        return None
+    return pd.DataFrame(columns, copy=False)
+
+
+def write_snapshot(df, csv_path):
+    """Write ``df`` (already prepared) as the snapshot for ``csv_path``."""
+    cache_dir = _cache_dir(csv_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    name = f"{os.path.basename(csv_path)}.{uuid.uuid4().hex[:12]}"
+    folder = os.path.join(cache_dir, name)
+    os.makedirs(folder)
+
+    columns = []
+    for i, (col, series) in enumerate(df.items()):
+        fname = f"{i:03d}.npy"
+        entry = {"name": col, "file": fname, "kind": "array"}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            entry["kind"] = "category"
+            entry["categories"] = [str(c) for c in series.cat.categories]
+            values = series.cat.codes.to_numpy()
+        else:
+            values = series.to_numpy()
+            if values.dtype == object:
+                raise TypeError(f"Column {col!r} has object dtype and cannot be snapshotted")
+        np.save(os.path.join(folder, fname), np.ascontiguousarray(values), allow_pickle=False)
+        columns.append(entry)
+
+    meta = {
+        "format": SNAPSHOT_FORMAT,
+        "dir": name,
+        "sha1": file_digest(csv_path),
+        "rows": int(len(df)),
+        "columns": columns,
+        **_stat(csv_path),
+    }
+    _write_json(_pointer_path(csv_path), meta)
+    _remove_stale(csv_path, keep=name)
+    return folder
+
+
+def _write_json(path, payload):
+    tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp, "w") as fh:
+        json.dump(payload, fh)
+    os.replace(tmp, path)
+
+
+def _remove_stale(csv_path, keep):
+    # other processes may still map the old files; on POSIX unlinking is safe
+    prefix = os.path.basename(csv_path) + "."
+    cache_dir = _cache_dir(csv_path)
+    for entry in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, entry)
+        if entry.startswith(prefix) and entry != keep and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def csv_digest(csv_path):
+    """SHA-1 of the CSV, taken from a fresh snapshot pointer when possible."""
+    try:
+        with open(_pointer_path(csv_path)) as fh:
+            meta = json.load(fh)
+        stat = _stat(csv_path)
+        if {k: meta.get(k) for k in stat} == stat and meta.get("sha1"):
+            return meta["sha1"]
+    except (OSError, ValueError):
+        pass
+    return file_digest(csv_path)
+
+
+def csv_version(csv_path):
+    """Version id of the CSV: the id recorded by its last append while the
+    file still ends with those bytes, else the first 16 hex digits of its SHA-1."""
+    try:
+        with open(_version_path(csv_path)) as fh:
+            meta = json.load(fh)
+        with open(csv_path, "rb") as fh:
+            fh.seek(0, os.SEEK_END)
+            if fh.tell() == meta["size"]:
+                fh.seek(meta["size"] - meta["tail"])
+                if hashlib.sha1(fh.read()).hexdigest() == meta["tail_sha1"]:
+                    return meta["version"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return csv_digest(csv_path)[:16]
+
+
+def append_version(previous, data):
+    """Version id of a file with id ``previous`` once ``data`` is appended."""
+    return hashlib.sha1(previous.encode() + b"\0" + data).hexdigest()[:16]
+
+
+def record_append(csv_path, version, data):
+    """Record ``version`` for the CSV once ``data`` is appended to it (call
+    before appending); csv_version then checks only the appended tail."""
+    meta = {
+        "version": version,
+        "size": os.path.getsize(csv_path) + len(data),
+        "tail": len(data),
+        "tail_sha1": hashlib.sha1(data).hexdigest(),
+    }
+    os.makedirs(_cache_dir(csv_path), exist_ok=True)
+    _write_json(_version_path(csv_path), meta)
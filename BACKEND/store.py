@@ -0,0 +1,185 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------------------------------------------
+# COLUMNAR DATA STORE
+# -----------------------------------------------------------------------------
+# The frame is kept sorted by date with region/resource_type as categoricals.
+# For every category (and every region x resource_type pair) we hold the
+# sorted row positions ("postings"), so a filter is a posting lookup plus a
+# binary search on the date column instead of boolean masks over the frame.
+
+CATEGORY_COLUMNS = ("region", "resource_type")
+
+
+def prepare_frame(df):
+    """Sort by date and convert the dimension columns to categoricals."""
+    df = df.sort_values("date", kind="stable").reset_index(drop=True)
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype("category")
+    if "holiday" in df.columns and pd.api.types.is_integer_dtype(df["holiday"]):
+        df["holiday"] = df["holiday"].astype("int8")
+    return df
+
+
+def _split_postings(codes, n_groups, index_dtype):
+    # positions grouped by code; a stable argsort keeps each group date-sorted
+    order = np.argsort(codes, kind="stable").astype(index_dtype)
+    counts = np.bincount(codes[codes >= 0], minlength=n_groups)
+    skip = int((codes < 0).sum())
+    bounds = np.concatenate(([0], np.cumsum(counts))) + skip
+    return [order[bounds[i]:bounds[i + 1]] for i in range(n_groups)]
+
+
+class DataStore:
+    """Read-only, date-sorted frame with per-category row postings.
+
+    Frames returned by ``filter``/``rows`` may share memory with the store
+    (the unfiltered case returns the store frame itself), so callers must
+    not mutate them in place.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.dates = df["date"].values
+        index_dtype = np.int32 if len(df) < np.iinfo(np.int32).max else np.int64
+
+        self._names = {}
+        self._postings = {}
+        codes = {}
+        for col in CATEGORY_COLUMNS:
+            cats = df[col].cat.categories
+            codes[col] = df[col].cat.codes.to_numpy()
+            self._names[col] = {str(c).lower(): c for c in cats}
+            for cat, pos in zip(cats, _split_postings(codes[col], len(cats), index_dtype)):
+                self._postings[self._key(col, cat)] = pos
+
+        regions = df["region"].cat.categories
+        resources = df["resource_type"].cat.categories
+        pair_codes = np.where(
+            (codes["region"] >= 0) & (codes["resource_type"] >= 0),
+            codes["region"].astype(np.int64) * len(resources) + codes["resource_type"],
+            -1,
+        )
+        pair_postings = _split_postings(pair_codes, len(regions) * len(resources), index_dtype)
+        for i, region in enumerate(regions):
+            for j, resource in enumerate(resources):
+                pos = pair_postings[i * len(resources) + j]
+                if len(pos):
+                    self._postings[(str(region).lower(), str(resource).lower())] = pos
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(prepare_frame(df))
+
+    def append(self, batch):
+        """New store with ``batch`` added after the existing rows.
+
+        The batch must not start before the last stored date, so the frame
+        stays date-sorted. Postings are indexed for the batch alone and
+        concatenated onto the existing ones; categories new in the batch are
+        added after the existing ones, which keeps the old codes valid.
+        """
+        batch = prepare_frame(batch)
+        if len(self.df) and len(batch) and batch["date"].iloc[0] < self.df["date"].iloc[-1]:
+            raise ValueError("batch starts before the last stored date")
+
+        old, new = self.df.copy(deep=False), batch.copy(deep=False)
+        for col in CATEGORY_COLUMNS:
+            cats = old[col].cat.categories
+            cats = cats.append(new[col].cat.categories.difference(cats))
+            old[col] = old[col].cat.set_categories(cats)
+            new[col] = new[col].cat.set_categories(cats)
+        new = new.astype({c: t for c, t in old.dtypes.items() if c in new.columns}, copy=False)
+        frame = pd.concat([old, new[list(old.columns)]], ignore_index=True)
+
+        offset = len(self.df)
+        index_dtype = np.int32 if len(frame) < np.iinfo(np.int32).max else np.int64
+        tail = DataStore(new)
+        store = DataStore.__new__(DataStore)
+        store.df = frame
+        store.dates = frame["date"].values
+        store._names = {
+            col: {str(c).lower(): c for c in frame[col].cat.categories} for col in CATEGORY_COLUMNS
+        }
+        store._postings = dict(self._postings)
+        for key, pos in tail._postings.items():
+            pos = pos.astype(index_dtype) + offset
+            if key in self._postings:
+                pos = np.concatenate([self._postings[key].astype(index_dtype, copy=False), pos])
+            store._postings[key] = pos
+        return store
+
+    @staticmethod
+    def _key(col, value):
+        value = str(value).lower()
+        return (value, None) if col == "region" else (None, value)
+
+    def __len__(self):
+        return len(self.df)
+
+    @property
+    def columns(self):
+        return list(self.df.columns)
+
+    def date_range(self):
+        """(first, last) date as datetime64[D]; the frame is date-sorted."""
+        return self.dates[0].astype("datetime64[D]"), self.dates[-1].astype("datetime64[D]")
+
+    def categories(self, col):
+        return list(self._names[col].values())
+
+    def canonical(self, col, value):
+        """Case-insensitive lookup of the stored category name (None if unknown)."""
+        if value is None:
+            return None
+        return self._names[col].get(str(value).strip().lower())
+
+    def positions(self, region=None, resource_type=None, start_date=None, end_date=None):
+        """Row positions matching the filters, as a slice when no category is set."""
+        lo, hi = 0, len(self.df)
+        if start_date:
+            lo = int(np.searchsorted(self.dates, np.datetime64(pd.to_datetime(start_date)), "left"))
+        if end_date:
+            hi = int(np.searchsorted(self.dates, np.datetime64(pd.to_datetime(end_date)), "right"))
+
+        if not region and not resource_type:
+            return slice(lo, max(lo, hi))
+
+        key = (
+            str(region).strip().lower() if region else None,
+            str(resource_type).strip().lower() if resource_type else None,
+        )
+        postings = self._postings.get(key)
+        if postings is None:
+            return np.empty(0, dtype=np.int64)
+        # postings are sorted, so the date window is another binary search
+        a, b = np.searchsorted(postings, [lo, hi])
+        return postings[a:b]
+
+    def take(self, pos):
+        if isinstance(pos, slice):
+            if pos.start == 0 and pos.stop == len(self.df):
+                return self.df
+            return self.df.iloc[pos]
+        return self.df.take(pos)
+
+    def filter(self, params=None):
+        if not params:
+            return self.df
+        return self.take(
+            self.positions(
+                region=params.get("region"),
+                resource_type=params.get("resource_type"),
+                start_date=params.get("start_date"),
+                end_date=params.get("end_date"),
+            )
+        )
+
+    def rows(self, region=None, resource_type=None):
+        return self.take(self.positions(region=region, resource_type=resource_type))
+
+    def scan(self, region=None, resource_type=None, start_date=None, end_date=None, columns=None):
+        """Matching rows as an iterator of frames (one frame here; see PartitionStore)."""
+        df = self.take(self.positions(region, resource_type, start_date, end_date))
+        yield df if columns is None else df[columns]
@@ -0,0 +1,41 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_CSV = os.path.join(BACKEND_DIR, "data", "processed", "cleaned_merged.csv")
+sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """app.py loaded against a scratch copy of the sample CSV."""
+    data_dir = tmp_path_factory.mktemp("data")
+    shutil.copy(SOURCE_CSV, data_dir / "cleaned_merged.csv")
+    os.environ.pop("ADMIN_TOKEN", None)
+    os.environ.update(
+        CLEANED_PATH=str(data_dir / "cleaned_merged.csv"),
+        BACKTEST_DIR=str(data_dir / ".cache" / "backtests"),
+        BACKTEST_WORKERS="1",
+        DATASET_WATCH_INTERVAL="0",
+        INGEST_PERSIST="1",
+    )
+    import app
+
+    return app
+
+
+@pytest.fixture
+def datasets(app_module):
+    """DatasetManager reloaded from a fresh copy of the sample CSV."""
+    shutil.copy(SOURCE_CSV, app_module.CLEANED_PATH)
+    shutil.rmtree(os.path.join(os.path.dirname(app_module.CLEANED_PATH), ".cache"), ignore_errors=True)
+    app_module.DATASETS.load()
+    return app_module.DATASETS
+
+
+@pytest.fixture
+def client(app_module, datasets):
+    return app_module.app.test_client()
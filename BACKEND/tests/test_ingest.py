@@ -0,0 +1,131 @@
+import pandas as pd
+import pytest
+
+from conftest import SOURCE_CSV
+from snapshot import csv_version
+
+# Responses built from every derived value that an append merges in place:
+# rollup cube, KPI state, quantile sketches, anomaly detectors, features.
+MERGED_VIEWS = (
+    "/api/time-series",
+    "/api/time-series?region=East US&resource_type=VM&aggregation=weekly",
+    "/api/kpis",
+    "/api/percentiles",
+    "/api/percentiles?group_by=region",
+    "/api/alerts?limit=1000",
+    "/api/features",
+)
+
+
+def later_rows(days=3, shift=3):
+    """The last ``days`` days of the sample CSV, moved ``shift`` days later."""
+    df = pd.read_csv(SOURCE_CSV)
+    dates = pd.to_datetime(df["date"])
+    recent = df[dates > dates.max() - pd.Timedelta(days=days)].copy()
+    recent["date"] = (dates[recent.index] + pd.Timedelta(days=shift)).dt.strftime("%Y-%m-%d")
+    return recent.to_dict("records")
+
+
+def fetch(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, url
+    return response.get_json()
+
+
+def ingest(client, rows):
+    return client.post("/api/admin/ingest", json={"rows": rows})
+
+
+def read_source(datasets):
+    with open(datasets.source_path, "rb") as fh:
+        return fh.read()
+
+
+def test_append_publishes_incremental_version(client, datasets):
+    before = len(datasets.current)
+    rows = later_rows()
+    response = ingest(client, rows)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["incremental"] is True
+    assert body["rows"] == before + len(rows)
+    assert len(pd.read_csv(datasets.source_path)) == before + len(rows)
+    # a reload of the extended file (any worker, or a restart) agrees on the id
+    assert csv_version(datasets.source_path) == body["version"]
+    assert datasets.reload() == (datasets.current, False)
+
+
+def test_retried_post_is_rejected(client, datasets):
+    rows = later_rows()
+    assert ingest(client, rows).status_code == 200
+    stored, source = len(datasets.current.store), read_source(datasets)
+
+    response = ingest(client, rows)
+    assert response.status_code == 409
+    body = response.get_json()
+    assert body["error"] == "Rows already ingested"
+    assert body["conflicts"][0] == {k: rows[0][k] for k in ("date", "region", "resource_type")}
+    assert len(datasets.current.store) == stored
+    assert read_source(datasets) == source
+
+
+def test_stored_keys_match_case_insensitively(client, datasets):
+    rows = [dict(r, region=r["region"].lower()) for r in later_rows(days=1, shift=0)]
+    stored = len(datasets.current.store)
+    response = ingest(client, rows)
+    assert response.status_code == 409
+    assert response.get_json()["details"][0].startswith("already stored")
+    assert len(datasets.current.store) == stored
+
+
+def test_keys_repeated_within_batch_are_rejected(client, datasets):
+    row = later_rows(days=1)[0]
+    source = read_source(datasets)
+    response = ingest(client, [row, dict(row, usage_cpu=row["usage_cpu"] + 1)])
+    assert response.status_code == 409
+    body = response.get_json()
+    assert body["details"] == ["repeated within the batch: rows 0, 1"]
+    assert body["conflicts"] == [{k: row[k] for k in ("date", "region", "resource_type")}]
+    assert read_source(datasets) == source
+
+
+def test_invalid_batch_is_rejected(client, datasets):
+    row = dict(later_rows(days=1)[0], usage_cpu="lots")
+    response = ingest(client, [row])
+    assert response.status_code == 400
+    assert response.get_json()["details"] == ["usage_cpu: not a whole number in rows 0"]
+
+
+def test_older_dates_fall_back_to_rebuild(client, datasets):
+    df = pd.read_csv(SOURCE_CSV)
+    first = df[df["date"] == df["date"].min()].drop_duplicates("resource_type")
+    rows = [dict(r, region="Test Region") for r in first.to_dict("records")]
+    response = ingest(client, rows)
+    assert response.status_code == 200
+    assert response.get_json()["incremental"] is False
+    dates = datasets.current.df["date"]
+    assert dates.is_monotonic_increasing
+    assert "Test Region" in datasets.current.store.categories("region")
+
+
+@pytest.mark.parametrize("shift", [3, 0], ids=["new-days", "same-last-day"])
+def test_incremental_append_matches_full_rebuild(client, datasets, shift):
+    for url in MERGED_VIEWS:
+        fetch(client, url)
+    rows = later_rows(days=3, shift=shift)
+    if shift == 0:
+        # new series on the last stored day: merged into days that already exist
+        rows = [dict(r, resource_type=f"{r['resource_type']} Spot") for r in rows if r["date"] == rows[-1]["date"]]
+    merged_names = set(datasets.current._derived)
+    response = ingest(client, rows)
+    assert response.status_code == 200
+    assert response.get_json()["incremental"] is True
+    assert {"kpi_state", "sketches", "anomalies", "features"} <= merged_names & set(datasets.current._derived)
+    merged = {url: fetch(client, url) for url in MERGED_VIEWS}
+
+    version = datasets.current.version
+    datasets.reload(force=True)
+    assert datasets.current.version == version
+    rebuilt = {url: fetch(client, url) for url in MERGED_VIEWS}
+    for url in MERGED_VIEWS:
+        assert merged[url] == rebuilt[url], url
@@ -0,0 +1,12 @@
+"""
+Production entry point:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Importing app loads the dataset and precomputes forecasts in the gunicorn
+master (preload_app), before the workers fork. Background threads are
+started per worker in gunicorn.conf.py's post_fork hook.
+"""
+from app import create_app
+
+app = create_app(start_workers=False)
@@ -35,6 +35,8 @@ export interface KPIData {
     end: string;
     days: number;
   };
+  // approximate (1% relative error) p50/p95/p99 per metric
+  percentiles?: Record<UsageMetric, { p50: number; p95: number; p99: number }>;
 }
 
 export interface SparklineData {
@@ -71,6 +73,49 @@ export interface ForecastDataPoint {
   upper_ci: number;
 }
 
+export interface ForecastBatchParams {
+  series?: { region?: string; service?: string; metric: 'cpu' | 'storage' | 'users' }[];
+  model?: ForecastParams['model'] | 'seasonal_naive' | 'holt_winters' | 'linear_trend';
+  horizon?: number;
+}
+
+export interface ForecastBatchResponse {
+  dates: string[];
+  series: {
+    region: string | null;
+    service: string | null;
+    metric: 'cpu' | 'storage' | 'users';
+    model: string;
+    forecast_value: number[];
+    lower_ci: number[];
+    upper_ci: number[];
+  }[];
+}
+
+export type UsageMetric = 'usage_cpu' | 'usage_storage' | 'users_active';
+
+export interface QueryParams {
+  metrics: UsageMetric[];
+  regions?: string[];
+  resource_types?: string[];
+  granularity?: 'daily' | 'weekly' | 'monthly';
+  start_date?: string;
+  end_date?: string;
+  agg?: 'mean' | 'sum';
+}
+
+export interface QueryResponse {
+  granularity: 'daily' | 'weekly' | 'monthly';
+  agg: 'mean' | 'sum';
+  metrics: UsageMetric[];
+  dates: string[];
+  series: {
+    region: string | null;
+    resource_type: string | null;
+    values: Record<string, (number | null)[]>;
+  }[];
+}
+
 export interface CapacityPlanningParams {
   region?: string;
   service: string;
@@ -80,12 +125,151 @@ export interface CapacityPlanningParams {
 export interface CapacityPlanItem {
   region: string;
   service: string;
+  metric?: string;
   forecast_demand: number;
+  recent_demand?: number;
   available_capacity: number;
+  utilization?: number;
   recommended_adjustment: string;
   risk_level: 'low' | 'medium' | 'high';
 }
 
+export interface SimulationParams {
+  region?: string;
+  service?: string;
+  metric?: 'cpu' | 'storage' | 'users' | 'all';
+  horizon?: number;
+  user_growth?: number;                // %
+  holiday_rate?: number;               // 0..1
+  economic_index_shift?: number;       // %
+  cloud_market_demand_shift?: number;  // %
+  paths?: number;
+  seed?: number;
+  confidence?: number;
+}
+
+export interface SimulatedSeries {
+  region: string;
+  service: string;
+  metric: string;
+  available_capacity: number;
+  baseline_peak: number;
+  expected_peak: number;
+  peak_percentiles: Record<string, number | null>;      // p50, p90, p95, p99
+  headroom_percentiles: Record<string, number | null>;  // % over available capacity
+  recommended_capacity: number;
+  breach_probability: number;
+  risk_level: 'low' | 'medium' | 'high';
+}
+
+export interface SimulationResponse {
+  scenario: Record<string, number | null>;
+  horizon: number;
+  paths: number;
+  confidence: number;
+  series: SimulatedSeries[];
+}
+
+export interface DriverParams {
+  group_by?: 'series' | 'region' | 'resource_type' | 'all';
+  region?: string;
+  resource_type?: string;
+  metric?: 'cpu' | 'storage' | 'users';
+  max_lag?: number;
+  start_date?: string;
+  end_date?: string;
+}
+
+export interface DriverEffect {
+  mean_on: number | null;
+  mean_off: number | null;
+  lift_pct: number | null;
+  effect_size: number | null;  // Cohen's d
+  days_on: number;
+  days_off: number;
+}
+
+export interface DriverGroup {
+  region: string | null;
+  resource_type: string | null;
+  days: number;
+  correlation: Record<string, Record<string, number | null>>;
+  cross_correlation: Record<string, Record<string, {
+    r: (number | null)[];  // index = lag in days
+    best_lag: number | null;
+    best_r: number | null;
+  }>>;
+  effects: Record<'holiday' | 'weekend', Record<string, DriverEffect>>;
+}
+
+export interface DriverResponse {
+  group_by: string;
+  variables: string[];
+  drivers: string[];
+  max_lag: number;
+  groups: DriverGroup[];
+}
+
+export interface PercentileParams {
+  metric?: UsageMetric;
+  q?: string;  // e.g. "p50,p95,p99"
+  region?: string;
+  resource_type?: string;
+  start_date?: string;
+  end_date?: string;
+  group_by?: 'region' | 'resource_type';
+  top?: number;
+}
+
+export interface PercentileGroup {
+  region?: string;
+  resource_type?: string;
+  count: number;
+  quantiles: Record<string, number | null>;
+}
+
+export interface PercentileResponse {
+  metric: UsageMetric;
+  relative_accuracy: number;
+  count?: number;
+  quantiles?: Record<string, number | null>;
+  group_by?: 'region' | 'resource_type';
+  groups?: PercentileGroup[];
+}
+
+export type AlertSeverity = 'medium' | 'high' | 'critical';
+
+export interface AlertParams {
+  region?: string;
+  resource_type?: string;
+  metric?: 'cpu' | 'storage' | 'users' | 'all';
+  severity?: AlertSeverity;
+  detector?: 'zscore' | 'ewma' | 'seasonal';
+  start_date?: string;
+  end_date?: string;
+  limit?: number;
+  cursor?: string;
+}
+
+export interface AnomalyAlert {
+  date: string;
+  region: string;
+  resource_type: string;
+  metric: 'cpu' | 'storage' | 'users';
+  value: number;
+  expected: number;
+  score: number;
+  severity: AlertSeverity;
+  direction: 'spike' | 'drop';
+  detectors: string[];
+}
+
+export interface AlertsResponse {
+  total: number;
+  alerts: AnomalyAlert[];
+  next_cursor: string | null;
+}
+
 export interface FilterOptions {
   regions: string[];
   resource_types: string[];
@@ -115,8 +299,11 @@ class APIClient {
     }
 
     try {
+      // Revalidate with the backend on every call; unchanged data comes back
+      // as a 304 against the ETag and is served from the HTTP cache.
       const response = await fetch(url.toString(), {
         method: 'GET',
+        cache: 'no-cache',
         headers: {
           'Content-Type': 'application/json',
         },
@@ -133,6 +320,27 @@ class APIClient {
     }
   }
 
+  private async post<T>(endpoint: string, body: unknown): Promise<T> {
+    try {
+      const response = await fetch(`${this.baseURL}${endpoint}`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(body),
+      });
+
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+
+      return await response.json();
+    } catch (error) {
+      console.error(`API request failed for ${endpoint}:`, error);
+      throw error;
+    }
+  }
+
   // Health check
   async healthCheck() {
     return this.request<{ status: string; rows: number }>('/health');
@@ -168,11 +376,32 @@ class APIClient {
     return this.request<{ date: string; value: number }[]>('/time-series', params);
   }
 
+  // Several metrics x regions x resource types in one round trip (GET so
+  // the response can be revalidated against its ETag)
+  async query(params: QueryParams) {
+    return this.request<QueryResponse>('/query', {
+      ...params,
+      metrics: params.metrics.join(','),
+      regions: params.regions?.join(','),
+      resource_types: params.resource_types?.join(','),
+    });
+  }
+
+  // Approximate percentiles for any filter; group_by + top ranks groups (top-k)
+  async getPercentiles(params?: PercentileParams) {
+    return this.request<PercentileResponse>('/percentiles', params);
+  }
+
   // Get forecast
   async getForecast(params: ForecastParams) {
     return this.request<ForecastDataPoint[]>('/forecast', params);
   }
 
+  // Forecast many series in one round trip (omit `series` for all of them)
+  async getForecastBatch(params: ForecastBatchParams) {
+    return this.post<ForecastBatchResponse>('/forecast/batch', params);
+  }
+
   // Get model comparison
   async getModelComparison(metric?: 'cpu' | 'storage' | 'users') {
     return this.request<any[]>('/model-comparison', metric ? { metric } : undefined);
@@ -183,6 +412,21 @@ class APIClient {
     return this.request<CapacityPlanItem[]>('/capacity-planning', params);
   }
 
+  // What-if Monte Carlo capacity simulation
+  async simulateCapacity(params: SimulationParams) {
+    return this.post<SimulationResponse>('/capacity/simulate', params);
+  }
+
+  // Correlations and holiday/weekend effects of usage vs exogenous drivers
+  async getDrivers(params?: DriverParams) {
+    return this.request<DriverResponse>('/drivers', params);
+  }
+
+  // Anomaly alerts, most severe first (pass next_cursor back for the next page)
+  async getAlerts(params?: AlertParams) {
+    return this.request<AlertsResponse>('/alerts', params);
+  }
+
   // Get monitoring data
   async getMonitoring(params?: { metric?: string; windowDays?: number }) {
     return this.request<any>('/monitoring', params);
@@ -198,9 +442,14 @@ export const fetchSparklines = () => apiClient.getSparklines();
 export const fetchTimeSeries = (params?: Parameters<typeof apiClient.getTimeSeries>[0]) => 
   apiClient.getTimeSeries(params);
 export const fetchForecast = (params: ForecastParams) => apiClient.getForecast(params);
+export const fetchForecastBatch = (params: ForecastBatchParams) => apiClient.getForecastBatch(params);
 export const fetchCapacityPlanning = (params: CapacityPlanningParams) => 
   apiClient.getCapacityPlanning(params);
+export const fetchCapacitySimulation = (params: SimulationParams) =>
+  apiClient.simulateCapacity(params);
 export const fetchFilterOptions = () => apiClient.getFilterOptions();
+export const fetchAlerts = (params?: AlertParams) => apiClient.getAlerts(params);
+export const fetchDrivers = (params?: DriverParams) => apiClient.getDrivers(params);
 export const fetchModelComparison = (metric?: 'cpu' | 'storage' | 'users') => 
   apiClient.getModelComparison(metric);
 export const fetchMonitoring = (params?: { metric?: string; windowDays?: number }) =>